@@ -1,5 +1,6 @@
 import json
 import os
+import shutil
 from abc import ABCMeta, abstractmethod
 from typing import Dict, Final, List, Union
 import inspect
@@ -15,6 +16,64 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(current_file))
 DATA_DIR_NAME = os.path.join(os.getcwd(), "hpo_benchmarks")
 SEEDS: Final = [665, 1319, 7222, 7541, 8916]
 VALUE_RANGES = json.load(open(f"{CURRENT_DIR}/tabular_benchmarks.json"))
+COMPACT_FORMAT_VERSION = 1
+COMPACT_META_FILENAME = "meta.json"
+
+
+def compact_path(data_path):
+    # directory of the preprocessed table next to the parquet file, e.g. nn_31_data.parquet.gzip -> nn_31_data_compact
+    return data_path.split(".parquet")[0] + "_compact"
+
+
+def export_compact(db, value_range, path):
+    """
+    One-time preprocessing of an HPOBench table (one row per hyperparameters and seed, already filtered to the max
+    budget) into uncompressed .npy files in the directory path, which HPOBench memory-maps instead of reading the
+    parquet file: hyperparameters as indices into value_range, seeds, and the result dicts flattened into validation
+    loss, cost (model cost plus validation cost, as in HPOBench) and test scores. Written to a temporary directory
+    which is renamed, so that readers never see a partial table.
+    """
+    hp_names = list(value_range.keys())
+    assert set(db.columns) == set(hp_names) | {"seed", "result"}, f'Unexpected columns {list(db.columns)} in the table.'
+    hps = np.empty((len(db), len(hp_names)), dtype=np.int16)
+    for pos, name in enumerate(hp_names):
+        codes = {value: code for code, value in enumerate(value_range[name])}
+        column = [codes.get(value, -1) for value in db[name].to_numpy().tolist()]
+        assert min(column) >= 0, f'Some values of {name} are not in its value range.'
+        hps[:, pos] = column
+    infos = [res["info"] for res in db["result"].values]
+    test_scores = pd.DataFrame([res['test_scores'] for res in infos])
+    arrays = {
+        "hps": hps,
+        "seeds": db["seed"].to_numpy().astype(np.int64),
+        "val_loss": np.array([1 - res['val_scores']['acc'] for res in infos], dtype=np.float64),
+        "cost": np.array([res['model_cost'] + res['val_costs']['acc'] for res in infos], dtype=np.float64),
+        "test_scores": test_scores.to_numpy(dtype=np.float64),
+    }
+    meta = {"version": COMPACT_FORMAT_VERSION, "hp_names": hp_names, "test_keys": list(test_scores.columns),
+            "n_rows": len(db)}
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, COMPACT_META_FILENAME), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # written by another process in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_compact(path):
+    # arrays of a table written by export_compact, memory-mapped, and its meta data
+    with open(os.path.join(path, COMPACT_META_FILENAME)) as f:
+        meta = json.load(f)
+    assert meta["version"] == COMPACT_FORMAT_VERSION, f'{path} was written by another version, remove it to rebuild it.'
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+              for name in ["hps", "seeds", "val_loss", "cost", "test_scores"]}
+    return arrays, meta
 
 
 class AbstractBench(metaclass=ABCMeta):
@@ -85,52 +144,86 @@ class HPOBench(AbstractBench):
         self.order_list  = order_list_info[model_name]
         budget_name, budget_value = budget_tuple_info[model_name]
         data_path         = os.path.join(DATA_DIR_NAME, "hpo-bench-%s" % model_name, str(dataset_id), f"{model_name}_{dataset_id}_data.parquet.gzip")
-        db                = pd.read_parquet(data_path, filters=[(budget_name, "==", budget_value),('subsample', "==", 1.0)])
-        self._db          = db.drop([budget_name, "subsample"], axis = 1)
         #self._rng         = np.random.RandomState(seed)
         self._value_range = VALUE_RANGES[f"hpo-bench-{model_name}"]
+        table_path        = compact_path(data_path)
+        if not os.path.isdir(table_path):
+            # the parquet file is only read the first time, to write the preprocessed table
+            db = pd.read_parquet(data_path, filters=[(budget_name, "==", budget_value),('subsample', "==", 1.0)])
+            export_compact(db.drop([budget_name, "subsample"], axis = 1), self._value_range, table_path)
+        self._build_index(*load_compact(table_path))
 
     def ordinal_to_real(self, config):
         return {key: self._value_range[key][config[key]] for key in config.keys()}
 
-    def _search_dataframe(self, row_dict, df):
-        # https://stackoverflow.com/a/46165056/8363967
-        mask = np.array([True] * df.shape[0])
-
-        for i, param in enumerate(df.drop(columns=["result"], axis=1).columns):
-            mask *= df[param].values == row_dict[param]
-        idx = np.where(mask)
-        assert len(idx) == 1, 'The query has resulted into mulitple matches. This should not happen. ' \
-                              f'The Query was {row_dict}'
-        idx = idx[0][0]
-        result = df.iloc[idx]["result"]
-        return result
-    
+    def _build_index(self, arrays, meta):
+        # hashed index from (hyperparameter indices..., seed) to row position, built once at load time, over the
+        # arrays of the preprocessed table (see export_compact): validation loss, cost and test scores per row
+        self._hp_names = meta["hp_names"]
+        self._codes = {name: {value: code for code, value in enumerate(self._value_range[name])}
+                       for name in self._hp_names}
+        hps = np.asarray(arrays["hps"])
+        keys = zip(*[hps[:, pos].tolist() for pos in range(len(self._hp_names))], arrays["seeds"].tolist())
+        self._row_index = {key: row for row, key in enumerate(keys)}
+        assert len(self._row_index) == meta["n_rows"], 'Some rows of the table have the same hyperparameters and seed.'
+        self._val_loss = arrays["val_loss"]
+        self._cost = arrays["cost"]
+        self._test_scores = {key: arrays["test_scores"][:, pos] for pos, key in enumerate(meta["test_keys"])}
+
+    def _row_of(self, config, seed):
+        key = tuple(self._codes[name].get(config[name]) for name in self._hp_names) + (seed,)
+        try:
+            return self._row_index[key]
+        except KeyError:
+            raise KeyError(f'The query {config} with seed {seed} is not in the table.')
+
     def complete_call(self, config):
-        #_config = config.copy()
-        key_path = config.copy()
-        loss      = []
-        test_info = {}
         time_init = time.time()
-        idx = 0
-        for seed in SEEDS:
-            key_path["seed"] = seed
-            res = self._search_dataframe(key_path, self._db)
-            loss.append(1 - res["info"]['val_scores']['acc'])
-            for key in res["info"]['test_scores'].keys():
-                if idx == 0:
-                    test_info[key]  = res["info"]['test_scores'][key]* 1.0 / len(SEEDS)
-                else:
-                    test_info[key] += res["info"]['test_scores'][key] * 1.0 / len(SEEDS)
-            key_path.pop("seed")
-            idx += 1
-        loss = np.mean(loss)
+        rows = [self._row_of(config, seed) for seed in SEEDS]
+        loss = np.mean(self._val_loss[rows])
+        test_info = {key: np.mean(scores[rows]) for key, scores in self._test_scores.items()}
         time_final = time.time()
         test_info['generalization_score'] = test_info['acc']
         test_info['time_init']  = time_init
         test_info['time_final'] = time_final 
         return loss, test_info  
 
+    def ordinal_to_real_batch(self, configs):
+        # configs: DataFrame of ordinal configs, or array of shape [n, len(order_list)] with columns in order_list order
+        if not isinstance(configs, pd.DataFrame):
+            configs = pd.DataFrame(np.atleast_2d(configs), columns=self.order_list)
+        return pd.DataFrame({key: np.asarray(self._value_range[key])[configs[key].to_numpy().astype(int)]
+                             for key in self.order_list})
+
+    def complete_call_batch(self, configs):
+        # complete_call for many real-valued configs (DataFrame), rows of all configs and seeds in one array
+        time_init = time.time()
+        rows = np.array([[self._row_of(config, seed) for seed in SEEDS] for config in configs.to_dict("records")],
+                        dtype=np.int64).reshape(len(configs), len(SEEDS))
+        # mean over seeds, and cost summed over seeds as in HPOBench
+        losses = self._val_loss[rows].mean(axis=1)
+        costs = self._cost[rows].sum(axis=1)
+        test_info = pd.DataFrame({key: scores[rows].mean(axis=1) for key, scores in self._test_scores.items()})
+        time_final = time.time()
+        test_info['generalization_score'] = test_info['acc']
+        test_info['time_init'] = time_init
+        test_info['time_final'] = time_final
+        return losses, costs, test_info
+
+    def call_batch(self, configs):
+        """
+        Evaluates many ordinal configs with one array lookup, see ordinal_to_real_batch for configs. Like __call__,
+        the results are added to all_results.
+
+        :return: Arrays of validation losses and costs, one entry per config
+        """
+        new_configs = self.ordinal_to_real_batch(configs)
+        losses, costs, test_info = self.complete_call_batch(new_configs)
+        for key in new_configs.columns:
+            test_info[key] = new_configs[key].to_numpy()
+        self.all_results += test_info.to_dict("records")
+        return losses, costs
+
     def call_and_add_ordinal(self, config):
         loss, _ = self.complete_call(config)
         return loss
@@ -34,12 +34,23 @@ def config2array(eval_config: Dict[str, float], R: float) -> np.ndarray:
     return np.array(list(eval_config.values())) * R
 
 
+def batch2array(X: np.ndarray, R: float) -> np.ndarray:
+    # X: configs as rows, columns in the order of eval_config, shape = (N, dim)
+    return np.atleast_2d(np.asarray(X, dtype=np.float64)) * R
+
+
 class AbstractFunc(metaclass=ABCMeta):
     @classmethod
     @abstractmethod
     def func(cls, eval_config: Dict[str, float]) -> float:
         raise NotImplementedError
 
+    @classmethod
+    @abstractmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        # func for each row of X (shape = (N, dim)) in one vectorized call
+        raise NotImplementedError
+
     @classmethod
     @abstractmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
@@ -57,6 +68,11 @@ class Sphere(AbstractFunc):
         vals = config2array(eval_config, cls._R)
         return np.sum(vals**2)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, cls._R)
+        return np.sum(vals**2, axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -78,6 +94,14 @@ class Styblinski(AbstractFunc):
         t3 = 5 * np.sum(vals)
         return 0.5 * (t1 + t2 + t3)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        t1 = np.sum(vals**4, axis=1)
+        t2 = -16 * np.sum(vals**2, axis=1)
+        t3 = 5 * np.sum(vals, axis=1)
+        return 0.5 * (t1 + t2 + t3)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -103,6 +127,15 @@ class Rastrigin(AbstractFunc):
         t3 = -10 * np.sum(np.cos(2 * np.pi * vals))
         return t1 + t2 + t3
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        dim = vals.shape[1]
+        t1 = 10 * dim
+        t2 = np.sum(vals**2, axis=1)
+        t3 = -10 * np.sum(np.cos(2 * np.pi * vals), axis=1)
+        return t1 + t2 + t3
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -122,6 +155,11 @@ class Schwefel(AbstractFunc):
         vals = config2array(eval_config, R=cls._R)
         return -np.sum(vals * np.sin(np.sqrt(np.abs(vals))))
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        return -np.sum(vals * np.sin(np.sqrt(np.abs(vals))), axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -144,6 +182,13 @@ class Ackley(AbstractFunc):
         t2 = -np.exp(np.mean(np.cos(2 * np.pi * vals)))
         return 20 + np.e + t1 + t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        t1 = -20 * np.exp(-0.2 * np.sqrt(np.mean(vals**2, axis=1)))
+        t2 = -np.exp(np.mean(np.cos(2 * np.pi * vals), axis=1))
+        return 20 + np.e + t1 + t2
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -166,6 +211,14 @@ class Griewank(AbstractFunc):
         t2 = -np.prod(np.cos(vals / np.sqrt(np.arange(1, dim + 1))))
         return 1 + t1 + t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        dim = vals.shape[1]
+        t1 = np.sum(vals**2, axis=1) / 4000
+        t2 = -np.prod(np.cos(vals / np.sqrt(np.arange(1, dim + 1))), axis=1)
+        return 1 + t1 + t2
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -194,6 +247,19 @@ class Perm(AbstractFunc):
 
         return ret
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        dim = vals.shape[1]
+        indices = np.arange(dim) + 1
+        ret = np.zeros(vals.shape[0])
+        for d in indices:
+            center = (1 / indices) ** d
+            factor = vals**d
+            ret += ((factor - center) @ (indices + cls._beta)) ** 2
+
+        return ret
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -217,6 +283,14 @@ class KTablet(AbstractFunc):
         vals[k:] *= 100
         return np.sum(vals**2)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        dim = vals.shape[1]
+        k = (dim + 3) // 4
+        vals[:, k:] *= 100
+        return np.sum(vals**2, axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -236,6 +310,12 @@ class WeightedSphere(AbstractFunc):
         weights = np.arange(dim) + 1
         return weights @ (vals**2)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        weights = np.arange(vals.shape[1]) + 1
+        return (vals**2) @ weights
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -255,6 +335,13 @@ class Rosenbrock(AbstractFunc):
         t2 = np.sum((vals[:-1] - 1) ** 2)
         return t1 + t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        t1 = np.sum(100 * (vals[:, 1:] - vals[:, :-1] ** 2) ** 2, axis=1)
+        t2 = np.sum((vals[:, :-1] - 1) ** 2, axis=1)
+        return t1 + t2
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -274,6 +361,12 @@ class DifferentPower(AbstractFunc):
         indices = np.arange(dim) + 2
         return np.sum(np.abs(vals) ** indices)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        indices = np.arange(vals.shape[1]) + 2
+        return np.sum(np.abs(vals) ** indices, axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -291,6 +384,11 @@ class XinSheYang(AbstractFunc):
         vals = config2array(eval_config, R=cls._R)
         return np.sum(np.abs(vals)) * np.exp(-np.sum(np.sin(vals**2)))
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        return np.sum(np.abs(vals), axis=1) * np.exp(-np.sum(np.sin(vals**2), axis=1))
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -312,6 +410,15 @@ class Levy(AbstractFunc):
         t3 = np.sum((weights[:-1] - 1) ** 2 * (1 + 10 * np.sin(np.pi * weights[:-1] + 1) ** 2))
         return t1 + t2 + t3
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        weights = 1 + (vals - 1) / 4
+        t1 = np.sin(np.pi * weights[:, 0]) ** 2
+        t2 = (weights[:, -1] - 1) ** 2 * (1 + np.sin(2 * np.pi * weights[:, -1]) ** 2)
+        t3 = np.sum((weights[:, :-1] - 1) ** 2 * (1 + 10 * np.sin(np.pi * weights[:, :-1] + 1) ** 2), axis=1)
+        return t1 + t2 + t3
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -336,6 +443,13 @@ class Michalewicz(AbstractFunc):
         t2 = np.sin((np.arange(len(eval_config)) + 1) * (vals ** 2) / np.pi) ** 20
         return - t1 @ t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R) + cls._R
+        t1 = np.sin(vals)
+        t2 = np.sin((np.arange(vals.shape[1]) + 1) * (vals ** 2) / np.pi) ** 20
+        return - np.sum(t1 * t2, axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X + cls._R
@@ -358,6 +472,14 @@ class Trid(AbstractFunc):
         t2 = vals[:-1] @ vals[1:]
         return t1 - t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        R = np.shape(X)[1] ** 2
+        vals = batch2array(X, R=R)
+        t1 = np.sum((vals - 1) ** 2, axis=1)
+        t2 = np.sum(vals[:, :-1] * vals[:, 1:], axis=1)
+        return t1 - t2
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = 4 * X
@@ -378,6 +500,14 @@ class DixonPrice(AbstractFunc):
         t2 = np.arange(2, d + 1) @ (2 * vals[1:] ** 2 - vals[:-1]) ** 2
         return t1 + t2
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        d = vals.shape[1]
+        t1 = (vals[:, 0] - 1) ** 2
+        t2 = (2 * vals[:, 1:] ** 2 - vals[:, :-1]) ** 2 @ np.arange(2, d + 1)
+        return t1 + t2
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X
@@ -406,6 +536,20 @@ class Powell(AbstractFunc):
         t4 = np.sum(10 * (x1 - x4) ** 4)
         return t1 + t2 + t3 + t4
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R)
+        size = vals.shape[1] // 4
+        x1 = vals[:, ::4][:, :size]  # 4i - 3
+        x2 = vals[:, 1::4][:, :size]  # 4i - 2
+        x3 = vals[:, 2::4][:, :size]  # 4i - 1
+        x4 = vals[:, 3::4][:, :size]  # 4i
+        t1 = np.sum((x1 + 10 * x2) ** 2, axis=1)
+        t2 = np.sum(5 * (x3 - x4) ** 2, axis=1)
+        t3 = np.sum((x2 + 2 * x3) ** 4, axis=1)
+        t4 = np.sum(10 * (x1 - x4) ** 4, axis=1)
+        return t1 + t2 + t3 + t4
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         raise NotImplementedError("2D function is not defined")
@@ -427,6 +571,17 @@ class Langermann(AbstractFunc):
         exps = np.sum((vals - A) ** 2, axis=-1)
         return (C * np.exp(- 1 / np.pi * exps)) @ np.cos(np.pi * exps)
 
+    @classmethod
+    def func_batch(cls, X: np.ndarray) -> np.ndarray:
+        vals = batch2array(X, R=cls._R) + cls._R
+        dim = vals.shape[1]
+        m = 5
+        rng = np.random.RandomState(42)
+        C = rng.randint(low=1, high=5, size=m).astype(np.float64)
+        A = rng.randint(low=1, high=10, size=(m, dim)).astype(np.float64)
+        exps = np.sum((vals[:, np.newaxis, :] - A) ** 2, axis=-1)  # shape = (N, m)
+        return np.sum(C * np.exp(- 1 / np.pi * exps) * np.cos(np.pi * exps), axis=1)
+
     @classmethod
     def func2d(cls, X: np.ndarray, Y: np.ndarray) -> np.ndarray:
         x = cls._R * X + cls._R
@@ -1,7 +1,9 @@
+import itertools
 import json
 import os
+import shutil
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict, Final, List, Optional, Union
+from typing import Callable, Dict, Final, List, Optional, Union
 
 import ConfigSpace as CS
 import h5py
@@ -16,11 +18,51 @@ import pyarrow.parquet as pq  # type: ignore
 
 DATA_DIR_NAME = os.path.join(os.environ["HOME"], "hpo_benchmarks")
 SEEDS: Final = [665, 1319, 7222, 7541, 8916]
+COMPACT_FORMAT_VERSION: Final = 1
 import pdb
 pdb.set_trace()
 VALUE_RANGES = json.load(open("tpe/utils/tabular_benchmarks.json"))
 
 
+def _grid_index(value_range: Dict[str, List[Union[int, float, str]]], config: Dict[str, Union[int, str]]) -> int:
+    # position of an ordinal config in the grid of all combinations of value_range, last key varying fastest, also
+    # for arrays of ordinal values
+    idx = 0
+    for name, choices in value_range.items():
+        idx = idx * len(choices) + (config[name] if isinstance(config[name], np.ndarray) else int(config[name]))
+    return idx
+
+
+def _export_compact(path: str, table: np.ndarray) -> None:
+    # the table is written to a temporary directory which is renamed, so that readers never see a partial table
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "table.npy"), table)
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"version": COMPACT_FORMAT_VERSION, "shape": list(table.shape)}, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # written by another process in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _load_compact(path: str, build: Callable[[], np.ndarray]) -> np.ndarray:
+    """
+    Memory-maps the preprocessed table in the directory path, a float array with one row per position in the grid of
+    ordinal configs (see _grid_index) and one column per seed. The first time, the table is built from the raw data
+    by build and written to path, so that the raw data is only read once.
+    """
+    if not os.path.isdir(path):
+        _export_compact(path, build())
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"{path} was written by another version, remove it to rebuild it")
+    return np.load(os.path.join(path, "table.npy"), mmap_mode="r")
+
+
 class AbstractBench(metaclass=ABCMeta):
     _rng: np.random.RandomState
     _value_range: Dict[str, List[Union[int, float, str]]]
@@ -67,41 +109,35 @@ class HPOBench(AbstractBench):
         self.dataset_name, dataset_id = dataset_info[dataset_id]
         budget_name = "iter"
         data_path = os.path.join(DATA_DIR_NAME, "hpo-bench", str(dataset_id), f"nn_{dataset_id}_data.parquet.gzip")
-        db = pq.read_table(data_path, filters=[(budget_name, "==", 243)])
-        self._db = db.drop([budget_name, "subsample"])
         self._rng = np.random.RandomState(seed)
         self._value_range = VALUE_RANGES["hpo-bench"]
-        self._cache: Dict[int, float] = {}
-
-    def _validate_query(self, query: Dict[str, Any], config: Dict[str, Union[int, float]]) -> None:
-        if len(query["__index_level_0__"]) != 1:
-            raise ValueError(f"There must be only one row for config={config}, but got query={query}")
-
-        queried_config = {k: query[k][0] for k in config.keys()}
-        if not all(np.isclose(queried_config[k], v, rtol=1e-3) for k, v in config.items()):
-            raise ValueError(f"The query must have the identical config as {config}, but got {queried_config}")
+        compact_path = data_path.split(".parquet")[0] + "_compact"
+        self._db = _load_compact(compact_path, lambda: self._build_table(data_path, budget_name))
+
+    def _build_table(self, data_path: str, budget_name: str) -> np.ndarray:
+        # 1 - balanced validation accuracy per config and seed, the first row of the table for each of them
+        db = pq.read_table(data_path, filters=[(budget_name, "==", 243)]).to_pydict()
+        config: Dict[str, np.ndarray] = {}
+        for k, choices in self._value_range.items():
+            # the values of the table match the value range up to rounding
+            values, choices = np.asarray(db[k], dtype=np.float64), np.asarray(choices, dtype=np.float64)
+            config[k] = np.argmin(np.abs(values[:, None] - choices[None, :]), axis=1)
+            if not np.all(np.isclose(choices[config[k]], values, rtol=1e-3)):
+                raise ValueError(f"Some values of {k} are not in the value range {choices.tolist()}")
+        seed_idx = np.array([SEEDS.index(seed) for seed in db["seed"]])
+        loss = np.array([1.0 - result["info"]["val_scores"]["bal_acc"] for result in db["result"]])
+        table = np.full((int(np.prod([len(choices) for choices in self._value_range.values()])), len(SEEDS)), np.nan)
+        _, rows = np.unique(_grid_index(self._value_range, config) * len(SEEDS) + seed_idx, return_index=True)
+        table.reshape(-1)[_grid_index(self._value_range, config)[rows] * len(SEEDS) + seed_idx[rows]] = loss[rows]
+        return table
 
     def __call__(self, config: Dict[str, int]) -> float:
-        _config = config.copy()
-        _config["seed"] = SEEDS[self._rng.randint(len(SEEDS))]
-        KEY_ORDER = ["alpha", "batch_size", "depth", "learning_rate_init", "width", "seed"]
-
-        assert len(_config) == len(KEY_ORDER)
-        idx = 0
-        eval_config: Dict[str, Union[int, float]] = {}
-        for k in KEY_ORDER:
-            true_val = self._value_range[k][_config[k]] if k != "seed" else _config[k]
-            assert not isinstance(true_val, str)  # mypy redefinition
-            eval_config[k] = true_val
-            idx = self._db[k].index(true_val, start=idx).as_py()
-
-        if idx in self._cache:
-            return self._cache[idx]
-
-        query = self._db.take([idx]).to_pydict()
-        self._validate_query(query, eval_config)
-        self._cache[idx] = 1.0 - query["result"][0]["info"]["val_scores"]["bal_acc"]
-        return self._cache[idx]
+        seed_idx = self._rng.randint(len(SEEDS))
+        assert len(config) == len(self._value_range)
+        loss = float(self._db[_grid_index(self._value_range, config), seed_idx])
+        if np.isnan(loss):
+            raise ValueError(f"There is no row for config={config} and seed={SEEDS[seed_idx]}")
+        return loss
 
     @property
     def config_space(self) -> CS.ConfigurationSpace:
@@ -127,14 +163,24 @@ class HPOLib(AbstractBench):
             "parkinsons_telemonitoring",
         ][dataset_id]
         data_path = os.path.join(DATA_DIR_NAME, "hpolib", f"fcnet_{self.dataset_name}_data.hdf5")
-        self._db = h5py.File(data_path, "r")
         self._rng = np.random.RandomState(seed)
         self._value_range = VALUE_RANGES["hpolib"]
+        compact_path = os.path.join(DATA_DIR_NAME, "hpolib", f"fcnet_{self.dataset_name}_data_compact")
+        self._db = _load_compact(compact_path, lambda: self._build_table(data_path))
+
+    def _build_table(self, data_path: str) -> np.ndarray:
+        # validation mse after the last epoch of the 4 runs, per config of the grid
+        db = h5py.File(data_path, "r")
+        table = np.empty((int(np.prod([len(choices) for choices in self._value_range.values()])), 4))
+        for idx, codes in enumerate(itertools.product(*[range(len(choices)) for choices in self._value_range.values()])):
+            config = {k: self._value_range[k][code] for k, code in zip(self._value_range, codes)}
+            table[idx] = db[json.dumps(config, sort_keys=True)]["valid_mse"][:, 99]
+        db.close()
+        return table
 
     def __call__(self, config: Dict[str, Union[int, str]]) -> float:
         idx = self._rng.randint(4)
-        key = json.dumps({k: self._value_range[k][int(v)] for k, v in config.items()}, sort_keys=True)
-        return np.log(self._db[key]["valid_mse"][idx][99])
+        return np.log(self._db[_grid_index(self._value_range, config), idx])
 
     @property
     def config_space(self) -> CS.ConfigurationSpace:
@@ -153,22 +199,33 @@ class NASHPOBench2(AbstractBench):
     ):
         self.dataset_name = ["cifar10_nashpobench2"][dataset_id]
         data_path = os.path.join(DATA_DIR_NAME, "nashpobench2")
-        self._db = NASHPOBench2API(data_path)
         self._rng = np.random.RandomState(seed)
         self._value_range = VALUE_RANGES["nashpobench2"]
+        compact_path = os.path.join(DATA_DIR_NAME, "nashpobench2_compact")
+        self._db = _load_compact(compact_path, lambda: self._build_table(data_path))
+
+    def _build_table(self, data_path: str) -> np.ndarray:
+        # validation error after 200 epochs for the seeds 222, 555 and 888, per config of the grid
+        api = NASHPOBench2API(data_path)
+        table = np.empty((int(np.prod([len(choices) for choices in self._value_range.values()])), 3))
+        for idx, codes in enumerate(itertools.product(*[range(len(choices)) for choices in self._value_range.values()])):
+            config = dict(zip(self._value_range, codes))
+            ops = [config[f"Op{i}"] for i in range(1, 7)]
+            cellcode = f"{ops[0]}|{ops[1]}{ops[2]}|{ops[3]}{ops[4]}{ops[5]}"
+            for seed_idx, seed in enumerate([222, 555, 888]):
+                results = api.query_by_key(
+                    cellcode=cellcode,
+                    batch_size=self._value_range["batch_size"][config["batch_size"]],
+                    lr=self._value_range["lr"][config["lr"]],
+                    seed=seed,
+                    epoch=200,
+                )
+                table[idx, seed_idx] = 100.0 - results[0]
+        return table
 
     def __call__(self, config: Dict[str, Union[int, str]]) -> float:
-        idx = [222, 555, 888][self._rng.randint(3)]
-        ops = [config[f"Op{i}"] for i in range(1, 7)]
-        cellcode = f"{ops[0]}|{ops[1]}{ops[2]}|{ops[3]}{ops[4]}{ops[5]}"
-        results = self._db.query_by_key(
-            cellcode=cellcode,
-            batch_size=self._value_range["batch_size"][config["batch_size"]],
-            lr=self._value_range["lr"][config["lr"]],
-            seed=idx,
-            epoch=200,
-        )
-        return float(100.0 - results[0])
+        idx = self._rng.randint(3)
+        return float(self._db[_grid_index(self._value_range, config), idx])
 
     @property
     def config_space(self) -> CS.ConfigurationSpace:
@@ -16,7 +16,7 @@ Example for running PASHA on NASBench201
 import logging
 
 from syne_tune.experiments.benchmark_definitions.nas201 import nas201_benchmark
-from syne_tune.blackbox_repository import BlackboxRepositoryBackend
+from syne_tune.experiments.mmap_blackbox import MmapBlackboxRepositoryBackend
 from syne_tune.backend.simulator_backend.simulator_callback import SimulatorCallback
 from syne_tune.optimizer.baselines import PASHA
 from syne_tune import Tuner, StoppingCriterion
@@ -31,9 +31,10 @@ if __name__ == "__main__":
     dataset_name = "cifar10"
     benchmark = nas201_benchmark(dataset_name)
 
-    # simulator backend specialized to tabulated blackboxes
+    # simulator backend specialized to tabulated blackboxes. The tables are
+    # memory-mapped, so that runs started in parallel share one copy
     max_resource_attr = benchmark.max_resource_attr
-    trial_backend = BlackboxRepositoryBackend(
+    trial_backend = MmapBlackboxRepositoryBackend(
         blackbox_name=benchmark.blackbox_name,
         elapsed_time_attr=benchmark.elapsed_time_attr,
         max_resource_attr=max_resource_attr,
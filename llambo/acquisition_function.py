@@ -1,19 +1,23 @@
 import time
 import openai
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from aiohttp import ClientSession
 from langchain import FewShotPromptTemplate
 from langchain import PromptTemplate
 from llambo.rate_limiter import RateLimiter
+from llambo.llm_client import LLMClient
+from llambo.llm_scheduler import CRITICAL
 import ollama
 
 
 class LLM_ACQ:
     def __init__(self, task_context, n_candidates, n_templates, lower_is_better,
                  jitter=False, rate_limiter=None, warping_transformer=None, chat_engine=None,
-                 prompt_setting=None, shuffle_features=False, client=None, ):
+                 prompt_setting=None, shuffle_features=False, client=None, llm=None,
+                 coalesce_requests=False, request_priority=CRITICAL, request_deadline=None, canonicalize=None):
         '''Initialize the LLM Acquisition function.'''
         self.task_context = task_context
         self.n_candidates = n_candidates
@@ -35,6 +39,18 @@ class LLM_ACQ:
         self.prompt_setting = prompt_setting
         self.shuffle_features = shuffle_features
         self.client = client
+        if llm is None:
+            self.llm = LLMClient(client, model='gpt-4o-mini', rate_limiter=self.rate_limiter)
+        else:
+            self.llm = llm
+        # candidate sampling relies on independent generations, so identical prompts are not coalesced by default
+        self.coalesce_requests = coalesce_requests
+        # the next trial is blocked on candidate generation, so it is on the critical path of the scheduler
+        self.request_priority = request_priority
+        self.request_deadline = request_deadline
+        # maps a config to a key shared by all equivalent configs (e.g. nb201.canonical_id), candidates are
+        # de-duplicated on it instead of on their values
+        self.canonicalize = canonicalize
 
         assert type(self.shuffle_features) == bool, 'shuffle_features must be a boolean'
 
@@ -355,8 +371,29 @@ Hyperparameter configuration:"""
 
         return response_json
 
+    def _candidate_key(self, point):
+        '''Key on which candidates are de-duplicated, the canonical key if canonicalize is set.'''
+        if self.canonicalize is not None:
+            try:
+                return 'canonical', self.canonicalize(point)
+            except (AssertionError, KeyError, ValueError):
+                # e.g. an invalid value proposed by the LLM, fall back to the values
+                pass
+        return tuple(sorted(point.items()))
+
     def _filter_candidate_points(self, observed_points, candidate_points, precision=8):
         '''Filter candidate points that already exist in observed points. Also remove duplicates.'''
+        if self.canonicalize is not None:
+            # drop points equivalent to observed points or to earlier candidates
+            seen_keys = {self._candidate_key(d) for d in observed_points}
+            filtered_candidates = []
+            for d in candidate_points:
+                key = self._candidate_key(d)
+                if key not in seen_keys:
+                    seen_keys.add(key)
+                    filtered_candidates.append(d)
+            return pd.DataFrame(filtered_candidates).reset_index(drop=True)
+
         # drop points that already exist in observed points
         observed_tuples = [tuple(sorted(d.items())) for d in observed_points]
 
@@ -451,8 +488,11 @@ Hyperparameter configuration:"""
                 response_content = response.split('##')[1].strip()
                 candidate_points.append(self._convert_to_json(response_content))
 
-            proposed_points = self._filter_candidate_points(observed_configs.to_dict(orient='records'),
-                                                            candidate_points)
+            observed_points = observed_configs.to_dict(orient='records')
+            if self.canonicalize is not None:
+                # candidates accepted in earlier attempts count as observed
+                observed_points += filtered_candidate_points.to_dict(orient='records')
+            proposed_points = self._filter_candidate_points(observed_points, candidate_points)
             filtered_candidate_points = pd.concat([filtered_candidate_points, proposed_points], ignore_index=True)
             number_candidate_points = filtered_candidate_points.shape[0]
 
@@ -480,30 +520,30 @@ Hyperparameter configuration:"""
 
     def generate_response(self, user_message):
         # resp = ollama.chat(model="llama3", messages=[{'role': 'user', 'content': user_message}])
-        messages = []
-        messages.append({"role": "system", "content": "You are an AI assistant that helps people find information."})
-        messages.append({"role": "user", "content": user_message})
-
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
+        response = self.llm.chat(
+            user_message,
             temperature=0.7,
             max_tokens=4000,
             top_p=0.95,
             n=max(5, 3),  # e.g. for 5 templates, get 2 generations per template
-            timeout=100
+            timeout=100,
+            coalesce=self.coalesce_requests,
+            priority=self.request_priority,
+            deadline=self.request_deadline
         )
         return response
 
     def generate_responses(self, prompt_templates, query_templates):
         tasks = []
         for (prompt_template, query_template) in zip(prompt_templates, query_templates):
-            tasks.append(self.generate_response(prompt_template.format(A=query_template[0]['A'])))
+            tasks.append(prompt_template.format(A=query_template[0]['A']))
 
         assert len(tasks) == int(self.n_templates)
         results = [None] * len(tasks)
 
-        llm_response = tasks
+        # send the prompts of all templates together
+        with ThreadPoolExecutor(max_workers=max(len(tasks), 1)) as executor:
+            llm_response = list(executor.map(self.generate_response, tasks))
 
         for idx, response in enumerate(llm_response):
             if response is not None:
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+
+class BatchEvaluator:
+    '''
+    Runs bbox_eval_f on several configurations concurrently and yields the results as they complete.
+
+    With executor='process' the evaluations run in separate processes, bbox_eval_f must then be picklable
+    (a module-level function, not a lambda or closure). With n_workers=1 configurations are evaluated inline.
+
+    With canonicalize (a function mapping a config to a key shared by all equivalent configs, e.g.
+    nb201.canonical_id), bbox_eval_f runs once per key: configs equivalent to one evaluated before, or to another
+    config of the same call, are served the cached results.
+    '''
+    def __init__(self, bbox_eval_f, n_workers=1, executor='thread', canonicalize=None):
+        assert n_workers >= 1, 'n_workers must be at least 1'
+        assert executor in ['thread', 'process'], 'executor must be either thread or process'
+        self.bbox_eval_f = bbox_eval_f
+        self.n_workers = n_workers
+        self.executor_type = executor
+        self._executor = None
+        self.canonicalize = canonicalize
+        self._cache = {}  # canonical key -> eval_results
+        self.n_cache_hits = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.n_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        return self._executor
+
+    def evaluate(self, configs):
+        '''Evaluate a list of config dicts, yields (index, eval_config, eval_results) in completion order.'''
+        if self.canonicalize is None:
+            yield from self._evaluate(configs)
+            return
+
+        # one evaluation per canonical key, shared by all configs with that key
+        groups = {}  # canonical key -> indices of configs
+        for idx, config in enumerate(configs):
+            key = self.canonicalize(config)
+            if key in self._cache:
+                self.n_cache_hits += 1
+                yield idx, config, dict(self._cache[key])
+            else:
+                groups.setdefault(key, []).append(idx)
+        keys = list(groups)
+        for pos, eval_config, eval_results in self._evaluate([configs[groups[key][0]] for key in keys]):
+            key = keys[pos]
+            self._cache[key] = eval_results
+            first, *others = groups[key]
+            yield first, eval_config, eval_results
+            for idx in others:
+                self.n_cache_hits += 1
+                yield idx, configs[idx], dict(eval_results)
+
+    def _evaluate(self, configs):
+        if self.n_workers == 1 or len(configs) == 1:
+            for idx, config in enumerate(configs):
+                yield (idx,) + tuple(self.bbox_eval_f(config))
+            return
+
+        executor = self._get_executor()
+        futures = {executor.submit(self.bbox_eval_f, config): idx for idx, config in enumerate(configs)}
+        for future in as_completed(futures):
+            yield (futures[future],) + tuple(future.result())
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+
+def config_distances(hyperparameter_constraints: dict, configs: pd.DataFrame, reference: dict):
+    '''
+    Distance in [0, 1] between each configuration and a reference configuration: mean over hyperparameters of
+    the mismatch for categorical ones and the absolute difference scaled by the range (in log space for log
+    hyperparameters) for numerical ones.
+    '''
+    distances = np.zeros(configs.shape[0])
+    for name in configs.columns:
+        hyp_type, transform, bounds = hyperparameter_constraints[name]
+        values = configs[name].to_numpy()
+        if hyp_type == 'categorical':
+            distances += (values != reference[name]).astype(float)
+            continue
+        values = values.astype(float)
+        ref = float(reference[name])
+        lower, upper = float(bounds[0]), float(bounds[-1])
+        if transform == 'log':
+            values, ref, lower, upper = np.log10(values), np.log10(ref), np.log10(lower), np.log10(upper)
+        distances += np.minimum(np.abs(values - ref) / max(upper - lower, 1e-12), 1.0)
+    return distances / configs.shape[1]
+
+
+def select_diverse(scores, candidate_configs: pd.DataFrame, hyperparameter_constraints: dict, q,
+                   diversity_penalty=1.0):
+    '''
+    Greedily pick q candidates by score, penalizing candidates close to the ones already picked.
+
+    The score of a candidate is scaled by 1 - diversity_penalty * (1 - d), where d is its distance to the
+    nearest picked candidate. With diversity_penalty=1 a duplicate of a picked point gets score 0, with 0 this
+    is plain top-q. Returns the positional indices of the picked candidates.
+    '''
+    assert 1 <= q <= len(scores), 'q must be between 1 and the number of candidates'
+    assert 0 <= diversity_penalty <= 1, 'diversity_penalty must be between 0 and 1'
+    scores = np.asarray(scores, dtype=float)
+    min_dist = np.ones(len(scores))
+    selected = []
+    for _ in range(q):
+        penalized = scores * (1 - diversity_penalty * (1 - min_dist)) + 1e-12 * min_dist  # ties go to far points
+        penalized[selected] = -np.inf
+        idx = int(np.argmax(penalized))
+        selected.append(idx)
+        reference = candidate_configs.iloc[idx].to_dict()
+        min_dist = np.minimum(min_dist, config_distances(hyperparameter_constraints, candidate_configs, reference))
+    return selected
@@ -0,0 +1,54 @@
+import os
+import pickle
+import random
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, state):
+    '''
+    Atomically write a state dict as a binary pickle: the snapshot is written to a temporary file next to
+    path and moved over it, so a crash while writing never leaves a truncated checkpoint behind.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': CHECKPOINT_VERSION, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    '''Load a state dict written by save_checkpoint, None if there is no checkpoint at path.'''
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    assert checkpoint['version'] == CHECKPOINT_VERSION, \
+        f'checkpoint version {checkpoint["version"]} is not supported, expected {CHECKPOINT_VERSION}'
+    return checkpoint['state']
+
+
+def get_rng_state():
+    '''State of the global RNGs, the prompt builders seed and draw from np.random.'''
+    return {'numpy': np.random.get_state(), 'python': random.getstate()}
+
+
+def set_rng_state(state):
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+
+
+def dumps_state(state):
+    '''Serialize a state dict to bytes, e.g. to embed a LLAMBO snapshot in a searcher state.'''
+    return pickle.dumps({'version': CHECKPOINT_VERSION, 'state': state}, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads_state(data):
+    checkpoint = pickle.loads(data)
+    assert checkpoint['version'] == CHECKPOINT_VERSION, \
+        f'checkpoint version {checkpoint["version"]} is not supported, expected {CHECKPOINT_VERSION}'
+    return checkpoint['state']
@@ -0,0 +1,134 @@
+import numbers
+import numpy as np
+
+
+class TabularConfigIndex:
+    '''
+    Index over the configurations of a tabulated benchmark (e.g. blackbox.all_configurations()), which maps
+    any configuration to its nearest tabulated one. Used to snap LLM proposals onto the table when the
+    searcher may only suggest tabulated configurations (restrict_configurations), instead of discarding them.
+
+    The distance is the number of categorical hyperparameters that differ (Hamming) plus the L1 distance of
+    the numerical ones, each scaled to [0, 1] over the table (on log scale if all its values are positive and
+    span at least two orders of magnitude). A categorical value which is not in the table differs from all
+    rows. Ties go to the first row in the table.
+
+    Rows are marked as used once suggested and are excluded from later lookups.
+    '''
+    def __init__(self, configurations, names=None):
+        assert len(configurations) > 0, 'configurations must not be empty'
+        self.configurations = [dict(config) for config in configurations]
+        self.names = list(configurations[0].keys()) if names is None else list(names)
+        self.categorical_names = []
+        self.numerical_names = []
+        for name in self.names:
+            values = [config[name] for config in configurations]
+            if all(isinstance(value, numbers.Number) and not isinstance(value, bool) for value in values):
+                self.numerical_names.append(name)
+            else:
+                self.categorical_names.append(name)
+
+        # categorical columns as codes into a vocabulary per column
+        self._codes = {}  # column -> {value: code}
+        self._categorical = np.empty((len(configurations), len(self.categorical_names)), dtype=np.int32)
+        for pos, name in enumerate(self.categorical_names):
+            codes = self._codes[name] = {}
+            for row, config in enumerate(configurations):
+                self._categorical[row, pos] = codes.setdefault(config[name], len(codes))
+
+        # numerical columns scaled to [0, 1]
+        self._log_scale = []
+        self._offsets = np.zeros(len(self.numerical_names))
+        self._scales = np.ones(len(self.numerical_names))
+        numerical = np.array([[config[name] for name in self.numerical_names] for config in configurations],
+                             dtype=np.float64).reshape(len(configurations), len(self.numerical_names))
+        for pos, name in enumerate(self.numerical_names):
+            column = numerical[:, pos]
+            log_scale = bool(np.all(column > 0) and column.max() >= 100 * column.min())
+            self._log_scale.append(log_scale)
+            if log_scale:
+                column = np.log(column)
+            self._offsets[pos] = column.min()
+            self._scales[pos] = max(column.max() - column.min(), 1e-12)
+        self._numerical = self._scale(numerical)
+
+        self._rows = {self._key(config): row for row, config in enumerate(configurations)}
+        self.available = np.ones(len(configurations), dtype=bool)
+
+    def __len__(self):
+        return len(self.configurations)
+
+    def _key(self, config):
+        return tuple(config.get(name) for name in self.names)
+
+    def _scale(self, numerical):
+        numerical = np.array(numerical, dtype=np.float64)
+        for pos, log_scale in enumerate(self._log_scale):
+            if log_scale:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    numerical[:, pos] = np.log(numerical[:, pos])
+        return (numerical - self._offsets) / self._scales
+
+    def _encode(self, configs):
+        categorical = np.array([[self._codes[name].get(config.get(name), -1) for name in self.categorical_names]
+                                for config in configs], dtype=np.int32).reshape(len(configs), -1)
+        numerical = []
+        for config in configs:
+            row = []
+            for name in self.numerical_names:
+                value = config.get(name)
+                try:
+                    row.append(float(value))
+                except (TypeError, ValueError):
+                    row.append(np.nan)
+            numerical.append(row)
+        numerical = np.array(numerical, dtype=np.float64).reshape(len(configs), -1)
+        return categorical, self._scale(numerical)
+
+    def distances(self, configs):
+        '''Distances of configs to all tabulated configurations, shape (len(configs), len(self)).'''
+        categorical, numerical = self._encode(configs)
+        dist = (categorical[:, None, :] != self._categorical[None, :, :]).sum(axis=2).astype(np.float64)
+        if self.numerical_names:
+            # a missing or invalid numerical value is as far as the range of its column
+            dist += np.nan_to_num(np.abs(numerical[:, None, :] - self._numerical[None, :, :]), nan=1.0).sum(axis=2)
+        return dist
+
+    def index_of(self, config):
+        '''Row of config in the table, None if it is not tabulated.'''
+        return self._rows.get(self._key(config))
+
+    def nearest(self, configs, distinct=True):
+        '''
+        Rows of the nearest available tabulated configurations, one vectorized lookup for all configs. With
+        distinct=True, configs are served in order and no row is returned twice. -1 where no row is left.
+        '''
+        if len(configs) == 0:
+            return np.empty(0, dtype=np.int64)
+        dist = self.distances(configs)
+        dist[:, ~self.available] = np.inf
+        rows = np.full(len(configs), -1, dtype=np.int64)
+        for pos in range(len(configs)):
+            row = int(np.argmin(dist[pos]))
+            if not np.isfinite(dist[pos, row]):
+                continue
+            rows[pos] = row
+            if distinct:
+                dist[:, row] = np.inf
+        return rows
+
+    def snap(self, config):
+        '''Nearest available tabulated configuration (other keys of config are kept), None if none is left.'''
+        row = self.nearest([config])[0]
+        if row < 0:
+            return None
+        return dict(config, **self.configurations[row])
+
+    def mark_used(self, config):
+        '''Exclude config (a configuration or a row) from later lookups.'''
+        row = config if isinstance(config, numbers.Integral) else self.index_of(config)
+        if row is not None:
+            self.available[row] = False
+
+    def reset(self):
+        self.available[:] = True
@@ -2,11 +2,15 @@ import time
 import openai
 import asyncio
 import re
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from scipy.stats import norm
 from aiohttp import ClientSession
 from llambo.rate_limiter import RateLimiter
 from llambo.discriminative_sm_utils import gen_prompt_tempates
+from llambo.llm_client import LLMClient
+from llambo.llm_scheduler import SPECULATIVE
+from llambo.batch_selection import select_diverse
 import ollama
 
 openai.api_type = ""
@@ -21,7 +25,9 @@ class LLM_DIS_SM:
                  use_recalibration=False,
                  rate_limiter=None, warping_transformer=None,
                  verbose=False, chat_engine=None,
-                 prompt_setting=None, shuffle_features=False, client=None, ):
+                 prompt_setting=None, shuffle_features=False, client=None,
+                 distiller=None, llm=None, cascade=None, coalesce_requests=True,
+                 request_priority=SPECULATIVE, request_deadline=None, ):
         '''Initialize the forward LLM surrogate model. This is modelling p(y|x) as in GP/SMAC etc.'''
         self.task_context = task_context
         self.n_gens = n_gens
@@ -46,10 +52,23 @@ class LLM_DIS_SM:
         self.prompt_setting = prompt_setting
         self.shuffle_features = shuffle_features
         self.client = client
+        if llm is None:
+            self.llm = LLMClient(client, model='gpt-4o-mini', rate_limiter=self.rate_limiter)
+        else:
+            self.llm = llm
+        # identical scoring prompts in flight at the same time share one upstream call
+        self.coalesce_requests = coalesce_requests
+        self.request_priority = request_priority
+        self.request_deadline = request_deadline
+        # optional model cascade, scores with cheap tiers first (see llambo/llm_client.py)
+        self.cascade = cascade
+        # optional local model that takes over scoring from the LLM (see llambo/distillation.py)
+        self.distiller = distiller
+        self.last_selection = None  # (y_mean, y_std) of the points returned by the last select_query_points
 
         assert type(self.shuffle_features) == bool, 'shuffle_features must be a boolean'
 
-    def _async_generate(self, few_shot_template, query_example, query_idx):
+    def _async_generate(self, few_shot_template, query_example, query_idx, llm=None):
         '''Generate a response from the LLM async.'''
         user_message = few_shot_template.format(Q=query_example['Q'])
         responses = []
@@ -61,7 +80,7 @@ class LLM_DIS_SM:
         for pred in range(n_preds):
             for retry in range(MAX_RETRIES):
                 try:
-                    resp = self.generate_response(user_message)
+                    resp = self.generate_response(user_message, llm=llm)
                     break
                 except Exception as e:
                     print(f'[SM] RETRYING LLM REQUEST {retry + 1}/{MAX_RETRIES}...')
@@ -85,17 +104,19 @@ class LLM_DIS_SM:
 
         return query_idx, responses[0]
 
-    def _generate_concurrently(self, few_shot_templates, query_examples):
+    def _generate_concurrently(self, few_shot_templates, query_examples, llm=None):
         '''Perform concurrent generation of responses from the LLM async.'''
 
-        coroutines = []
+        jobs = []
         for template in few_shot_templates:
             for query_idx, query_example in enumerate(query_examples):
-                coroutines.append(self._async_generate(template, query_example, query_idx))
+                jobs.append((template, query_example, query_idx))
 
         results = [[] for _ in range(len(query_examples))]  # nested list
 
-        llm_response = coroutines
+        # one thread per request, so that they are in flight together (and end up in the same batch job)
+        with ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as executor:
+            llm_response = list(executor.map(lambda job: self._async_generate(*job, llm=llm), jobs))
 
         for response in llm_response:
             if response is not None:
@@ -104,7 +125,7 @@ class LLM_DIS_SM:
 
         return results  # format [(resp, tot_cost, tot_tokens), None, (resp, tot_cost, tot_tokens)]
 
-    def _predict(self, all_prompt_templates, query_examples):
+    def _predict(self, all_prompt_templates, query_examples, llm=None):
         start = time.time()
         all_preds = []
 
@@ -113,7 +134,7 @@ class LLM_DIS_SM:
         # make predictions in chunks of 5, for each chunk make concurent calls
         for i in range(0, len(query_examples), 5):
             query_chunk = query_examples[i:i + 5]
-            chunk_results = self._generate_concurrently(all_prompt_templates, query_chunk)
+            chunk_results = self._generate_concurrently(all_prompt_templates, query_chunk, llm=llm)
             bool_pred_returned.extend(
                 [1 if x is not None else 0 for x in chunk_results])  # track effective number of predictions returned
 
@@ -152,6 +173,35 @@ class LLM_DIS_SM:
 
         return y_mean, y_std, success_rate, time_taken
 
+    def _predict_cascade(self, all_prompt_templates, query_examples, observed_fvals):
+        '''Score all candidates with the first tier and escalate uncertain ones to the next tiers.'''
+        if self.lower_is_better:
+            best_fval = np.min(observed_fvals.to_numpy())
+        else:
+            best_fval = np.max(observed_fvals.to_numpy())
+
+        tiers = self.cascade.tiers
+        y_mean, y_std, success_rate, time_taken = self._predict(all_prompt_templates, query_examples, llm=tiers[0])
+        self.cascade.n_scored[0] += len(query_examples)
+        escalated = np.arange(len(query_examples))
+
+        for tier_idx in range(1, len(tiers)):
+            mask = self.cascade.escalate_mask(y_mean[escalated], y_std[escalated], best_fval)
+            escalated = escalated[mask]
+            if len(escalated) == 0:
+                break
+            print(f'[Cascade] Escalating {len(escalated)}/{len(query_examples)} candidate points '
+                  f'to {tiers[tier_idx].name}')
+            tier_mean, tier_std, _, tier_time = self._predict(all_prompt_templates,
+                                                              [query_examples[i] for i in escalated],
+                                                              llm=tiers[tier_idx])
+            y_mean[escalated] = tier_mean
+            y_std[escalated] = tier_std
+            time_taken += tier_time
+            self.cascade.n_scored[tier_idx] += len(escalated)
+
+        return y_mean, y_std, success_rate, time_taken
+
     def _evaluate_candidate_points(self, observed_configs, observed_fvals, candidate_configs,
                                    use_context='full_context', use_feature_semantics=True, return_ei=False):
         '''Evaluate candidate points using the LLM model.'''
@@ -176,6 +226,18 @@ class LLM_DIS_SM:
         all_run_cost += tot_cost
         all_run_time += time_taken
 
+        if self.distiller is not None:
+            self.distiller.add_observations(observed_configs, observed_fvals)
+
+        if self.distiller is not None and self.distiller.use_local():
+            start = time.time()
+            y_mean, y_std = self.distiller.predict(candidate_configs)
+            time_taken = time.time() - start
+            print(f'[Distillation] Scored {len(candidate_configs)} candidate points with the local model '
+                  f'(agreement: {self.distiller.agreement:.3f})')
+            all_run_time += time_taken
+            return self._format_predictions(observed_fvals, y_mean, y_std, all_run_time, return_ei)
+
         all_prompt_templates, query_examples = gen_prompt_tempates(self.task_context, observed_configs, observed_fvals,
                                                                    candidate_configs,
                                                                    n_prompts=self.n_templates,
@@ -190,10 +252,16 @@ class LLM_DIS_SM:
         print(f'Number of query_examples: {len(query_examples)}')
         print(all_prompt_templates[0].format(Q=query_examples[0]['Q']))
 
-        response = self._predict(all_prompt_templates, query_examples)
+        if self.cascade is not None:
+            response = self._predict_cascade(all_prompt_templates, query_examples, observed_fvals)
+        else:
+            response = self._predict(all_prompt_templates, query_examples)
 
         y_mean, y_std, success_rate, time_taken = response
 
+        if self.distiller is not None:
+            self.distiller.add_llm_predictions(candidate_configs, y_mean, y_std)
+
         if self.recalibrator is not None:
             recalibrated_res = self.recalibrator(y_mean, y_std, 0.68)  # 0.68 coverage for 1 std
             y_std = np.abs(recalibrated_res.upper - recalibrated_res.lower) / 2
@@ -201,6 +269,10 @@ class LLM_DIS_SM:
         # all_run_cost += tot_cost
         all_run_time += time_taken
 
+        return self._format_predictions(observed_fvals, y_mean, y_std, all_run_time, return_ei)
+
+    def _format_predictions(self, observed_fvals, y_mean, y_std, all_run_time, return_ei):
+        '''Return predictions, optionally together with their expected improvement.'''
         if not return_ei:
             return y_mean, y_std, all_run_time
 
@@ -220,6 +292,10 @@ class LLM_DIS_SM:
 
     def select_query_point(self, observed_configs, observed_fvals, candidate_configs):
         '''Select the next query point using expected improvement.'''
+        return self.select_query_points(observed_configs, observed_fvals, candidate_configs, q=1)
+
+    def select_query_points(self, observed_configs, observed_fvals, candidate_configs, q=1, diversity_penalty=1.0):
+        '''Select q query points by expected improvement, penalizing points close to already selected ones.'''
 
         # warp
         if self.warping_transformer is not None:
@@ -240,30 +316,36 @@ class LLM_DIS_SM:
 
         ei = np.where(y_std > 0, delta * norm.cdf(Z) + y_std * norm.pdf(Z), 0)
 
-        best_point_index = np.argmax(ei)
-
         # unwarp
         if self.warping_transformer is not None:
             candidate_configs = self.warping_transformer.unwarp(candidate_configs)
 
-        best_point = candidate_configs.iloc[[best_point_index], :]  # return selected point as dataframe not series
+        if q == 1:
+            best_point_indices = [np.argmax(ei)]
+        else:
+            best_point_indices = select_diverse(ei, candidate_configs, self.task_context['hyperparameter_constraints'],
+                                                q, diversity_penalty=diversity_penalty)
 
-        return best_point, time_taken
+        best_points = candidate_configs.iloc[best_point_indices, :]  # return selected points as dataframe
+        # predictions for the selected points, e.g. to fantasize their outcome while they are evaluated
+        self.last_selection = (y_mean[best_point_indices], y_std[best_point_indices])
 
-    def generate_response(self, user_message):
-        # resp = ollama.chat(model="llama3", messages=[{'role': 'user', 'content': user_message}])
-        messages = []
-        messages.append({"role": "system", "content": "You are an AI assistant that helps people find information."})
-        messages.append({"role": "user", "content": user_message})
+        return best_points, time_taken
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
+    def generate_response(self, user_message, llm=None):
+        # resp = ollama.chat(model="llama3", messages=[{'role': 'user', 'content': user_message}])
+        if llm is None:
+            llm = self.llm
+        response = llm.chat(
+            user_message,
             temperature=0.7,
             max_tokens=4000,
             top_p=0.95,
             n=max(5, 3),  # e.g. for 5 templates, get 2 generations per template
-            timeout=100
+            timeout=100,
+            coalesce=self.coalesce_requests,
+            priority=self.request_priority,
+            deadline=self.request_deadline
         )
         return response
 
@@ -24,8 +24,6 @@ def prepare_configurations(
     examples = []
     
     hyperparameter_names = observed_configs.columns
-    observed_configs_ = observed_configs.copy()
-    observed_configs = observed_configs_
     
     # shuffle indices to reduce permutation sensitivity
     if seed is not None:
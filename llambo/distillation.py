@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from sklearn.ensemble import GradientBoostingRegressor
+
+
+class SurrogateDistiller:
+    '''
+    Distill the predictions of the LLM surrogate into a small local regressor.
+
+    Every (configuration, predicted mean/std) pair returned by the LLM is stored together with the real
+    observations. A bootstrap ensemble of gradient-boosted trees is trained on one-hot encoded configurations,
+    and scoring is routed to it once its held-out rank agreement with the LLM exceeds a threshold. The LLM is
+    re-queried every `refresh_every` local rounds to keep the local model honest.
+    '''
+    def __init__(self, hyperparameter_constraints: dict,
+                 n_members=5,  # number of bootstrap members in the ensemble
+                 min_llm_samples=50,  # minimum number of LLM predictions before the local model can take over
+                 agreement_threshold=0.8,  # minimum held-out spearman correlation with the LLM
+                 refresh_every=5,  # number of local scoring rounds before the LLM is queried again
+                 holdout_frac=0.2,  # fraction of LLM predictions held out to measure agreement
+                 observation_weight=5.0,  # sample weight of real observations relative to LLM predictions
+                 seed=0):
+        assert 0 < holdout_frac < 1, 'holdout_frac must be between 0 and 1'
+        assert n_members >= 2, 'need at least 2 ensemble members to estimate uncertainty'
+        self.hyperparameter_constraints = hyperparameter_constraints
+        self.hyperparameter_names = list(hyperparameter_constraints.keys())
+        self.n_members = n_members
+        self.min_llm_samples = min_llm_samples
+        self.agreement_threshold = agreement_threshold
+        self.refresh_every = refresh_every
+        self.holdout_frac = holdout_frac
+        self.observation_weight = observation_weight
+        self.rng = np.random.RandomState(seed)
+
+        self.llm_predictions = {}  # config key -> (y_mean, y_std), latest LLM prediction wins
+        self.observations = {}  # config key -> observed fval
+        self.members = []
+        self.std_model = None
+        self.agreement = np.nan
+        self.n_local_rounds = 0  # local scoring rounds since the last LLM refresh
+        self._dirty = False
+
+    def _key(self, config):
+        return tuple(config[name] for name in self.hyperparameter_names)
+
+    def _encode(self, keys):
+        '''One-hot encode categorical hyperparameters, keep numerical ones as they are.'''
+        keys = list(keys)
+        columns = []
+        for i, name in enumerate(self.hyperparameter_names):
+            hyp_type, _, choices = self.hyperparameter_constraints[name]
+            values = [key[i] for key in keys]
+            if hyp_type == 'categorical':
+                values = np.array(values, dtype=object)
+                for choice in choices:
+                    columns.append((values == choice).astype(float))
+            else:
+                columns.append(np.asarray(values, dtype=float))
+        return np.stack(columns, axis=1)
+
+    def add_llm_predictions(self, configs: pd.DataFrame, y_mean, y_std):
+        '''Store LLM predictions for a batch of configurations.'''
+        for config, mean, std in zip(configs.to_dict('records'), y_mean, y_std):
+            if np.isfinite(mean) and np.isfinite(std):
+                self.llm_predictions[self._key(config)] = (float(mean), float(std))
+        self.n_local_rounds = 0
+        self._dirty = True
+
+    def add_observations(self, configs: pd.DataFrame, fvals: pd.DataFrame):
+        '''Store real observations, they are used as high-weight training targets.'''
+        for config, fval in zip(configs.to_dict('records'), fvals.values[:, 0]):
+            key = self._key(config)
+            if key not in self.observations:
+                self.observations[key] = float(fval)
+                self._dirty = True
+
+    def _training_data(self, llm_keys):
+        keys = list(llm_keys) + list(self.observations.keys())
+        y = [self.llm_predictions[key][0] for key in llm_keys] + list(self.observations.values())
+        weights = [1.0] * len(llm_keys) + [self.observation_weight] * len(self.observations)
+        return self._encode(keys), np.array(y), np.array(weights)
+
+    def _fit_members(self, X, y, weights):
+        members = []
+        for _ in range(self.n_members):
+            idx = self.rng.randint(0, len(y), size=len(y))
+            member = GradientBoostingRegressor(n_estimators=100, max_depth=3, learning_rate=0.1,
+                                               subsample=0.8, random_state=self.rng.randint(2 ** 31 - 1))
+            member.fit(X[idx], y[idx], sample_weight=weights[idx])
+            members.append(member)
+        return members
+
+    def fit(self):
+        '''Measure held-out agreement with the LLM, then refit the ensemble on all data.'''
+        llm_keys = list(self.llm_predictions.keys())
+        self._dirty = False
+        if len(llm_keys) < self.min_llm_samples:
+            return
+
+        perm = self.rng.permutation(len(llm_keys))
+        n_holdout = max(int(len(llm_keys) * self.holdout_frac), 2)
+        holdout_keys = [llm_keys[i] for i in perm[:n_holdout]]
+        train_keys = [llm_keys[i] for i in perm[n_holdout:]]
+
+        members = self._fit_members(*self._training_data(train_keys))
+        X_holdout = self._encode(holdout_keys)
+        pred = np.mean([member.predict(X_holdout) for member in members], axis=0)
+        target = np.array([self.llm_predictions[key][0] for key in holdout_keys])
+        self.agreement = spearmanr(pred, target).correlation if np.ptp(target) > 0 else np.nan
+
+        self.members = self._fit_members(*self._training_data(llm_keys))
+        X = self._encode(llm_keys)
+        llm_std = np.array([self.llm_predictions[key][1] for key in llm_keys])
+        self.std_model = GradientBoostingRegressor(n_estimators=50, max_depth=2, random_state=0)
+        self.std_model.fit(X, np.log(np.maximum(llm_std, 1e-5)))
+
+        print(f'[Distillation] Fitted local model on {len(llm_keys)} LLM predictions and '
+              f'{len(self.observations)} observations, held-out agreement: {self.agreement:.3f}')
+
+    def use_local(self):
+        '''Whether the next scoring round should be served by the local model.'''
+        if self._dirty:
+            self.fit()
+        if not self.members or not np.isfinite(self.agreement) or self.agreement < self.agreement_threshold:
+            return False
+        # periodically go back to the LLM to refresh the distilled model
+        return self.n_local_rounds < self.refresh_every
+
+    def get_state(self):
+        return {'llm_predictions': dict(self.llm_predictions), 'observations': dict(self.observations),
+                'members': self.members, 'std_model': self.std_model, 'agreement': self.agreement,
+                'n_local_rounds': self.n_local_rounds, 'dirty': self._dirty, 'rng': self.rng.get_state()}
+
+    def set_state(self, state):
+        self.llm_predictions = dict(state['llm_predictions'])
+        self.observations = dict(state['observations'])
+        self.members = state['members']
+        self.std_model = state['std_model']
+        self.agreement = state['agreement']
+        self.n_local_rounds = state['n_local_rounds']
+        self._dirty = state['dirty']
+        self.rng.set_state(state['rng'])
+
+    def predict(self, configs: pd.DataFrame):
+        '''Predict mean and std, combining ensemble spread with the distilled LLM uncertainty.'''
+        assert self.members, 'local model has not been fitted yet'
+        X = self._encode(self._key(config) for config in configs.to_dict('records'))
+        member_preds = np.stack([member.predict(X) for member in self.members], axis=0)
+        y_mean = member_preds.mean(axis=0)
+        llm_std = np.exp(self.std_model.predict(X))
+        y_std = np.sqrt(member_preds.var(axis=0) + llm_std ** 2)
+        y_std[y_std < 1e-5] = 1e-5
+        self.n_local_rounds += 1
+        return y_mean, y_std
@@ -6,6 +6,7 @@ import numpy as np
 import pandas as pd
 from aiohttp import ClientSession
 from llambo.rate_limiter import RateLimiter
+from llambo.llm_scheduler import SPECULATIVE
 from llambo.generative_sm_utils import gen_prompt_tempates
 
 openai.api_type = ""
@@ -16,7 +17,7 @@ openai.api_key = ""
 class LLM_GEN_SM:
     def __init__(self, task_context, n_gens, lower_is_better, top_pct,
                  n_templates=1, rate_limiter=None, 
-                 verbose=False, chat_engine=None):
+                 verbose=False, chat_engine=None, scheduler=None, request_priority=SPECULATIVE):
         '''Initialize the forward LLM surrogate model. This is modelling p(y|x) as in GP/SMAC etc.'''
         self.task_context = task_context
         self.n_gens = n_gens
@@ -30,6 +31,9 @@ class LLM_GEN_SM:
         self.recalibrator = None
         self.chat_engine = chat_engine
         self.verbose = verbose
+        # optional LLMRequestScheduler, completions are then sent from its worker threads
+        self.scheduler = scheduler
+        self.request_priority = request_priority
 
     async def _async_generate(self, few_shot_template, query_example, query_idx):
         '''Generate a response from the LLM async.'''
@@ -46,7 +50,7 @@ class LLM_GEN_SM:
                 try:
                     start_time = time.time()
                     self.rate_limiter.add_request(request_text=prompt, current_time=start_time)
-                    resp = await openai.Completion.acreate(
+                    completion_kwargs = dict(
                         model="gpt-3.5-turbo-instruct",
                         prompt=prompt,
                         temperature=0.7,
@@ -56,6 +60,12 @@ class LLM_GEN_SM:
                         request_timeout=10,
                         logprobs=5,
                     )
+                    if self.scheduler is None:
+                        resp = await openai.Completion.acreate(**completion_kwargs)
+                    else:
+                        future = self.scheduler.submit(lambda: openai.Completion.create(**completion_kwargs),
+                                                       priority=self.request_priority)
+                        resp = await asyncio.wrap_future(future)
                     self.rate_limiter.add_request(request_token_count=resp['usage']['total_tokens'], current_time=time.time())
                     break
                 except Exception as e:
@@ -0,0 +1,186 @@
+import re
+import numpy as np
+from scipy.optimize import curve_fit
+from scipy.stats import norm
+
+
+def pow3(resource, c, a, alpha):
+    '''Power law learning curve c + a * resource^-alpha, c is the value it converges to.'''
+    return c + a * np.power(resource, -alpha)
+
+
+def fit_pow3(resources, values, target):
+    '''
+    Fit a pow3 curve to a partial learning curve and extrapolate it to the target resource. Returns the
+    predicted mean and std (parameter uncertainty plus residual noise). With fewer than 3 points, or if the fit
+    fails, the last value is returned with the spread of the curve as std.
+    '''
+    resources = np.asarray(resources, dtype=float)
+    values = np.asarray(values, dtype=float)
+    fallback_std = max(np.ptp(values), 1e-3 * max(np.abs(values[-1]), 1.0))
+    if len(values) < 3:
+        return values[-1], fallback_std
+
+    p0 = [values[-1], values[0] - values[-1], 0.5]
+    try:
+        params, pcov = curve_fit(pow3, resources, values, p0=p0, maxfev=2000,
+                                 bounds=([-np.inf, -np.inf, 1e-3], [np.inf, np.inf, 5.0]))
+    except (RuntimeError, ValueError):
+        return values[-1], fallback_std
+
+    mean = pow3(target, *params)
+    residuals = values - pow3(resources, *params)
+    noise_var = np.sum(residuals ** 2) / max(len(values) - 3, 1)
+    # delta method: gradient of the prediction w.r.t. (c, a, alpha)
+    c, a, alpha = params
+    grad = np.array([1.0, target ** -alpha, -a * np.log(target) * target ** -alpha])
+    param_var = grad @ np.nan_to_num(pcov, nan=0.0, posinf=0.0) @ grad
+    std = np.sqrt(max(param_var, 0.0) + noise_var)
+    if not np.isfinite(mean) or not np.isfinite(std):
+        return values[-1], fallback_std
+    return float(mean), float(max(std, 1e-6))
+
+
+class LearningCurvePredictor:
+    '''
+    Predicts the final value of partial learning curves, e.g. the validation error at the last epoch.
+
+    Curves are collected from the stream of (trial, resource, value) results. A prediction combines, weighted
+    by inverse variance:
+
+    * a pow3 fit of the partial curve, extrapolated to max_resource
+    * the final values of the n_similar most similar completed curves, shifted by the offset between the two
+      curves at the last observed resource
+    * optionally, the answers of an LLM (llambo.llm_client.LLMClient) prompted with the similar curves
+    '''
+    def __init__(self, max_resource, n_similar=5, llm=None, n_gens=5, metric_name='validation error',
+                 resource_name='epoch'):
+        assert max_resource >= 1, 'max_resource must be at least 1'
+        self.max_resource = max_resource
+        self.n_similar = n_similar
+        self.llm = llm
+        self.n_gens = n_gens
+        self.metric_name = metric_name
+        self.resource_name = resource_name
+        self.curves = {}  # trial_id -> {resource: value}
+
+    def add(self, trial_id, resource, value):
+        self.curves.setdefault(trial_id, {})[resource] = float(value)
+
+    def remove(self, trial_id):
+        self.curves.pop(trial_id, None)
+
+    def curve(self, trial_id):
+        '''Resources and values of a curve, sorted by resource.'''
+        points = sorted(self.curves.get(trial_id, {}).items())
+        resources, values = zip(*points) if points else ((), ())
+        return np.array(resources, dtype=float), np.array(values, dtype=float)
+
+    def completed_curves(self):
+        return [trial_id for trial_id, curve in self.curves.items() if max(curve) >= self.max_resource]
+
+    def best_final(self, lower_is_better=True):
+        '''Best final value among the completed curves, None if there are none.'''
+        finals = [self.curves[trial_id][max(self.curves[trial_id])] for trial_id in self.completed_curves()]
+        if not finals:
+            return None
+        return min(finals) if lower_is_better else max(finals)
+
+    def similar_curves(self, trial_id):
+        '''Completed curves closest to the curve of trial_id (RMSE on the shared resources), closest first.'''
+        curve = self.curves.get(trial_id, {})
+        distances = []
+        for other_id in self.completed_curves():
+            if other_id == trial_id:
+                continue
+            other = self.curves[other_id]
+            shared = [resource for resource in curve if resource in other]
+            if not shared:
+                continue
+            rmse = np.sqrt(np.mean([(curve[resource] - other[resource]) ** 2 for resource in shared]))
+            distances.append((rmse, other_id))
+        distances.sort(key=lambda x: x[0])
+        return [other_id for _, other_id in distances[:self.n_similar]]
+
+    def _similar_estimate(self, trial_id, similar):
+        resources, values = self.curve(trial_id)
+        last_resource = resources[-1]
+        estimates = []
+        for other_id in similar:
+            other = self.curves[other_id]
+            if last_resource not in other:
+                continue
+            estimates.append(other[max(other)] + values[-1] - other[last_resource])
+        if len(estimates) < 2:
+            return None
+        return float(np.mean(estimates)), float(max(np.std(estimates), 1e-6))
+
+    def _format_curve(self, curve):
+        return ', '.join(f'{self.resource_name} {int(resource)}: {value:.6f}' for resource, value in sorted(curve.items()))
+
+    def _llm_estimate(self, trial_id, similar):
+        prompt = (f'The following are learning curves of neural network architectures, measured in '
+                  f'{self.metric_name} after each {self.resource_name}. Training runs for {self.max_resource} '
+                  f'{self.resource_name}s.\n')
+        for other_id in similar:
+            other = self.curves[other_id]
+            prompt += f'\nLearning curve: {self._format_curve(other)}\n'
+            prompt += f'Final {self.metric_name}: ## {other[max(other)]:.6f} ##\n'
+        prompt += f'\nLearning curve: {self._format_curve(self.curves[trial_id])}\n'
+        prompt += (f'Your response should only contain the predicted final {self.metric_name} in the format '
+                   f'## performance ##.\nFinal {self.metric_name}: ')
+
+        response = self.llm.chat(prompt, n=self.n_gens, coalesce=False)
+        predictions = []
+        for choice in response.choices:
+            for match in re.findall(r'##\s*(-?[\d.]+(?:[eE][-+]?\d+)?)\s*##', choice.message.content):
+                try:
+                    predictions.append(float(match))
+                except ValueError:
+                    pass
+        if not predictions:
+            return None
+        return float(np.mean(predictions)), float(max(np.std(predictions), 1e-6))
+
+    def predict(self, trial_id):
+        '''Predicted mean and std of the final value of the curve of trial_id.'''
+        resources, values = self.curve(trial_id)
+        assert len(values) > 0, f'no results for trial {trial_id}'
+        if resources[-1] >= self.max_resource:
+            return values[-1], 0.0
+
+        estimates = [fit_pow3(resources, values, self.max_resource)]
+        similar = self.similar_curves(trial_id)
+        similar_estimate = self._similar_estimate(trial_id, similar)
+        if similar_estimate is not None:
+            estimates.append(similar_estimate)
+        if self.llm is not None and similar:
+            try:
+                llm_estimate = self._llm_estimate(trial_id, similar)
+            except Exception as e:
+                print(f'[LC] LLM extrapolation failed: {e}')
+                llm_estimate = None
+            if llm_estimate is not None:
+                estimates.append(llm_estimate)
+
+        means = np.array([mean for mean, _ in estimates])
+        # no estimate is trusted beyond 1% of the current value, e.g. identical LLM answers have zero spread
+        min_std = max(0.01 * np.abs(values[-1]), 1e-6)
+        weights = 1 / np.maximum([std for _, std in estimates], min_std) ** 2
+        mean = np.sum(weights * means) / np.sum(weights)
+        std = np.sqrt(1 / np.sum(weights))
+        return float(mean), float(std)
+
+    def prob_improvement(self, trial_id, incumbent, lower_is_better=True):
+        '''Probability that the final value of the curve of trial_id is better than incumbent.'''
+        mean, std = self.predict(trial_id)
+        if std == 0:
+            return float(mean < incumbent if lower_is_better else mean > incumbent)
+        z = (incumbent - mean) / std if lower_is_better else (mean - incumbent) / std
+        return float(norm.cdf(z))
+
+    def get_state(self):
+        return {'curves': {trial_id: dict(curve) for trial_id, curve in self.curves.items()}}
+
+    def set_state(self, state):
+        self.curves = {trial_id: dict(curve) for trial_id, curve in state['curves'].items()}
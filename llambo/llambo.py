@@ -5,6 +5,13 @@ from llambo.generative_sm import LLM_GEN_SM
 from llambo.acquisition_function import LLM_ACQ
 from llambo.rate_limiter import RateLimiter
 from llambo.warping import NumericalTransformer
+from llambo.distillation import SurrogateDistiller
+from llambo.observation_store import ObservationStore, highest_fidelity
+from llambo.batch_evaluator import BatchEvaluator
+from llambo.checkpoint import save_checkpoint, load_checkpoint, get_rng_state, set_rng_state
+from llambo.llm_client import LLMClient
+from llambo.llm_scheduler import get_default_scheduler, BACKGROUND
+import numpy as np
 import pandas as pd
 import time
 import pprint
@@ -29,6 +36,21 @@ class LLAMBO:
                  # ablation on prompt design, either 'full_context' or 'partial_context' or 'no_context'
                  shuffle_features=False,  # whether to shuffle features in prompt generation
                  client=None,
+                 use_distillation=False,  # whether to distill LLM surrogate predictions into a local model
+                 distillation_kwargs=None,  # keyword arguments for SurrogateDistiller
+                 cascade=None,  # optional CascadePolicy used by the discriminative SM for scoring
+                 coalesce_surrogate_requests=True,  # share identical in-flight surrogate prompts
+                 coalesce_acquisition_requests=False,  # share identical in-flight acquisition prompts
+                 scheduler=None,  # LLMRequestScheduler for all LLM traffic, defaults to the process-wide one
+                 batch=None,  # optional BatchSession, collects the LLM requests of a sweep into batch jobs
+                 batch_size=1,  # number of points (q) selected and evaluated per round
+                 diversity_penalty=1.0,  # penalty for selecting points close to each other in a round, in [0, 1]
+                 n_eval_workers=1,  # number of bbox_eval_f calls running concurrently
+                 eval_executor='thread',  # 'thread' or 'process', process requires a picklable bbox_eval_f
+                 fidelity_mode=None,  # None, 'highest' or 'explicit', how results at several fidelities are prompted
+                 fidelity_name='fidelity',  # name of the fidelity in the prompts, e.g. 'epochs'
+                 fidelity_range=None,  # (lowest, highest) fidelity level, required for 'explicit'
+                 canonicalize=None,  # maps a config to a key shared by equivalent configs, e.g. nb201.canonical_id
                  ):
         self.task_context = task_context
         assert sm_mode in ['generative', 'discriminative']
@@ -44,28 +66,80 @@ class LLAMBO:
         self.n_trials = n_trials
         self.llm_query_cost = []  # list of cost for LLM calls in EACH TRIAL
         self.llm_query_time = []  # list of time taken for LLM calls in EACH TRIAL
-        self.observed_fvals = pd.DataFrame()
-        self.observed_configs = pd.DataFrame()
+        self.warmstart_configs = None  # initial configurations returned by init_f
+        self.initialized = False  # whether the initial configurations have been evaluated
+        self.n_completed_trials = 0  # number of trials of the optimization loop evaluated so far
+        # observed configurations and results, see the observed_configs / observed_fvals views
+        self.observations = ObservationStore(task_context['hyperparameter_constraints'])
 
         assert type(shuffle_features) == bool, 'shuffle_features should be a boolean'
         assert type(use_input_warping) == bool, 'use_input_warping should be a boolean'
+        assert not use_distillation or sm_mode == 'discriminative', 'distillation requires the discriminative SM'
+        assert cascade is None or sm_mode == 'discriminative', 'model cascade requires the discriminative SM'
+        assert batch_size == 1 or sm_mode == 'discriminative', 'batch mode requires the discriminative SM'
+        assert 1 <= batch_size <= n_candidates, 'batch_size must be between 1 and n_candidates'
+        assert fidelity_mode in [None, 'highest', 'explicit'], 'fidelity_mode must be None, highest or explicit'
+        assert fidelity_mode != 'explicit' or sm_mode == 'discriminative', 'explicit fidelity requires the discriminative SM'
+        assert fidelity_name not in task_context['hyperparameter_constraints'], \
+            f'fidelity_name {fidelity_name} clashes with a hyperparameter'
 
         self.init_f = init_f
         self.bbox_eval_f = bbox_eval_f
+        self.batch_size = batch_size
+        self.diversity_penalty = diversity_penalty
+        # candidates equivalent to observed ones are dropped, equivalent configs are evaluated once
+        self.canonicalize = canonicalize
+        self.evaluator = BatchEvaluator(bbox_eval_f, n_workers=n_eval_workers, executor=eval_executor,
+                                        canonicalize=canonicalize)
+
+        # with explicit fidelities the surrogate sees the fidelity as an extra hyperparameter, the acquisition
+        # function keeps proposing configurations of the original search space
+        self.fidelity_mode = fidelity_mode
+        self.fidelity_name = fidelity_name
+        self.fidelity_range = None
+        if fidelity_mode == 'explicit':
+            sm_task_context = dict(task_context,
+                                   hyperparameter_constraints=dict(task_context['hyperparameter_constraints']))
+        else:
+            sm_task_context = task_context
+        self.sm_task_context = sm_task_context
+        if fidelity_range is not None:
+            self.set_fidelity(fidelity_range[0], fidelity_range[1])
 
         if use_input_warping:
             warping_transformer = NumericalTransformer(task_context['hyperparameter_constraints'])
+            sm_warping_transformer = NumericalTransformer(sm_task_context['hyperparameter_constraints'])
         else:
             warping_transformer = None
+            sm_warping_transformer = None
 
         rate_limiter = RateLimiter(max_tokens=100000, time_frame=60, max_requests=720)
+        self.rate_limiter = rate_limiter
+        self.scheduler = get_default_scheduler() if scheduler is None else scheduler
+        # chat_engine is the model name used for all LLM calls that are not routed through a cascade
+        # the clients of this instance share one handle, so that the session knows when the instance is waiting
+        batch = None if batch is None else batch.for_instance()
+        self.llm = LLMClient(client, model=chat_engine or 'gpt-4o-mini', rate_limiter=rate_limiter,
+                             scheduler=self.scheduler, batch=batch)
+        # handed to init_f, warmstart requests are background traffic
+        self.warmstart_llm = LLMClient(client, model=chat_engine or 'gpt-4o-mini', rate_limiter=rate_limiter,
+                                       scheduler=self.scheduler, priority=BACKGROUND, batch=batch)
+        self.cascade = cascade
+
+        if use_distillation:
+            distiller = SurrogateDistiller(sm_task_context['hyperparameter_constraints'],
+                                           **(distillation_kwargs or {}))
+        else:
+            distiller = None
+        self.distiller = distiller
 
         print('=' * 150)
         print(f'[Search settings]: ' + '\n\t'
                                        f'n_candidates: {n_candidates}, n_templates: {n_templates}, n_gens: {n_gens}, ' + '\n\t'
                                                                                                                          f'alpha: {alpha}, n_initial_samples: {n_initial_samples}, n_trials: {n_trials}, ' + '\n\t'
                                                                                                                                                                                                              f'using warping: {use_input_warping}, ablation: {prompt_setting}, '
-                                                                                                                                                                                                             f'shuffle_features: {shuffle_features}')
+                                                                                                                                                                                                             f'shuffle_features: {shuffle_features}, distillation: {use_distillation}, '
+                                                                                                                                                                                                             f'batch_size: {batch_size}, n_eval_workers: {n_eval_workers}, fidelity: {fidelity_mode}')
         print(f'[Task]: ' + '\n\t'
                             f'task type: {task_context["task"]}, sm: {sm_mode}, lower is better: {lower_is_better}')
         print(f'Hyperparameter search space: ')
@@ -75,23 +149,27 @@ class LLAMBO:
         # initialize surrogate model and acquisition function
         if sm_mode == 'generative':
             self.surrogate_model = LLM_GEN_SM(task_context, n_gens, lower_is_better, top_pct,
-                                              n_templates=n_templates, rate_limiter=None)
+                                              n_templates=n_templates, rate_limiter=None,
+                                              scheduler=self.scheduler)
         else:
-            self.surrogate_model = LLM_DIS_SM(task_context, n_gens, lower_is_better,
+            self.surrogate_model = LLM_DIS_SM(sm_task_context, n_gens, lower_is_better,
                                               n_templates=n_templates, rate_limiter=rate_limiter,
-                                              warping_transformer=warping_transformer,
+                                              warping_transformer=sm_warping_transformer,
                                               chat_engine=chat_engine, prompt_setting=prompt_setting,
-                                              shuffle_features=shuffle_features, client=client)
+                                              shuffle_features=shuffle_features, client=client,
+                                              distiller=distiller, llm=self.llm, cascade=cascade,
+                                              coalesce_requests=coalesce_surrogate_requests)
 
         self.acq_func = LLM_ACQ(task_context, n_candidates, n_templates, lower_is_better,
                                 rate_limiter=rate_limiter, warping_transformer=warping_transformer,
                                 chat_engine=chat_engine, prompt_setting=prompt_setting,
-                                shuffle_features=shuffle_features, client=client)
+                                shuffle_features=shuffle_features, client=client, llm=self.llm,
+                                coalesce_requests=coalesce_acquisition_requests, canonicalize=canonicalize)
 
         self.client = client
 
-    def _initialize(self):
-        '''Initialize the optimization loop.'''
+    def _initialize(self, fidelity_eval_f=None, fidelity=None):
+        '''Initialize the optimization loop, optionally evaluating the initial configurations at a fidelity.'''
         start_time = time.time()
         # generate initial configurations
         init_configs = self.init_f(self.n_initial_samples)
@@ -103,150 +181,401 @@ class LLAMBO:
         init_configs = pd.DataFrame(init_configs)
         assert init_configs.shape[
                    0] == self.n_initial_samples, 'init_f() should return n_initial_samples number of configs'
+        self.warmstart_configs = init_configs
 
-        # create empty pandas dataframe for observed function values
-
-        for index, _ in init_configs.iterrows():
-            one_config = init_configs.iloc[[index]]
-            one_config, one_result = self._evaluate_config(one_config)
-
-            if self.observed_fvals.empty:
-                self.observed_fvals = one_result
-            else:
-                self.observed_fvals = pd.concat([self.observed_fvals, one_result], axis=0, ignore_index=True)
-
-            if self.observed_configs.empty:
-                self.observed_configs = one_config
-            else:
-                self.observed_configs = pd.concat([self.observed_configs, one_config], axis=0, ignore_index=True)
+        if fidelity_eval_f is None:
+            for one_config, one_result in self._evaluate_configs(init_configs):
+                self.observations.add_frames(one_config, one_result)
+        else:
+            for one_config, one_result in self._evaluate_at_fidelity(init_configs, fidelity_eval_f, fidelity):
+                self.observations.add_frames(one_config, one_result, [fidelity])
 
+        self.initialized = True
         print(f'[Initialization] COMPLETED: {self.observed_fvals.shape[0]} points evaluated...')
         end_time = time.time()
 
         time_taken = end_time - start_time
         return 0, time_taken
 
-    def _evaluate_config(self, config):
-        # can support batch mode in the future
-        assert config.shape[0] == 1, 'batch mode not supported yet'
-        config = config.to_dict('records')[0]
+    def _evaluate_configs(self, configs):
+        '''Evaluate the rows of configs concurrently, yields (config, results) DataFrames as they complete.'''
+        configs = configs.to_dict('records')
+        pending_ids = [self.observations.add_pending(config) for config in configs]
+        try:
+            for idx, eval_config, eval_results in self.evaluator.evaluate(configs):
+                assert isinstance(eval_config, dict), 'bbox_eval_f() should return the evaluated config as a dictinoary'
+                assert isinstance(eval_results, dict), 'bbox_eval_f() should return bbox evaluation results as a dictionary'
+                assert 'score' in eval_results.keys(), 'score must be a key in results returned'
+
+                self.observations.remove_pending(pending_ids[idx])
+                yield pd.DataFrame([eval_config]), pd.DataFrame([eval_results])
+        finally:
+            for pending_id in pending_ids:
+                self.observations.remove_pending(pending_id)
+
+    def _evaluate_at_fidelity(self, configs, fidelity_eval_f, fidelity):
+        '''Evaluate the rows of configs one after the other at a fidelity, yields (config, results) DataFrames.'''
+        for config in configs.to_dict('records'):
+            eval_config, eval_results = fidelity_eval_f(config, fidelity)
+            assert isinstance(eval_results, dict) and 'score' in eval_results, \
+                'fidelity_eval_f() should return bbox evaluation results as a dictionary with a score'
+            yield pd.DataFrame([eval_config]), pd.DataFrame([eval_results])
 
-        eval_config, eval_results = self.bbox_eval_f(config)
-
-        assert isinstance(eval_config, dict), 'bbox_eval_f() should return the evaluated config as a dictinoary'
-        assert isinstance(eval_results, dict), 'bbox_eval_f() should return bbox evaluation results as a dictionary'
-        assert 'score' in eval_results.keys(), 'score must be a key in results returned'
-
-        return pd.DataFrame([eval_config]), pd.DataFrame([eval_results])
-
-    def _update_observations(self, new_config, new_fval):
-        '''Update the observed configurations and function values.'''
-        # append new observations
-        self.observed_configs = pd.concat([self.observed_configs, new_config], axis=0,
-                                          ignore_index=True)
-        new_fval = {
-            'score': [new_fval['metric_valid_error']]
+    def _evaluate_config(self, config):
+        '''Evaluate one or more configurations, results are in completion order.'''
+        eval_configs, eval_results = zip(*self._evaluate_configs(config))
+        return pd.concat(eval_configs, ignore_index=True), pd.concat(eval_results, ignore_index=True)
+
+    @property
+    def observed_configs(self):
+        return self.observations.configs()
+
+    @property
+    def observed_fvals(self):
+        return self.observations.fvals()
+
+    def _update_observations(self, new_config, new_fval, fidelity=None):
+        '''Update the observed configurations and function values, optionally measured at a fidelity.'''
+        fidelities = None if fidelity is None else [fidelity] * new_config.shape[0]
+        if isinstance(new_fval, pd.DataFrame):
+            # results of _evaluate_config
+            self.observations.add_frames(new_config, new_fval, fidelities)
+        else:
+            # results reported by a searcher
+            self.observations.add_frames(new_config, pd.DataFrame({'score': [new_fval['metric_valid_error']]}),
+                                         fidelities)
+
+    def set_fidelity(self, min_level, max_level, name=None):
+        '''Set the range of fidelity levels (and optionally their name), e.g. from a multi-fidelity scheduler.'''
+        assert min_level <= max_level, 'min_level must not be larger than max_level'
+        constraints = self.sm_task_context['hyperparameter_constraints']
+        if self.fidelity_mode == 'explicit':
+            constraints.pop(self.fidelity_name, None)
+        if name is not None:
+            assert name not in self.task_context['hyperparameter_constraints'], \
+                f'fidelity name {name} clashes with a hyperparameter'
+            self.fidelity_name = name
+        self.fidelity_range = (min_level, max_level)
+        if self.fidelity_mode == 'explicit':
+            constraints[self.fidelity_name] = ['int', 'linear', [int(min_level), int(max_level)]]
+
+    def _fidelities(self):
+        '''Fidelities of the observations, unknown ones count as the highest fidelity.'''
+        fidelities = self.observations.fidelities()
+        highest = self.fidelity_range[1] if self.fidelity_range is not None else np.nanmax(fidelities, initial=1)
+        return np.where(np.isnan(fidelities), highest, fidelities)
+
+    def _at_fidelity(self, configs, fidelity=None):
+        '''Add the fidelity column to configurations of the search space (surrogate inputs in explicit mode).'''
+        if self.fidelity_mode != 'explicit':
+            return configs
+        assert self.fidelity_range is not None, 'explicit fidelity requires fidelity_range or set_fidelity()'
+        return configs.assign(**{self.fidelity_name: self.fidelity_range[1] if fidelity is None else fidelity})
+
+    def _acquisition_context(self, context):
+        '''Observations the acquisition function is prompted with: one row per configuration, no fidelity.'''
+        if self.fidelity_mode != 'explicit':
+            return context
+        configs, fvals = context
+        return highest_fidelity(configs.drop(columns=[self.fidelity_name]), fvals,
+                                configs[self.fidelity_name].to_numpy())
+
+    def get_state(self):
+        '''Snapshot of everything needed to continue the run: observations, progress, accounting and RNGs.'''
+        state = {
+            'observations': self.observations.get_state(),
+            'llm_query_cost': list(self.llm_query_cost),
+            'llm_query_time': list(self.llm_query_time),
+            'warmstart_configs': self.warmstart_configs,
+            'initialized': self.initialized,
+            'n_completed_trials': self.n_completed_trials,
+            'best_fval': getattr(self, 'best_fval', None),
+            'llm': self.llm.get_state(),
+            'warmstart_llm': self.warmstart_llm.get_state(),
+            'rate_limiter': self.rate_limiter.get_state(),
+            'rng': get_rng_state(),
         }
-        self.observed_fvals = pd.concat([self.observed_fvals, pd.DataFrame(new_fval)], axis=0,
-                                        ignore_index=True)
-
-    def optimize(self, test_metric='generalization_score'):
+        if self.distiller is not None:
+            state['distiller'] = self.distiller.get_state()
+        if self.cascade is not None:
+            state['cascade'] = {'n_scored': list(self.cascade.n_scored),
+                                'tiers': [tier.get_state() for tier in self.cascade.tiers]}
+        return state
+
+    def set_state(self, state):
+        self.observations.set_state(state['observations'])
+        self.llm_query_cost = list(state['llm_query_cost'])
+        self.llm_query_time = list(state['llm_query_time'])
+        self.warmstart_configs = state['warmstart_configs']
+        self.initialized = state['initialized']
+        self.n_completed_trials = state['n_completed_trials']
+        if state['best_fval'] is not None:
+            self.best_fval = state['best_fval']
+        self.llm.set_state(state['llm'])
+        self.warmstart_llm.set_state(state['warmstart_llm'])
+        self.rate_limiter.set_state(state['rate_limiter'])
+        set_rng_state(state['rng'])
+        if self.distiller is not None and 'distiller' in state:
+            self.distiller.set_state(state['distiller'])
+        if self.cascade is not None and 'cascade' in state:
+            self.cascade.n_scored = list(state['cascade']['n_scored'])
+            for tier, tier_state in zip(self.cascade.tiers, state['cascade']['tiers']):
+                tier.set_state(tier_state)
+
+    def save_checkpoint(self, path):
+        save_checkpoint(path, self.get_state())
+
+    def restore_checkpoint(self, path):
+        '''Restore the state saved at path, returns False if there is no checkpoint.'''
+        state = load_checkpoint(path)
+        if state is None:
+            return False
+        self.set_state(state)
+        print(f'[Checkpoint] Restored {len(self.observations)} observations and '
+              f'{self.n_completed_trials}/{self.n_trials} trials from {path}')
+        return True
+
+    def optimize(self, test_metric='generalization_score',
+                 checkpoint_path=None,  # if given, the run is snapshotted there and resumed from it
+                 checkpoint_every=1,  # number of trials between snapshots
+                 ):
         '''Run the optimization loop.'''
+        if checkpoint_path is not None and self.restore_checkpoint(checkpoint_path):
+            # evaluations that were in flight when the snapshot was taken are lost
+            self.observations.pending.clear()
+
         # initialize
-        cost, query_time = self._initialize()
-        self.llm_query_cost.append(cost)
-        self.llm_query_time.append(query_time)
+        if not self.initialized:
+            cost, query_time = self._initialize()
+            self.llm_query_cost.append(cost)
+            self.llm_query_time.append(query_time)
+            if checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
 
         if self.lower_is_better:
-            self.best_fval = self.observed_fvals['score'].min()
-            best_gen_fval = self.observed_fvals[test_metric].min()
+            self.best_fval = self.observations.best('score', lower_is_better=True)
+            best_gen_fval = self.observations.best(test_metric, lower_is_better=True)
         else:
-            self.best_fval = self.observed_fvals['score'].max()
-            best_gen_fval = self.observed_fvals[test_metric].max()
+            self.best_fval = self.observations.best('score', lower_is_better=False)
+            best_gen_fval = self.observations.best(test_metric, lower_is_better=False)
 
         print(
             f'[Initialization] COMPLETED: best fval: {self.best_fval:.4f}, best generalization fval: {best_gen_fval:.4f}')
         print('=' * 150)
 
-        # optimization loop
-        for trial_id in range(self.n_trials):
-            trial_cost = 0
+        # optimization loop, each round selects and evaluates up to batch_size points
+        while self.n_completed_trials < self.n_trials:
+            trial_id = self.n_completed_trials
+            q = min(self.batch_size, self.n_trials - trial_id)
             trial_query_time = 0
 
             start_time = time.time()
             # get candidate point
-            candidate_points = self.acq_func.get_candidate_points(self.observed_configs,
-                                                                  self.observed_fvals[['score']],
-                                                                  alpha=self.alpha)
+            context = self._context()
+            acq_configs, acq_fvals = self._acquisition_context(context)
+            candidate_points = self.acq_func.get_candidate_points(acq_configs, acq_fvals, alpha=self.alpha)
 
             print('=' * 150)
             print('EXAMPLE POINTS PROPOSED')
             print(candidate_points)
             print('=' * 150)
 
-            # select candidate point
-            sel_candidate_point, time_taken = self.surrogate_model.select_query_point(self.observed_configs,
-                                                                                      self.observed_fvals[
-                                                                                          ['score']],
-                                                                                      candidate_points)
-            # trial_cost += cost
+            # select candidate points
+            sel_candidate_points, time_taken = self._select_query_points(candidate_points, q, context=context)
             trial_query_time += time_taken
 
-            # self.llm_query_cost.append(trial_cost)
             self.llm_query_time.append(trial_query_time)
 
             print('=' * 150)
             print('SELECTED CANDIDATE POINT')
-            print(sel_candidate_point)
+            print(sel_candidate_points)
             print('=' * 150)
 
-            # evaluate candidate point
-            sel_candidate_point, sel_candidate_fval = self._evaluate_config(sel_candidate_point)
+            # evaluate candidate points, observations are updated as evaluations complete
+            for sel_candidate_point, sel_candidate_fval in self._evaluate_configs(sel_candidate_points):
+                self._update_observations(sel_candidate_point, sel_candidate_fval)
 
-            # update observations
-            self._update_observations(sel_candidate_point, sel_candidate_fval)
+                print('=' * 150)
+                print('UPDATED OBSERVATIONS')
+                print(self.observed_configs)
+                print(self.observed_fvals)
+                print('=' * 150)
 
-            print('=' * 150)
-            print('UPDATED OBSERVATIONS')
-            print(self.observed_configs)
-            print(self.observed_fvals)
-            print('=' * 150)
+                end_time = time.time()
+                time_taken = end_time - start_time
 
-            end_time = time.time()
-            time_taken = end_time - start_time
+                current_fval_cv = sel_candidate_fval['score'].values[0]
+                current_fval_gen = sel_candidate_fval[test_metric].values[0]
 
-            current_fval_cv = sel_candidate_fval['score'].values[0]
-            current_fval_gen = sel_candidate_fval[test_metric].values[0]
-
-            if self.lower_is_better:
-                if current_fval_cv < self.best_fval:
-                    self.best_fval = current_fval_cv
-                    best_found = True
+                if self.lower_is_better:
+                    if current_fval_cv < self.best_fval:
+                        self.best_fval = current_fval_cv
+                        best_found = True
+                    else:
+                        best_found = False
                 else:
-                    best_found = False
-            else:
-                if current_fval_cv > self.best_fval:
-                    self.best_fval = current_fval_cv
-                    best_found = True
+                    if current_fval_cv > self.best_fval:
+                        self.best_fval = current_fval_cv
+                        best_found = True
+                    else:
+                        best_found = False
+
+                if best_found:
+                    print(
+                        f'[Trial {trial_id} completed, time taken: {time_taken:.2f}s] best fval (cv): {self.best_fval:.4f}, current fval (cv): {current_fval_cv:.4f}. Generalization fval: {current_fval_gen:.4f} NEW BEST FVAL FOUND!!')
                 else:
-                    best_found = False
-
-            if best_found:
-                print(
-                    f'[Trial {trial_id} completed, time taken: {time_taken:.2f}s] best fval (cv): {self.best_fval:.4f}, current fval (cv): {current_fval_cv:.4f}. Generalization fval: {current_fval_gen:.4f} NEW BEST FVAL FOUND!!')
-            else:
-                print(
-                    f'[Trial {trial_id} completed, time taken: {time_taken:.2f}s] best fval (cv): {self.best_fval:.4f}, current fval (cv): {current_fval_cv:.4f}. Generalization fval: {current_fval_gen:.4f}.')
-            print('=' * 150)
+                    print(
+                        f'[Trial {trial_id} completed, time taken: {time_taken:.2f}s] best fval (cv): {self.best_fval:.4f}, current fval (cv): {current_fval_cv:.4f}. Generalization fval: {current_fval_gen:.4f}.')
+                print('=' * 150)
+                trial_id += 1
+                self.n_completed_trials = trial_id
+                if checkpoint_path is not None and trial_id % checkpoint_every == 0:
+                    self.save_checkpoint(checkpoint_path)
+
+        if checkpoint_path is not None:
+            self.save_checkpoint(checkpoint_path)
+
+        self.evaluator.shutdown()
 
         # returns history of observed configurations and function values
         print("Optimization complete")
         return self.observed_configs, self.observed_fvals
 
+    def optimize_successive_halving(self, fidelity_eval_f,  # (config, fidelity) -> (config, results), as bbox_eval_f
+                                    min_fidelity=1,  # fidelity of the lowest rung
+                                    max_fidelity=200,  # fidelity of the highest rung
+                                    eta=3,  # reduction factor: the best 1/eta of a rung is promoted
+                                    n_configs=None,  # configurations per bracket, defaults to n_candidates
+                                    test_metric='generalization_score',
+                                    checkpoint_path=None,  # if given, a snapshot is saved after every bracket
+                                    ):
+        '''
+        Successive halving with LLAMBO proposals, e.g. on nb201.NB201Simulator without Syne Tune. Each bracket
+        proposes n_configs configurations in one round, evaluates them at the lowest rung and promotes the best 1/eta
+        (at least one) to the next rung, with fidelities min_fidelity * eta^k and max_fidelity at the top. Brackets run until
+        n_trials configurations were proposed. All results are observed at their fidelity, which requires
+        fidelity_mode 'highest' or 'explicit'. Initial configurations are evaluated at min_fidelity.
+        '''
+        assert self.fidelity_mode is not None, 'successive halving requires fidelity_mode highest or explicit'
+        assert isinstance(self.surrogate_model, LLM_DIS_SM), 'successive halving requires the discriminative SM'
+        assert 1 <= min_fidelity <= max_fidelity, 'fidelities must satisfy 1 <= min_fidelity <= max_fidelity'
+        assert eta >= 2, 'eta must be at least 2'
+        rungs = []
+        fidelity = min_fidelity
+        while fidelity < max_fidelity:
+            rungs.append(int(round(fidelity)))
+            fidelity *= eta
+        rungs.append(max_fidelity)
+        if n_configs is None:
+            n_configs = self.n_candidates
+        self.set_fidelity(min_fidelity, max_fidelity)
+
+        if checkpoint_path is not None and self.restore_checkpoint(checkpoint_path):
+            self.observations.pending.clear()
+        if not self.initialized:
+            cost, query_time = self._initialize(fidelity_eval_f, min_fidelity)
+            self.llm_query_cost.append(cost)
+            self.llm_query_time.append(query_time)
+            if checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
+        print(f'[SH] rungs: {rungs}, eta: {eta}, configurations per bracket: {n_configs}')
+
+        sign = 1 if self.lower_is_better else -1
+        while self.n_completed_trials < self.n_trials:
+            start_time = time.time()
+            q = min(n_configs, self.n_trials - self.n_completed_trials)
+            configs = self.get_configs(q=q).reset_index(drop=True)
+            n_proposed = configs.shape[0]
+            assert n_proposed > 0, 'LLAMBO did not propose any configuration'
+            for rung, fidelity in enumerate(rungs):
+                results = pd.concat([result for _, result in
+                                     self._evaluate_at_fidelity(configs, fidelity_eval_f, fidelity)], ignore_index=True)
+                self._update_observations(configs, results, fidelity=fidelity)
+                # positions of the configurations by score, best first
+                ranking = np.argsort(sign * results['score'].to_numpy(), kind='stable')
+                print(f'[SH] rung {rung} (fidelity {fidelity}): {configs.shape[0]} configurations, '
+                      f'best fval: {results["score"].iloc[ranking[0]]:.4f}')
+                if fidelity == max_fidelity:
+                    break
+                configs = configs.iloc[ranking[:max(configs.shape[0] // eta, 1)]].reset_index(drop=True)
+
+            bracket_best = results.iloc[ranking[0]]
+            if fidelity == max_fidelity and (not hasattr(self, 'best_fval')
+                                             or sign * bracket_best['score'] < sign * self.best_fval):
+                self.best_fval = bracket_best['score']
+            self.n_completed_trials += n_proposed
+            self.llm_query_time.append(time.time() - start_time)
+            print(f'[SH] bracket completed, {self.n_completed_trials}/{self.n_trials} configurations proposed, '
+                  f'best fval (fidelity {max_fidelity}): {getattr(self, "best_fval", np.nan):.4f}, bracket best fval: '
+                  f'{bracket_best["score"]:.4f}, generalization fval: {bracket_best.get(test_metric, np.nan):.4f}')
+            if checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
+
+        self.evaluator.shutdown()
+        print('Successive halving complete')
+        return self.observed_configs, self.observed_fvals
+
+    def _context(self, fantasies=None):
+        '''Observed configurations and scores the LLM is prompted with, optionally extended by fantasized ones.'''
+        configs, fvals = self.observed_configs, self.observed_fvals[['score']]
+        columns = configs.columns
+        if self.fidelity_mode == 'highest':
+            configs, fvals = highest_fidelity(configs, fvals, self._fidelities())
+        elif self.fidelity_mode == 'explicit':
+            configs = configs.assign(**{self.fidelity_name: self._fidelities()})
+        if fantasies is not None and fantasies[0].shape[0] > 0:
+            fantasy_configs, fantasy_fvals = fantasies
+            # pending evaluations are fantasized at the highest fidelity
+            fantasy_configs = self._at_fidelity(fantasy_configs[columns])
+            configs = pd.concat([configs, fantasy_configs], axis=0, ignore_index=True)
+            fvals = pd.concat([fvals, fantasy_fvals[['score']]], axis=0, ignore_index=True)
+        return configs, fvals
+
+    def _select_query_points(self, candidate_points, q, context=None):
+        observed_configs, observed_fvals = self._context() if context is None else context
+        q = min(q, candidate_points.shape[0])
+        candidate_points = self._at_fidelity(candidate_points)
+        if q == 1:
+            sel_points, time_taken = self.surrogate_model.select_query_point(observed_configs, observed_fvals,
+                                                                             candidate_points)
+        else:
+            sel_points, time_taken = self.surrogate_model.select_query_points(
+                observed_configs, observed_fvals, candidate_points, q=q, diversity_penalty=self.diversity_penalty)
+        if self.fidelity_mode == 'explicit':
+            sel_points = sel_points.drop(columns=[self.fidelity_name])
+        return sel_points, time_taken
+
+    def predict(self, configs, fidelity=None, context=None):
+        '''
+        Surrogate mean and std for a DataFrame of configurations. In explicit fidelity mode the predictions are
+        for the given fidelity, by default the highest one.
+        '''
+        assert isinstance(self.surrogate_model, LLM_DIS_SM), 'predictions require the discriminative SM'
+        observed_configs, observed_fvals = self._context() if context is None else context
+        configs = self._at_fidelity(configs.reset_index(drop=True), fidelity)
+        warping_transformer = self.surrogate_model.warping_transformer
+        if warping_transformer is not None:
+            observed_configs = warping_transformer.warp(observed_configs)
+            configs = warping_transformer.warp(configs)
+        y_mean, y_std, _ = self.surrogate_model._evaluate_candidate_points(observed_configs, observed_fvals, configs)
+        return y_mean, y_std
+
     def get_config(self):
-        candidate_points = self.acq_func.get_candidate_points(self.observed_configs,
-                                                              self.observed_fvals[['score']],
-                                                              alpha=self.alpha)
+        return self.get_configs(q=1)
+
+    def get_configs(self, q=None, fantasies=None, context=None):
+        '''
+        Propose q configurations (default: batch_size) for the caller to evaluate. fantasies is an optional
+        (configs, fvals) pair of DataFrames, e.g. pending evaluations with fantasized scores, that is added to
+        the observations in the prompts of this call only. context replaces the observations altogether, e.g. a
+        snapshot taken by another thread.
+        '''
+        if q is None:
+            q = self.batch_size
+        if context is None:
+            context = self._context(fantasies)
+        acq_configs, acq_fvals = self._acquisition_context(context)
+        candidate_points = self.acq_func.get_candidate_points(acq_configs, acq_fvals, alpha=self.alpha)
 
         print('=' * 150)
         print('EXAMPLE POINTS PROPOSED')
@@ -254,10 +583,7 @@ class LLAMBO:
         print('=' * 150)
 
         # select candidate point
-        sel_candidate_point, time_taken = self.surrogate_model.select_query_point(self.observed_configs,
-                                                                                  self.observed_fvals[
-                                                                                      ['score']],
-                                                                                  candidate_points)
+        sel_candidate_point, time_taken = self._select_query_points(candidate_points, q, context=context)
         print('=' * 150)
         print('SELECTED CANDIDATE POINT')
         print(sel_candidate_point)
@@ -266,7 +592,8 @@ class LLAMBO:
         return sel_candidate_point
 
     def initialize_configs(self, num_samples):
-        init_configs = self.init_f(num_samples, self.client)
+        # init_f receives an LLMClient, warmstart prompts go through the scheduler at background priority
+        init_configs = self.init_f(num_samples, self.warmstart_llm)
 
         assert isinstance(init_configs, list), 'init_f() should return a list of configs (dictionaries)'
         for item in init_configs:
@@ -275,5 +602,6 @@ class LLAMBO:
         init_configs = pd.DataFrame(init_configs)
         assert init_configs.shape[
                    0] == self.n_initial_samples, 'init_f() should return n_initial_samples number of configs'
+        self.warmstart_configs = init_configs
 
         return init_configs
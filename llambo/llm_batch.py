@@ -0,0 +1,294 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+CHAT_COMPLETIONS_URL = '/v1/chat/completions'
+# request parameters that only make sense for interactive calls
+INTERACTIVE_ONLY_PARAMS = ['timeout']
+
+
+def _to_dict(obj):
+    '''Convert an SDK response object into a plain JSON-serializable dict.'''
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    if isinstance(obj, SimpleNamespace):
+        return {k: _to_dict(v) for k, v in vars(obj).items()}
+    if isinstance(obj, dict):
+        return {k: _to_dict(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_to_dict(v) for v in obj]
+    return obj
+
+
+def _to_namespace(obj):
+    '''Convert a response dict into an object with attribute access, like the responses of the SDK.'''
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [_to_namespace(v) for v in obj]
+    return obj
+
+
+def write_job_file(path, requests):
+    '''Write (custom_id, body) pairs as a JSONL job file in the OpenAI batch format.'''
+    with open(path, 'w') as f:
+        for custom_id, body in requests:
+            f.write(json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': CHAT_COMPLETIONS_URL,
+                                'body': body}) + '\n')
+
+
+def read_output_file(path):
+    '''Map custom_id to (response body, error) from a JSONL output file in the OpenAI batch format.'''
+    results = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response')
+            error = record.get('error')
+            if error is None and response is not None and response.get('status_code', 200) != 200:
+                error = response.get('body')
+            body = None if response is None else response.get('body')
+            results[record['custom_id']] = (body, error)
+    return results
+
+
+class OpenAIBatchProcessor:
+    '''Submit a job file to the OpenAI batch API and poll until the output file is available.'''
+    def __init__(self, client, completion_window='24h', poll_interval=60):
+        self.client = client
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+
+    def process(self, job_path, output_path):
+        with open(job_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=CHAT_COMPLETIONS_URL,
+                                           completion_window=self.completion_window)
+        print(f'[Batch] Submitted {job_path} as {batch.id}')
+        while batch.status not in ['completed', 'failed', 'expired', 'cancelled']:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        print(f'[Batch] {batch.id} finished with status {batch.status}')
+
+        with open(output_path, 'w') as f:
+            for file_id in [batch.output_file_id, getattr(batch, 'error_file_id', None)]:
+                if file_id is not None:
+                    f.write(self.client.files.content(file_id).text)
+        return output_path
+
+
+class LocalBatchProcessor:
+    '''
+    Stand-in for the provider's batch endpoint: executes a job file line by line with a chat client
+    (anything with chat.completions.create) and writes the output file in the provider's format.
+    '''
+    def __init__(self, client):
+        self.client = client
+
+    def process(self, job_path, output_path):
+        with open(job_path) as f_in, open(output_path, 'w') as f_out:
+            for line in f_in:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                record = {'id': f'batch_req_{uuid.uuid4().hex}', 'custom_id': request['custom_id']}
+                try:
+                    response = self.client.chat.completions.create(**request['body'])
+                    record['response'] = {'status_code': 200, 'request_id': uuid.uuid4().hex,
+                                          'body': _to_dict(response)}
+                    record['error'] = None
+                except Exception as e:
+                    record['response'] = None
+                    record['error'] = {'code': type(e).__name__, 'message': str(e)}
+                f_out.write(json.dumps(record) + '\n')
+        return output_path
+
+
+class BatchInstance:
+    '''
+    Handle of one LLAMBO instance on a BatchSession, used by its LLM clients in place of the session. The
+    session counts the instance as waiting while any of its requests is outstanding.
+    '''
+    def __init__(self, session):
+        self.session = session
+        self.price_factor = session.price_factor
+        self.n_outstanding = 0  # guarded by the condition of the session
+
+    def submit(self, model, messages, params):
+        return self.session.submit(model, messages, params, instance=self)
+
+
+class BatchSession:
+    '''
+    Collects chat requests from all LLAMBO instances of a sweep into job files.
+
+    Callers block on the returned future. The instances run by run_batched are registered with the session, and
+    a job is flushed once every registered instance is waiting for one of its requests (and no new request
+    arrived for settle_time seconds, so that requests fanned out by one instance end up in the same job), or
+    once max_batch_size requests are collected. Without registered instances, or for requests that do not come
+    through an instance handle (see for_instance), a job is flushed after idle_timeout seconds without a new
+    request. Jobs are handed to the processor concurrently and the results are fanned back out to the waiting
+    callers.
+    '''
+    def __init__(self, processor, work_dir='batch_jobs', max_batch_size=50000, idle_timeout=2.0, settle_time=0.1,
+                 price_factor=0.5):  # batch requests are billed at a discount
+        self.processor = processor
+        self.work_dir = work_dir
+        self.max_batch_size = max_batch_size
+        self.idle_timeout = idle_timeout
+        self.settle_time = settle_time
+        self.price_factor = price_factor
+        os.makedirs(work_dir, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._pending = []  # (custom_id, body, future, instance)
+        self._last_request_time = None
+        self._instances = []  # handles given out by for_instance
+        self._n_registered = 0  # instances run by run_batched that have not finished yet
+        self._n_jobs = 0
+        self._job_threads = []
+        self._closed = False
+        self.n_requests = 0
+        self._flusher = threading.Thread(target=self._flush_loop, name='llm-batch-flusher', daemon=True)
+        self._flusher.start()
+
+    def for_instance(self):
+        '''Handle for the LLM clients of one LLAMBO instance.'''
+        with self._cond:
+            instance = BatchInstance(self)
+            self._instances.append(instance)
+            return instance
+
+    def register(self, n=1):
+        '''Register n running instances, a job is only flushed once all of them are waiting.'''
+        with self._cond:
+            self._n_registered += n
+            self._cond.notify_all()
+
+    def unregister(self, n=1):
+        '''Instances that finished, they are no longer waited for.'''
+        with self._cond:
+            self._n_registered -= n
+            self._cond.notify_all()
+
+    def submit(self, model, messages, params, instance=None):
+        '''Queue a chat completion request, returns a future resolving to the response.'''
+        body = {'model': model, 'messages': messages}
+        body.update({k: v for k, v in params.items() if k not in INTERACTIVE_ONLY_PARAMS})
+        future = Future()
+        with self._cond:
+            assert not self._closed, 'batch session has been closed'
+            self.n_requests += 1
+            self._pending.append((f'request-{self.n_requests}', body, future, instance))
+            if instance is not None:
+                instance.n_outstanding += 1
+            self._last_request_time = time.time()
+            self._cond.notify_all()
+        return future
+
+    def _all_waiting(self):
+        n_waiting = sum(1 for instance in self._instances if instance.n_outstanding > 0)
+        return n_waiting >= self._n_registered
+
+    def _take_ready_job(self):
+        if not self._pending:
+            return None
+        idle = time.time() - self._last_request_time
+        if self._n_registered > 0 and not any(instance is None for _, _, _, instance in self._pending):
+            ready = self._all_waiting() and idle >= self.settle_time
+        else:
+            ready = idle >= self.idle_timeout
+        if len(self._pending) >= self.max_batch_size or ready or self._closed:
+            job = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            return job
+        return None
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                job = self._take_ready_job()
+                while job is None:
+                    if self._closed and not self._pending:
+                        return
+                    self._cond.wait(timeout=min(self.settle_time, self.idle_timeout / 4))
+                    job = self._take_ready_job()
+                self._n_jobs += 1
+                job_id = self._n_jobs
+                # jobs run concurrently, an instance that was late for this job gets its own job right away
+                thread = threading.Thread(target=self._run_job, args=(job_id, job), name=f'llm-batch-job-{job_id}',
+                                          daemon=True)
+                self._job_threads.append(thread)
+            thread.start()
+
+    def _run_job(self, job_id, job):
+        job_path = os.path.join(self.work_dir, f'job_{job_id}.jsonl')
+        output_path = os.path.join(self.work_dir, f'job_{job_id}_output.jsonl')
+        print(f'[Batch] Flushing job {job_id} with {len(job)} requests')
+        try:
+            write_job_file(job_path, [(custom_id, body) for custom_id, body, _, _ in job])
+            results = read_output_file(self.processor.process(job_path, output_path))
+        except Exception as e:
+            results = {custom_id: (None, e) for custom_id, _, _, _ in job}
+
+        with self._cond:
+            # the instances are no longer waiting once their results are delivered
+            for _, _, _, instance in job:
+                if instance is not None:
+                    instance.n_outstanding -= 1
+            self._cond.notify_all()
+        for custom_id, _, future, _ in job:
+            body, error = results.get(custom_id, (None, {'message': 'missing from batch output'}))
+            if isinstance(error, Exception):
+                future.set_exception(error)
+            elif error is not None or body is None:
+                future.set_exception(RuntimeError(f'[Batch] {custom_id} failed: {error}'))
+            else:
+                future.set_result(_to_namespace(body))
+
+    def close(self):
+        '''Flush the remaining requests and wait for all jobs to finish.'''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        for thread in self._job_threads:
+            thread.join()
+
+
+def run_batched(jobs, session=None):
+    '''
+    Run zero-argument callables (e.g. lambda: llambo.optimize()) concurrently, one thread each, so that their
+    LLM requests end up in the same batch jobs. With the BatchSession of the instances, each job is registered
+    as an instance, so that jobs are flushed as soon as all unfinished instances are waiting. Returns their
+    results in order, re-raising the first error.
+    '''
+    results = [None] * len(jobs)
+    errors = [None] * len(jobs)
+
+    def run(idx):
+        try:
+            results[idx] = jobs[idx]()
+        except BaseException as e:
+            errors[idx] = e
+        finally:
+            if session is not None:
+                session.unregister()
+
+    if session is not None:
+        session.register(len(jobs))
+    threads = [threading.Thread(target=run, args=(idx,)) for idx in range(len(jobs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
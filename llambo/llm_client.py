@@ -0,0 +1,236 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from llambo.rate_limiter import RateLimiter
+from llambo.llm_scheduler import SPECULATIVE
+
+SYSTEM_MESSAGE = "You are an AI assistant that helps people find information."
+
+
+def request_key(model, messages, params):
+    '''Hash of everything that determines the upstream response of a chat request.'''
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Coalesce concurrent identical requests.
+
+    The first caller for a key executes the request, callers arriving while it is in flight wait for it and
+    receive the same result (or exception). Every caller gets its own deep copy, since responses are mutated
+    downstream. Nothing is cached once the request has completed.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.n_coalesced = 0
+
+    def do(self, key, fn):
+        '''Run fn() unless an identical call is in flight, return (result, was_coalesced).'''
+        with self._lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+            else:
+                self.n_coalesced += 1
+
+        if is_leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result), not is_leader
+
+
+# shared by all LLMClient instances of the process, so identical prompts are coalesced across LLAMBO runs
+DEFAULT_SINGLE_FLIGHT = SingleFlight()
+
+
+class LLMClient:
+    '''
+    Call layer around an OpenAI-compatible chat client.
+
+    Each instance is bound to one model and owns its rate limiter and cost accounting, so several tiers
+    (e.g. a small local model and gpt-4o) can be used side by side.
+    '''
+    def __init__(self, client, model='gpt-4o-mini', rate_limiter=None,
+                 prompt_price=0.00015,  # USD per 1K prompt tokens
+                 completion_price=0.0006,  # USD per 1K completion tokens
+                 name=None,
+                 coalesce=True,  # default for call sites that do not specify whether to coalesce requests
+                 single_flight=None,
+                 scheduler=None,  # optional LLMRequestScheduler all upstream calls are submitted through
+                 priority=SPECULATIVE,  # default priority class for call sites that do not specify one
+                 batch=None,  # optional BatchSession, requests are then collected into batch jobs instead of sent
+                 ):
+        self.client = client
+        self.model = model
+        if rate_limiter is None:
+            self.rate_limiter = RateLimiter(max_tokens=100000, time_frame=60, max_requests=720)
+        else:
+            self.rate_limiter = rate_limiter
+        self.prompt_price = prompt_price
+        self.completion_price = completion_price
+        self.name = model if name is None else name
+        self.coalesce = coalesce
+        self.single_flight = DEFAULT_SINGLE_FLIGHT if single_flight is None else single_flight
+        self.scheduler = scheduler
+        self.priority = priority
+        self.batch = batch
+        self._lock = threading.Lock()
+
+        self.n_requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_cost = 0.0
+        self.total_time = 0.0
+        self.n_coalesced = 0
+
+    def _account(self, response, start_time, price_factor=1.0):
+        '''Update rate limiter and cost accounting from the usage reported in a response.'''
+        usage = getattr(response, 'usage', None)
+        if usage is not None and self.batch is None:
+            # the request itself has been counted before sending it
+            self.rate_limiter.add_tokens(usage.completion_tokens, current_time=start_time)
+        with self._lock:
+            self.n_requests += 1
+            self.total_time += time.time() - start_time
+            if usage is None:
+                return
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+            self.total_cost += price_factor * (self.prompt_price * (usage.prompt_tokens / 1000) +
+                                               self.completion_price * (usage.completion_tokens / 1000))
+
+    def _create(self, messages, params, priority, deadline):
+        if self.batch is not None:
+            # batch jobs are neither rate limited nor scheduled, the caller simply waits for the job to finish
+            return self._send_batch(messages, params)
+        if self.scheduler is None:
+            return self._send(messages, params)
+        # the scheduler adds the request to the rate limiter before dispatching it, so that a throttled request
+        # waits in its queue instead of blocking a worker
+        token_count = self.rate_limiter.count_tokens(messages[-1]['content'])
+        return self.scheduler.run(lambda: self._send(messages, params, rate_limited=True), priority=priority,
+                                  deadline=deadline, rate_limiter=self.rate_limiter, token_count=token_count)
+
+    def _send(self, messages, params, rate_limited=False):
+        start_time = time.time()
+        if not rate_limited:
+            self.rate_limiter.add_request(request_text=messages[-1]['content'], current_time=start_time)
+        response = self.client.chat.completions.create(model=self.model, messages=messages, **params)
+        self._account(response, start_time)
+        return response
+
+    def _send_batch(self, messages, params):
+        start_time = time.time()
+        response = self.batch.submit(self.model, messages, params).result()
+        self._account(response, start_time, price_factor=self.batch.price_factor)
+        return response
+
+    def chat(self, user_message, temperature=0.7, max_tokens=4000, top_p=0.95, n=5, timeout=100, coalesce=None,
+             priority=None, deadline=None):
+        '''
+        Send a single user message and return the raw chat completion response.
+
+        With coalesce=True (default: self.coalesce), a request identical to one already in flight waits for that
+        request instead of going upstream. Call sites that rely on independent samples should pass False.
+        If a scheduler is attached, the upstream call is queued with the given priority class (default:
+        self.priority) and deadline in seconds.
+        '''
+        messages = []
+        messages.append({"role": "system", "content": SYSTEM_MESSAGE})
+        messages.append({"role": "user", "content": user_message})
+        params = dict(temperature=temperature, max_tokens=max_tokens, top_p=top_p, n=n, timeout=timeout)
+
+        if priority is None:
+            priority = self.priority
+        if coalesce is None:
+            coalesce = self.coalesce
+        if not coalesce:
+            return self._create(messages, params, priority, deadline)
+
+        key = request_key(self.model, messages, params)
+        response, was_coalesced = self.single_flight.do(key, lambda: self._create(messages, params, priority,
+                                                                                  deadline))
+        if was_coalesced:
+            with self._lock:
+                self.n_coalesced += 1
+        return response
+
+    def get_state(self):
+        '''Accounting counters, the client itself and in-flight requests are not part of the state.'''
+        with self._lock:
+            return {'n_requests': self.n_requests, 'prompt_tokens': self.prompt_tokens,
+                    'completion_tokens': self.completion_tokens, 'total_cost': self.total_cost,
+                    'total_time': self.total_time, 'n_coalesced': self.n_coalesced}
+
+    def set_state(self, state):
+        with self._lock:
+            for name, value in state.items():
+                setattr(self, name, value)
+
+    def cost_summary(self):
+        return {
+            'model': self.model,
+            'n_requests': self.n_requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cost': self.total_cost,
+            'time': self.total_time,
+            'n_coalesced': self.n_coalesced,
+        }
+
+
+class CascadePolicy:
+    '''
+    Model cascade for surrogate scoring.
+
+    Every candidate is scored with the first (cheap) tier. A candidate is escalated to the next tier only if its
+    predictive interval mean +- n_std * std overlaps the current best observed value, i.e. if the cheap tier
+    cannot tell whether it improves on the incumbent. Candidates clearly above or below the best keep the
+    cheap prediction.
+    '''
+    def __init__(self, tiers, n_std=1.0):
+        assert len(tiers) >= 2, 'a cascade needs at least two tiers'
+        assert n_std > 0, 'n_std must be positive'
+        for tier in tiers:
+            assert isinstance(tier, LLMClient), 'cascade tiers must be LLMClient instances'
+        self.tiers = tiers
+        self.n_std = n_std
+        self.n_scored = [0] * len(tiers)  # number of candidates scored by each tier
+
+    def escalate_mask(self, y_mean, y_std, best_fval):
+        '''Boolean mask of candidates whose interval overlaps the best observed value.'''
+        lower = y_mean - self.n_std * y_std
+        upper = y_mean + self.n_std * y_std
+        return (lower <= best_fval) & (best_fval <= upper)
+
+    def cost_summary(self):
+        summary = []
+        for tier, n_scored in zip(self.tiers, self.n_scored):
+            tier_summary = tier.cost_summary()
+            tier_summary['n_scored'] = n_scored
+            summary.append(tier_summary)
+        return summary
@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+# priority classes, from most to least urgent
+CRITICAL = 'critical'  # requests the next trial is blocked on, e.g. acquisition
+SPECULATIVE = 'speculative'  # surrogate scoring, prefetching
+BACKGROUND = 'background'  # warmstart, distillation refreshes
+PRIORITY_CLASSES = [CRITICAL, SPECULATIVE, BACKGROUND]
+
+DEFAULT_WEIGHTS = {CRITICAL: 8.0, SPECULATIVE: 3.0, BACKGROUND: 1.0}
+
+
+class DeadlineExceeded(Exception):
+    '''Raised for requests whose deadline passed before a worker could start them.'''
+    pass
+
+
+class _ScheduledRequest:
+    def __init__(self, fn, priority, deadline, submit_time, rate_limiter=None, token_count=0):
+        self.fn = fn
+        self.priority = priority
+        self.deadline = deadline  # absolute time, None means no deadline
+        self.submit_time = submit_time
+        self.rate_limiter = rate_limiter  # checked before the request is dequeued
+        self.token_count = token_count
+        self.future = Future()
+
+
+class LLMRequestScheduler:
+    '''
+    Process-wide scheduler for LLM requests.
+
+    Requests are queued per priority class and dispatched to a fixed number of worker threads, which bounds
+    the number of concurrent upstream calls. Classes are served by weighted fair queuing (virtual finish tags,
+    so background traffic is delayed but never starved), within a class the request with the earliest
+    deadline goes first. Requests whose deadline has passed when they are dequeued fail with
+    DeadlineExceeded instead of being sent.
+
+    A request submitted with a rate limiter is only dequeued once the limiter admits it. Until then it stays
+    queued and is skipped, so that requests for other limiters (e.g. other models) are not held up behind it.
+    Workers only wait, without holding a request, when every queued request is throttled, so that a more
+    urgent request submitted in the meantime still goes first.
+    '''
+    def __init__(self, n_workers=4, weights=None):
+        assert n_workers >= 1, 'n_workers must be at least 1'
+        self.n_workers = n_workers
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        assert set(self.weights) == set(PRIORITY_CLASSES), f'weights must be given for {PRIORITY_CLASSES}'
+
+        self._cond = threading.Condition()
+        self._queues = {priority: [] for priority in PRIORITY_CLASSES}  # heaps of (deadline, seq, request)
+        self._finish_tags = {priority: 0.0 for priority in PRIORITY_CLASSES}  # tag of the last dequeued request
+        self._head_tags = {priority: None for priority in PRIORITY_CLASSES}  # tag of the next request of a class
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._shutdown = False
+
+        self.in_flight = 0
+        self.n_started = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.n_completed = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.n_expired = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.total_wait = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self.max_queue_depth = {priority: 0 for priority in PRIORITY_CLASSES}
+
+        self._workers = []
+        for i in range(n_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'llm-scheduler-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn, priority=SPECULATIVE, deadline=None, rate_limiter=None, token_count=0):
+        '''
+        Queue fn() for execution, deadline is in seconds from now. With a rate_limiter, the request (of
+        token_count prompt tokens) is added to it right before dispatching. Returns a concurrent.futures.Future.
+        '''
+        assert priority in PRIORITY_CLASSES, f'priority must be one of {PRIORITY_CLASSES}'
+        now = time.time()
+        request = _ScheduledRequest(fn, priority, None if deadline is None else now + deadline, now,
+                                    rate_limiter=rate_limiter, token_count=token_count)
+        sort_deadline = float('inf') if request.deadline is None else request.deadline
+        with self._cond:
+            assert not self._shutdown, 'scheduler has been shut down'
+            if not self._queues[priority]:
+                # a class that becomes backlogged starts from the current virtual time
+                self._head_tags[priority] = max(self._virtual_time, self._finish_tags[priority]) + \
+                                            1.0 / self.weights[priority]
+            heapq.heappush(self._queues[priority], (sort_deadline, next(self._seq), request))
+            self.max_queue_depth[priority] = max(self.max_queue_depth[priority], len(self._queues[priority]))
+            self._cond.notify()
+        return request.future
+
+    def run(self, fn, priority=SPECULATIVE, deadline=None, rate_limiter=None, token_count=0):
+        '''Submit fn() and block until its result is available.'''
+        return self.submit(fn, priority=priority, deadline=deadline, rate_limiter=rate_limiter,
+                           token_count=token_count).result()
+
+    def _priorities_in_order(self):
+        '''Backlogged classes by virtual finish tag (ties go to the more urgent class).'''
+        priorities = [priority for priority in PRIORITY_CLASSES if self._queues[priority]]
+        return sorted(priorities, key=lambda priority: (self._head_tags[priority], PRIORITY_CLASSES.index(priority)))
+
+    def _dequeue(self, priority, entry):
+        '''Remove entry from the queue of its class, the class is charged as if it were its head request.'''
+        queue = self._queues[priority]
+        tag = self._head_tags[priority]
+        self._virtual_time = tag
+        self._finish_tags[priority] = tag
+        if entry is queue[0]:
+            heapq.heappop(queue)
+        else:
+            queue.remove(entry)
+            heapq.heapify(queue)
+        if queue:
+            self._head_tags[priority] = tag + 1.0 / self.weights[priority]
+        else:
+            self._head_tags[priority] = None
+        return entry[2]
+
+    def _select_request(self, now):
+        '''
+        Dequeue the next request to dispatch. Classes are visited in weighted fair queuing order, requests of a
+        class in deadline order. A request whose rate limiter does not admit it stays queued and is skipped, so
+        that requests for other limiters behind it are still dispatched. Overdue requests met on the way fail
+        with DeadlineExceeded. Returns the request, or None and the seconds until a skipped request may be
+        admitted or expire.
+        '''
+        throttled = set()  # ids of the limiters which did not admit a request in this pass
+        wait_time = float('inf')
+        for priority in self._priorities_in_order():
+            for entry in sorted(self._queues[priority]):
+                request = entry[2]
+                if request.deadline is not None and now > request.deadline:
+                    self._dequeue(priority, entry)
+                    self.n_expired[priority] += 1
+                    request.future.set_exception(DeadlineExceeded(
+                        f'{priority} request waited {now - request.submit_time:.2f}s and missed its deadline'))
+                    continue
+                limiter = request.rate_limiter
+                if limiter is not None:
+                    if id(limiter) not in throttled:
+                        limiter_wait = limiter.try_acquire(request_token_count=request.token_count, current_time=now)
+                        if limiter_wait > 0:
+                            throttled.add(id(limiter))
+                            wait_time = min(wait_time, limiter_wait)
+                    if id(limiter) in throttled:
+                        if request.deadline is not None:
+                            wait_time = min(wait_time, request.deadline - now)
+                        continue
+                return self._dequeue(priority, entry), None
+        return None, wait_time
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    while not self._shutdown and not any(self._queues.values()):
+                        self._cond.wait()
+                    if self._shutdown and not any(self._queues.values()):
+                        return
+                    now = time.time()
+                    request, wait_time = self._select_request(now)
+                    if request is not None:
+                        break
+                    if any(self._queues.values()):
+                        # every queued request is throttled, wake up when a limiter may admit one, a deadline
+                        # passes, or a new request is submitted
+                        self._cond.wait(timeout=wait_time)
+                self.total_wait[request.priority] += now - request.submit_time
+                self.n_started[request.priority] += 1
+                self.in_flight += 1
+
+            if request.future.set_running_or_notify_cancel():
+                try:
+                    request.future.set_result(request.fn())
+                except BaseException as e:
+                    request.future.set_exception(e)
+
+            with self._cond:
+                self.in_flight -= 1
+                self.n_completed[request.priority] += 1
+
+    def queue_depths(self):
+        with self._cond:
+            return {priority: len(self._queues[priority]) for priority in PRIORITY_CLASSES}
+
+    def metrics(self):
+        '''Queue depth, throughput and waiting time per priority class.'''
+        with self._cond:
+            metrics = {'in_flight': self.in_flight}
+            for priority in PRIORITY_CLASSES:
+                metrics[priority] = {
+                    'queue_depth': len(self._queues[priority]),
+                    'max_queue_depth': self.max_queue_depth[priority],
+                    'completed': self.n_completed[priority],
+                    'expired': self.n_expired[priority],
+                    'mean_wait': self.total_wait[priority] / max(self.n_started[priority], 1),
+                }
+            return metrics
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    '''Scheduler shared by all LLAMBO components of the process, created on first use.'''
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMRequestScheduler()
+        return _default_scheduler
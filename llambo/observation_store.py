@@ -0,0 +1,216 @@
+import itertools
+import numbers
+import numpy as np
+import pandas as pd
+
+
+class ObservationStore:
+    '''
+    Columnar store for the observations of a LLAMBO run.
+
+    Every hyperparameter and result metric is kept in its own preallocated NumPy array that grows by doubling,
+    so appending is amortized O(1) instead of copying the whole history. Categorical hyperparameters are held
+    as integer codes into a vocabulary (seeded from the search space, extended on the fly). DataFrame views are
+    built on demand and cached until the next append. Configurations that are being evaluated are tracked
+    separately as pending and are not part of the observations.
+
+    Each observation also records the fidelity (resource level, e.g. epochs) it was measured at, NaN if
+    unknown, so a configuration evaluated at several fidelities is kept as several (config, fidelity, metric)
+    rows.
+    '''
+    def __init__(self, hyperparameter_constraints: dict, initial_capacity=64):
+        assert initial_capacity >= 1, 'initial_capacity must be at least 1'
+        self.hyperparameter_constraints = hyperparameter_constraints
+        self.capacity = initial_capacity
+        self.n = 0
+
+        self.config_columns = []  # column order of the configurations, fixed by the first observation
+        self.fval_columns = []  # result metrics, new metrics can appear at any time
+        self.vocabularies = {}  # categorical column -> list of values, the code of a value is its position
+        self._codes = {}  # categorical column -> {value: code}
+        self._configs = {}  # column -> array of values (codes for categorical columns)
+        self._fvals = {}  # metric -> float array, NaN where a metric was not reported
+        self._fidelities = np.full(self.capacity, np.nan, dtype=np.float64)
+
+        self.pending = {}  # pending id -> config dict
+        self._pending_ids = itertools.count()
+
+        self._configs_view = None
+        self._fvals_view = None
+
+    def __len__(self):
+        return self.n
+
+    def _is_categorical(self, name, value):
+        if name in self.hyperparameter_constraints:
+            return self.hyperparameter_constraints[name][0] == 'categorical'
+        return not isinstance(value, numbers.Number)
+
+    def _add_config_column(self, name, value):
+        if self._is_categorical(name, value):
+            choices = []
+            if name in self.hyperparameter_constraints:
+                choices = list(self.hyperparameter_constraints[name][2])
+            self.vocabularies[name] = choices
+            self._codes[name] = {choice: code for code, choice in enumerate(choices)}
+            self._configs[name] = np.full(self.capacity, -1, dtype=np.int32)
+        elif name in self.hyperparameter_constraints and self.hyperparameter_constraints[name][0] == 'int':
+            self._configs[name] = np.zeros(self.capacity, dtype=np.int64)
+        else:
+            self._configs[name] = np.full(self.capacity, np.nan, dtype=np.float64)
+        self.config_columns.append(name)
+
+    def _add_fval_column(self, name):
+        self._fvals[name] = np.full(self.capacity, np.nan, dtype=np.float64)
+        self.fval_columns.append(name)
+
+    def _encode(self, name, value):
+        code = self._codes[name].get(value)
+        if code is None:
+            code = len(self.vocabularies[name])
+            self.vocabularies[name].append(value)
+            self._codes[name][value] = code
+        return code
+
+    def _grow(self, min_capacity):
+        capacity = max(self.capacity, 1)
+        while capacity < min_capacity:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        for arrays in [self._configs, self._fvals]:
+            for name, array in arrays.items():
+                fill = -1 if name in self.vocabularies else (0 if array.dtype == np.int64 else np.nan)
+                grown = np.full(capacity, fill, dtype=array.dtype)
+                grown[:self.n] = array[:self.n]
+                arrays[name] = grown
+        fidelities = np.full(capacity, np.nan, dtype=np.float64)
+        fidelities[:self.n] = self._fidelities[:self.n]
+        self._fidelities = fidelities
+        self.capacity = capacity
+
+    def add(self, config: dict, fvals: dict, pending_id=None, fidelity=None):
+        '''Append one observation, optionally resolving the pending configuration it came from.'''
+        self._grow(self.n + 1)
+        if not self.config_columns:
+            for name, value in config.items():
+                self._add_config_column(name, value)
+        assert set(config.keys()) == set(self.config_columns), \
+            f'config has columns {list(config.keys())}, expected {self.config_columns}'
+
+        for name in self.config_columns:
+            value = config[name]
+            self._configs[name][self.n] = self._encode(name, value) if name in self.vocabularies else value
+        for name, value in fvals.items():
+            if name not in self._fvals:
+                self._add_fval_column(name)
+            self._fvals[name][self.n] = value
+        self._fidelities[self.n] = np.nan if fidelity is None else fidelity
+
+        self.n += 1
+        self._configs_view = None
+        self._fvals_view = None
+        if pending_id is not None:
+            self.pending.pop(pending_id, None)
+
+    def add_frames(self, configs: pd.DataFrame, fvals: pd.DataFrame, fidelities=None):
+        '''Append the rows of a config and a result DataFrame of the same length.'''
+        assert configs.shape[0] == fvals.shape[0], 'configs and fvals must have the same number of rows'
+        if fidelities is None:
+            fidelities = [None] * configs.shape[0]
+        self._grow(self.n + configs.shape[0])
+        for config, fval, fidelity in zip(configs.to_dict('records'), fvals.to_dict('records'), fidelities):
+            self.add(config, fval, fidelity=fidelity)
+
+    def add_pending(self, config: dict):
+        '''Register a configuration that is being evaluated, returns its pending id.'''
+        pending_id = next(self._pending_ids)
+        self.pending[pending_id] = dict(config)
+        return pending_id
+
+    def remove_pending(self, pending_id):
+        '''Drop a pending configuration without an observation, e.g. if its evaluation failed.'''
+        self.pending.pop(pending_id, None)
+
+    def configs(self) -> pd.DataFrame:
+        '''DataFrame view of the observed configurations, cached until the next append.'''
+        if self._configs_view is None:
+            columns = {}
+            for name in self.config_columns:
+                values = self._configs[name][:self.n]
+                if name in self.vocabularies:
+                    values = pd.Categorical.from_codes(values, categories=self.vocabularies[name])
+                columns[name] = values
+            self._configs_view = pd.DataFrame(columns, columns=self.config_columns, copy=False)
+        return self._configs_view
+
+    def fvals(self) -> pd.DataFrame:
+        '''DataFrame view of the observed results, cached until the next append.'''
+        if self._fvals_view is None:
+            columns = {name: self._fvals[name][:self.n] for name in self.fval_columns}
+            self._fvals_view = pd.DataFrame(columns, columns=self.fval_columns, copy=False)
+        return self._fvals_view
+
+    def pending_configs(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.pending.values()), columns=self.config_columns or None)
+
+    def column(self, name):
+        '''Raw array of a result metric (or the codes of a config column), without building a DataFrame.'''
+        if name in self._fvals:
+            return self._fvals[name][:self.n]
+        return self._configs[name][:self.n]
+
+    def fidelities(self):
+        '''Fidelity of each observation, NaN where it was not reported.'''
+        return self._fidelities[:self.n]
+
+    def best(self, metric='score', lower_is_better=True):
+        values = self.column(metric)
+        return np.nanmin(values) if lower_is_better else np.nanmax(values)
+
+    def get_state(self):
+        '''Compact state: arrays trimmed to the number of observations.'''
+        return {
+            'config_columns': list(self.config_columns),
+            'fval_columns': list(self.fval_columns),
+            'vocabularies': {name: list(vocabulary) for name, vocabulary in self.vocabularies.items()},
+            'configs': {name: array[:self.n].copy() for name, array in self._configs.items()},
+            'fvals': {name: array[:self.n].copy() for name, array in self._fvals.items()},
+            'fidelities': self._fidelities[:self.n].copy(),
+            'pending': dict(self.pending),
+        }
+
+    def set_state(self, state):
+        self.n = len(next(iter(state['fvals'].values()))) if state['fvals'] else 0
+        self.capacity = self.n
+        self.config_columns = list(state['config_columns'])
+        self.fval_columns = list(state['fval_columns'])
+        self.vocabularies = {name: list(vocabulary) for name, vocabulary in state['vocabularies'].items()}
+        self._codes = {name: {value: code for code, value in enumerate(vocabulary)}
+                       for name, vocabulary in self.vocabularies.items()}
+        self._configs = {name: array.copy() for name, array in state['configs'].items()}
+        self._fvals = {name: array.copy() for name, array in state['fvals'].items()}
+        self._fidelities = state['fidelities'].copy() if 'fidelities' in state else np.full(self.n, np.nan)
+        # the arrays of the state are trimmed to the observations, reallocate them so that the next add has room
+        self._grow(max(self.n, 1))
+        self.pending = dict(state['pending'])
+        self._pending_ids = itertools.count(max(self.pending.keys(), default=-1) + 1)
+        self._configs_view = None
+        self._fvals_view = None
+
+    def memory_usage(self):
+        '''Bytes held by the preallocated arrays.'''
+        return sum(array.nbytes for array in itertools.chain(self._configs.values(), self._fvals.values(),
+                                                             [self._fidelities]))
+
+
+def highest_fidelity(configs: pd.DataFrame, fvals: pd.DataFrame, fidelities):
+    '''
+    Keep one row per configuration: the most recent observation at the highest fidelity it reached. Rows keep
+    their original order. NaN fidelities count as the highest.
+    '''
+    fidelities = np.asarray(fidelities, dtype=float)
+    order = np.lexsort((np.arange(len(fidelities)), fidelities))  # by fidelity, then insertion, NaN last
+    keep = ~configs.iloc[order].duplicated(keep='last').to_numpy()
+    rows = np.sort(order[keep])
+    return configs.iloc[rows].reset_index(drop=True), fvals.iloc[rows].reset_index(drop=True)
@@ -1,3 +1,5 @@
+import bisect
+import threading
 import time
 import tiktoken
 
@@ -17,47 +19,82 @@ class RateLimiter:
         self.timestamps = []
         # keeps track of tokens used at each timestamp
         self.tokens_used = []
+        # keeps track of which timestamps are requests, the others only add tokens to a request counted before
+        self.is_request = []
         # keeps track of the number of requests made
         self.request_count = 0
+        # requests may be sent from several scheduler worker threads
+        self._lock = threading.Lock()
 
-    def add_request(self, request_text=None, request_token_count=None, current_time=None):
-        if current_time is None:
-            current_time = time.time()
+    def get_state(self):
+        with self._lock:
+            return {'timestamps': list(self.timestamps), 'tokens_used': list(self.tokens_used),
+                    'is_request': list(self.is_request), 'request_count': self.request_count}
 
-        # Check old requests and remove them if they're outside the time frame
-        while self.timestamps and self.timestamps[0] < current_time - self.time_frame:
-            self.timestamps.pop(0)
-            self.tokens_used.pop(0)
-            self.request_count -= 1
+    def set_state(self, state):
+        with self._lock:
+            self.timestamps = list(state['timestamps'])
+            self.tokens_used = list(state['tokens_used'])
+            self.is_request = list(state.get('is_request', [True] * len(self.timestamps)))
+            self.request_count = sum(self.is_request)
 
-        # Add new request
-        self.timestamps.append(current_time)
+    def count_tokens(self, request_text):
+        encoding = tiktoken.encoding_for_model('gpt-3.5-turbo')
+        return len(encoding.encode(request_text))
 
+    def _num_tokens(self, request_text=None, request_token_count=None):
         if request_text is not None:
-            encoding = tiktoken.encoding_for_model('gpt-3.5-turbo')
-            num_tokens = len(encoding.encode(request_text))
+            return self.count_tokens(request_text)
         elif request_token_count is not None:
-            num_tokens = request_token_count
+            return request_token_count
         else:
             raise ValueError('Either request_text or request_token_count must be specified.')
 
-        self.tokens_used.append(num_tokens)
+    def add_request(self, request_text=None, request_token_count=None, current_time=None):
+        # blocks until the request fits into the limits. The lock is not held while sleeping, so that other threads
+        # can still check the limits, e.g. the scheduler dispatching requests of another rate limiter
+        num_tokens = self._num_tokens(request_text, request_token_count)
+        while True:
+            sleep_time, limit = self._try_add(num_tokens, current_time, is_request=True)
+            if sleep_time == 0:
+                return
+            print(f'[Rate Limiter] Sleeping for {sleep_time:.2f}s to avoid hitting the {limit} limit...')
+            time.sleep(sleep_time)
+            current_time = None
 
-        self.request_count += 1
+    def try_acquire(self, request_text=None, request_token_count=None, current_time=None):
+        '''Add the request if it fits into the limits now and return 0, else return the seconds to wait.'''
+        return self._try_add(self._num_tokens(request_text, request_token_count), current_time, is_request=True)[0]
 
-        if self.request_count >= self.max_requests:
-            sleep_time = (self.timestamps[0] + self.time_frame) - current_time
-            print(f'[Rate Limiter] Sleeping for {sleep_time:.2f}s to avoid hitting the request limit...')
-            time.sleep(sleep_time)
-            self.request_count = 0
-            
-
-        # If the sum of tokens used in the current time frame exceeds the max tokens
-        if sum(self.tokens_used) > self.max_tokens:
-            # Sleep for the remainder of the time frame
-            sleep_time = (self.timestamps[0] + self.time_frame) - current_time
-            print(f'[Rate Limiter] Sleeping for {sleep_time:.2f}s to avoid hitting the token limit...')
-            time.sleep(sleep_time)
-            # Clear the old requests after waking up
-            self.timestamps.clear()
-            self.tokens_used.clear()
\ No newline at end of file
+    def add_tokens(self, token_count, current_time=None):
+        # tokens of a request that has been added already, e.g. the completion tokens of its response
+        self._try_add(token_count, current_time, is_request=False)
+
+    def _try_add(self, num_tokens, current_time=None, is_request=True):
+        with self._lock:
+            if current_time is None:
+                current_time = time.time()
+
+            # Check old requests and remove them if they're outside the time frame
+            while self.timestamps and self.timestamps[0] <= current_time - self.time_frame:
+                self.timestamps.pop(0)
+                self.tokens_used.pop(0)
+                if self.is_request.pop(0):
+                    self.request_count -= 1
+
+            # tokens of a request that has been sent already are recorded in any case
+            if is_request:
+                if self.request_count >= self.max_requests:
+                    oldest = next(timestamp for timestamp, request in zip(self.timestamps, self.is_request) if request)
+                    return oldest + self.time_frame - current_time, 'request'
+                if self.timestamps and sum(self.tokens_used) + num_tokens > self.max_tokens:
+                    return self.timestamps[0] + self.time_frame - current_time, 'token'
+
+            # Add new request, timestamps are kept sorted
+            pos = bisect.bisect_right(self.timestamps, current_time)
+            self.timestamps.insert(pos, current_time)
+            self.tokens_used.insert(pos, num_tokens)
+            self.is_request.insert(pos, is_request)
+            if is_request:
+                self.request_count += 1
+            return 0, None
@@ -0,0 +1,726 @@
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable
+
+import numpy as np
+import pandas as pd
+from syne_tune.optimizer.schedulers import FIFOScheduler, HyperbandScheduler
+from syne_tune.optimizer.schedulers.synchronous import SynchronousHyperbandScheduler
+from syne_tune.optimizer.schedulers.multi_fidelity import MultiFidelitySchedulerMixin
+from syne_tune.optimizer.schedulers.searchers import StochasticAndFilterDuplicatesSearcher
+from syne_tune.optimizer.baselines import SyncHyperband
+from syne_tune.optimizer.scheduler import SchedulerDecision
+from syne_tune.backend.trial_status import Trial
+
+from llambo.checkpoint import dumps_state, loads_state
+from llambo.config_index import TabularConfigIndex
+from llambo.learning_curves import LearningCurvePredictor
+
+logger = logging.getLogger(__name__)
+
+PENDING_STRATEGIES = ['fantasize', 'exclude']
+EMPTY_BUFFER_POLICIES = ['wait', 'fallback']
+
+
+class LLAMBOSearcher(StochasticAndFilterDuplicatesSearcher):
+    """
+    Syne Tune searcher proposing configurations with a :class:`llambo.llambo.LLAMBO` instance.
+
+    Works with :class:`FIFOScheduler`, :class:`HyperbandScheduler` (ASHA) and
+    :class:`SynchronousHyperbandScheduler` (see :func:`attach_searcher`). With ``n_workers > 1``,
+    configurations which are still being evaluated are accounted for:
+
+    * ``pending_strategy="fantasize"``: pending configurations are added to the prompts with the score the
+      surrogate predicted when they were proposed (median observed score for initial configurations)
+    * ``pending_strategy="exclude"``: pending configurations are only excluded from the proposals
+
+    In both cases, a proposal which was already suggested is replaced by the next best one, or by a random
+    configuration if LLAMBO only proposes duplicates.
+
+    With multi-fidelity schedulers, every result is recorded together with its resource level. How results
+    at several levels enter the prompts is set by the ``fidelity_mode`` of LLAMBO ("highest" or
+    "explicit"), whose fidelity range is taken from the scheduler.
+
+    :class:`SynchronousHyperbandScheduler` asks for all new configurations of a bracket in a row. With
+    ``bracket_batches=True``, the searcher proposes them in a single LLAMBO round (see
+    :meth:`propose_batch`) and serves the following ``get_config`` calls from that batch.
+
+    If the searcher may only suggest tabulated configurations (``restrict_configurations``, e.g.
+    ``blackbox.all_configurations()``), LLAMBO proposals are snapped to the nearest tabulated configuration
+    which has not been suggested yet (see :class:`llambo.config_index.TabularConfigIndex`), instead of
+    being discarded.
+
+    With ``canonicalize`` (e.g. :func:`nb201.canonical_id`), proposals equivalent to a configuration which
+    was already suggested are rejected like duplicates.
+
+    :param config_space: Configuration space
+    :param metric: Name of metric to optimize
+    :param llambo: LLAMBO instance, its ``lower_is_better`` must match ``mode``
+    :param points_to_evaluate: Initial configurations, e.g. from ``llambo.initialize_configs``
+    :param name_mapping: Maps Syne Tune hyperparameter names to LLAMBO ones. Defaults to the identity on
+        the hyperparameters of the LLAMBO task context
+    :param pending_strategy: See above, defaults to "fantasize"
+    :param n_proposals: Number of configurations LLAMBO is asked for per ``get_config``, at least the
+        number of pending evaluations plus one, so that excluded proposals can be replaced. Defaults to 1
+    :param prefetch: If ``True``, a background thread keeps a buffer of LLAMBO proposals, which is refilled
+        whenever new results arrive, and ``get_config`` returns from the buffer without waiting for the LLM.
+        Defaults to ``False``
+    :param buffer_size: Number of up-to-date proposals kept in the buffer. Defaults to 2
+    :param max_staleness: Buffered proposals are discarded once more than this number of results arrived
+        after they were generated. Defaults to 2
+    :param empty_buffer_policy: What ``get_config`` does if the buffer is empty: "wait" for a proposal up to
+        ``wait_timeout`` seconds, then fall back, or "fallback" to a random configuration immediately.
+        Defaults to "wait"
+    :param wait_timeout: See ``empty_buffer_policy``. Defaults to 30 seconds
+    :param bracket_batches: Propose the new configurations of a synchronous Hyperband bracket as one
+        batch. Ignored with ``prefetch=True``. Defaults to ``True``
+    :param snap_to_configurations: Snap proposals to ``restrict_configurations`` if given. Defaults to
+        ``True``
+    :param canonicalize: Maps a LLAMBO configuration to a key shared by all equivalent configurations.
+        Defaults to the ``canonicalize`` of ``llambo``
+    """
+
+    def __init__(
+        self,
+        config_space: Dict[str, Any],
+        metric: Union[List[str], str],
+        llambo,
+        points_to_evaluate: Optional[List[dict]] = None,
+        name_mapping: Optional[Dict[str, str]] = None,
+        pending_strategy: str = "fantasize",
+        n_proposals: int = 1,
+        prefetch: bool = False,
+        buffer_size: int = 2,
+        max_staleness: int = 2,
+        empty_buffer_policy: str = "wait",
+        wait_timeout: float = 30.0,
+        bracket_batches: bool = True,
+        snap_to_configurations: bool = True,
+        canonicalize: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        **kwargs,
+    ):
+        super().__init__(
+            config_space,
+            metric=metric,
+            points_to_evaluate=points_to_evaluate,
+            **kwargs,
+        )
+        assert isinstance(metric, str), "LLAMBOSearcher supports a single metric only"
+        assert (
+            pending_strategy in PENDING_STRATEGIES
+        ), f"pending_strategy must be one of {PENDING_STRATEGIES}"
+        assert (
+            empty_buffer_policy in EMPTY_BUFFER_POLICIES
+        ), f"empty_buffer_policy must be one of {EMPTY_BUFFER_POLICIES}"
+        assert buffer_size >= 1, "buffer_size must be at least 1"
+        self.llambo = llambo
+        if name_mapping is None:
+            name_mapping = {
+                name: name for name in llambo.task_context["hyperparameter_constraints"]
+            }
+        self._name_mapping = name_mapping
+        self._pending_strategy = pending_strategy
+        self._n_proposals = n_proposals
+        self._resource_attr = None
+        self._trial_configs = dict()  # trial_id -> LLAMBO config
+        self._pending = dict()  # trial_id -> (pending id in the observation store, fantasized score)
+        self._observed_trials = set()
+        self._predictions = dict()  # trial_id -> surrogate mean at proposal time
+
+        self._prefetch = prefetch
+        self._buffer_size = buffer_size
+        self._max_staleness = max_staleness
+        self._empty_buffer_policy = empty_buffer_policy
+        self._wait_timeout = wait_timeout
+        # guards LLAMBO's observations, pending trials and the buffer, shared with the prefetch worker
+        self._cond = threading.Condition(threading.RLock())
+        self._buffer = []  # (LLAMBO config, predicted mean, version), most recent first
+        self._version = 0  # number of results received so far
+        self._worker = None
+        self._stop = False
+        self.prefetch_stats = {"buffer_hits": 0, "waits": 0, "fallbacks": 0, "errors": 0}
+
+        self._bracket_batches = bracket_batches
+        self._sync_scheduler = None  # set for SynchronousHyperbandScheduler
+        self._batch = []  # (LLAMBO config, predicted mean) proposed by propose_batch, not served yet
+
+        self._snap_to_configurations = snap_to_configurations
+        self._config_index = None
+        restrict_configurations = kwargs.get("restrict_configurations")
+        if snap_to_configurations and restrict_configurations:
+            names = [name for name in name_mapping if name in restrict_configurations[0]]
+            self._config_index = TabularConfigIndex(restrict_configurations, names=names)
+        self.num_snapped = 0  # proposals replaced by a different tabulated configuration
+
+        if canonicalize is None:
+            canonicalize = getattr(llambo, "canonicalize", None)
+        self._canonicalize = canonicalize
+        self._suggested_keys = set()  # canonical keys of the configurations suggested so far
+        self._check_lower_is_better()
+
+    def _check_lower_is_better(self):
+        lower_is_better = self._mode == "min"
+        assert (
+            self.llambo.lower_is_better == lower_is_better
+        ), f"mode = {self._mode} does not match lower_is_better = {self.llambo.lower_is_better} of LLAMBO"
+
+    def configure_scheduler(self, scheduler):
+        assert isinstance(
+            scheduler, (FIFOScheduler, SynchronousHyperbandScheduler)
+        ), "This searcher requires FIFOScheduler, HyperbandScheduler or SynchronousHyperbandScheduler"
+        super().configure_scheduler(scheduler)
+        if isinstance(scheduler, MultiFidelitySchedulerMixin):
+            self._resource_attr = scheduler.resource_attr
+            if isinstance(scheduler, SynchronousHyperbandScheduler):
+                self._sync_scheduler = scheduler
+            if self.llambo.fidelity_mode is not None:
+                self.llambo.set_fidelity(
+                    1, scheduler.max_resource_level, name=self._resource_attr
+                )
+        self._check_lower_is_better()
+
+    def _to_llambo(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            llambo_name: config[name] for name, llambo_name in self._name_mapping.items()
+        }
+
+    def _from_llambo(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            name: config[llambo_name] for name, llambo_name in self._name_mapping.items()
+        }
+
+    def _canonical_key(self, llambo_config: Dict[str, Any]) -> Any:
+        try:
+            return self._canonicalize(llambo_config)
+        except (AssertionError, KeyError, ValueError):
+            return None
+
+    def _is_duplicate(self, config: Dict[str, Any]) -> bool:
+        if self.should_not_suggest(config):
+            return True
+        if self._canonicalize is None or self._allow_duplicates:
+            return False
+        key = self._canonical_key(self._to_llambo(config))
+        return key is not None and key in self._suggested_keys
+
+    def _fantasies(self):
+        if self._pending_strategy != "fantasize" or not self._pending:
+            return None
+        configs = [self._trial_configs[trial_id] for trial_id in self._pending]
+        scores = [score for _, score in self._pending.values()]
+        return pd.DataFrame(configs), pd.DataFrame({"score": scores})
+
+    def _get_config(self, **kwargs) -> Optional[Dict[str, Any]]:
+        trial_id = kwargs.get("trial_id")
+        with self._cond:
+            config = self._next_initial_config()
+            if config is None and len(self.llambo.observations) == 0:
+                # LLAMBO needs at least one observation to build its prompts
+                config = self._get_random_config()
+            if config is None and not self._batch and self._use_bracket_batches():
+                n_slots = _new_trial_slots(self._sync_scheduler)
+                if n_slots > 1:
+                    self.propose_batch(n_slots)
+            if config is None and self._batch:
+                config = self._take_from_batch(trial_id)
+            if config is None:
+                if self._prefetch:
+                    config = self._take_from_buffer(trial_id)
+                else:
+                    config = self._propose(trial_id)
+            if config is not None and trial_id is not None:
+                self._trial_configs[trial_id] = self._to_llambo(config)
+            if config is not None and self._config_index is not None and not self._allow_duplicates:
+                self._config_index.mark_used(config)
+            if config is not None and self._canonicalize is not None:
+                self._suggested_keys.add(self._canonical_key(self._to_llambo(config)))
+            return config
+
+    def _generate(self, n_proposals, context=None):
+        """
+        Ask LLAMBO for proposals. Without ``context``, the fantasies are computed here, and the caller
+        must hold the lock.
+
+        :param n_proposals: Number of proposals
+        :param context: Snapshot taken under the lock, includes the fantasies already. Optional
+        :return: List of (LLAMBO config, predicted mean)
+        """
+        fantasies = self._fantasies() if context is None else None
+        proposals = self.llambo.get_configs(
+            q=n_proposals, fantasies=fantasies, context=context
+        )
+        selection = getattr(self.llambo.surrogate_model, "last_selection", None)
+        means = [np.nan] * len(proposals) if selection is None else list(selection[0])
+        return list(zip(proposals.to_dict("records"), means))
+
+    def _snap(self, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        while True:
+            snapped = self._config_index.snap(config)
+            if snapped is None or not self._is_duplicate(snapped):
+                break
+            # suggested before this index saw it (e.g. an initial configuration), or equivalent to a
+            # suggested configuration
+            self._config_index.mark_used(snapped)
+        if snapped is not None and self._config_index.index_of(config) is None:
+            self.num_snapped += 1
+            logger.debug(f"Snapped proposal {config} to tabulated configuration {snapped}")
+        return snapped
+
+    def _accept(self, proposal, predicted_mean, trial_id) -> Optional[Dict[str, Any]]:
+        config = self._from_llambo(proposal)
+        if self._config_index is not None:
+            config = self._snap(config)
+            if config is None:
+                return None
+        if self._is_duplicate(config):
+            return None
+        if not np.isnan(predicted_mean) and trial_id is not None:
+            self._predictions[trial_id] = float(predicted_mean)
+        return config
+
+    def _fallback_config(self) -> Optional[Dict[str, Any]]:
+        logger.warning(
+            "No new LLAMBO proposal available, falling back to a random configuration"
+        )
+        return self._get_random_config()
+
+    def _propose(self, trial_id) -> Optional[Dict[str, Any]]:
+        n_proposals = max(self._n_proposals, len(self._pending) + 1)
+        for proposal, predicted_mean in self._generate(n_proposals):
+            config = self._accept(proposal, predicted_mean, trial_id)
+            if config is not None:
+                return config
+        return self._fallback_config()
+
+    def _use_bracket_batches(self) -> bool:
+        return (
+            self._bracket_batches
+            and not self._prefetch
+            and self._sync_scheduler is not None
+        )
+
+    def propose_batch(self, n: int):
+        """
+        Propose ``n`` configurations in one LLAMBO round: a single acquisition pass and one batched
+        surrogate scoring, from which a diverse top ``n`` by expected improvement is selected. They are
+        returned by the next ``get_config`` calls.
+
+        :param n: Number of configurations
+        """
+        with self._cond:
+            self._batch = self._generate(n)
+            logger.info(f"[Batch] Proposed {len(self._batch)} configurations in one round")
+
+    def _take_from_batch(self, trial_id) -> Optional[Dict[str, Any]]:
+        while self._batch:
+            proposal, predicted_mean = self._batch.pop(0)
+            config = self._accept(proposal, predicted_mean, trial_id)
+            if config is not None:
+                return config
+        return None
+
+    def _fresh_entries(self):
+        return [entry for entry in self._buffer if entry[2] == self._version]
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stop = False
+            self._worker = threading.Thread(
+                target=self._prefetch_loop, name="llambo-prefetch", daemon=True
+            )
+            self._worker.start()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._cond:
+                while not self._stop and len(self._fresh_entries()) >= self._buffer_size:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                version = self._version
+                n_proposals = max(self._n_proposals, self._buffer_size + len(self._pending))
+                # snapshot the observations, LLM calls run without holding the lock
+                context = self.llambo._context(self._fantasies())
+            try:
+                entries = self._generate(n_proposals, context=context)
+            except Exception:
+                logger.exception("Prefetching LLAMBO proposals failed")
+                with self._cond:
+                    self.prefetch_stats["errors"] += 1
+                    self._cond.notify_all()
+                time.sleep(1.0)
+                continue
+            with self._cond:
+                self._buffer = [
+                    (proposal, predicted_mean, version) for proposal, predicted_mean in entries
+                ] + self._buffer
+                self._cond.notify_all()
+
+    def _take_from_buffer(self, trial_id) -> Optional[Dict[str, Any]]:
+        self._ensure_worker()
+        deadline = time.time() + self._wait_timeout
+        waited = False
+        while True:
+            # drop proposals which are based on too old observations
+            self._buffer = [
+                entry
+                for entry in self._buffer
+                if self._version - entry[2] <= self._max_staleness
+            ]
+            while self._buffer:
+                proposal, predicted_mean, _ = self._buffer.pop(0)
+                config = self._accept(proposal, predicted_mean, trial_id)
+                if config is not None:
+                    self.prefetch_stats["buffer_hits"] += 1
+                    self._cond.notify_all()  # refill
+                    return config
+            self._cond.notify_all()
+            remaining = deadline - time.time()
+            if self._empty_buffer_policy == "fallback" or remaining <= 0:
+                break
+            if not waited:
+                self.prefetch_stats["waits"] += 1
+                waited = True
+            self._cond.wait(timeout=remaining)
+        self.prefetch_stats["fallbacks"] += 1
+        return self._fallback_config()
+
+    def shutdown(self):
+        """Stop the prefetch worker."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    def _fantasized_score(self, trial_id: str) -> float:
+        if trial_id in self._predictions:
+            return self._predictions[trial_id]
+        scores = self.llambo.observations.column("score") if len(self.llambo.observations) else []
+        return float(np.median(scores)) if len(scores) else np.nan
+
+    def register_pending(
+        self,
+        trial_id: str,
+        config: Optional[Dict[str, Any]] = None,
+        milestone: Optional[int] = None,
+    ):
+        with self._cond:
+            super().register_pending(trial_id, config=config, milestone=milestone)
+            if config is not None and trial_id not in self._trial_configs:
+                self._trial_configs[trial_id] = self._to_llambo(config)
+            if (
+                trial_id not in self._trial_configs
+                or trial_id in self._observed_trials
+                or trial_id in self._pending
+            ):
+                # promoted trials are already part of the observations
+                return
+            score = self._fantasized_score(trial_id)
+            if np.isnan(score):
+                return
+            pending_id = self.llambo.observations.add_pending(
+                self._trial_configs[trial_id]
+            )
+            self._pending[trial_id] = (pending_id, score)
+
+    def _remove_pending(self, trial_id: str):
+        with self._cond:
+            entry = self._pending.pop(trial_id, None)
+            if entry is not None:
+                self.llambo.observations.remove_pending(entry[0])
+
+    def _update(self, trial_id: str, config: Dict[str, Any], result: Dict[str, Any]):
+        with self._cond:
+            self._remove_pending(trial_id)
+            self._observed_trials.add(trial_id)
+            llambo_config = pd.DataFrame([self._to_llambo(config)])
+            fidelity = None
+            if self._resource_attr is not None:
+                fidelity = result.get(self._resource_attr)
+            self.llambo._update_observations(
+                llambo_config,
+                pd.DataFrame({"score": [result[self._metric]]}),
+                fidelity=fidelity,
+            )
+            # buffered proposals are now outdated, wake up the prefetch worker
+            self._version += 1
+            self._cond.notify_all()
+
+    def predict(
+        self, configs: List[Dict[str, Any]], fidelity: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Surrogate predictions for configurations of the Syne Tune search space.
+
+        :param configs: Configurations to predict
+        :param fidelity: Resource level to predict at, only used with ``fidelity_mode="explicit"``.
+            Defaults to the maximum resource level
+        :return: Predicted means and standard deviations
+        """
+        llambo_configs = pd.DataFrame([self._to_llambo(config) for config in configs])
+        with self._cond:
+            context = self.llambo._context(self._fantasies())
+        return self.llambo.predict(llambo_configs, fidelity=fidelity, context=context)
+
+    def evaluation_failed(self, trial_id: str):
+        with self._cond:
+            super().evaluation_failed(trial_id)
+            self._remove_pending(trial_id)
+
+    def cleanup_pending(self, trial_id: str):
+        self._remove_pending(trial_id)
+
+    def remove_case(self, trial_id: str, **kwargs):
+        self._remove_pending(trial_id)
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(
+                super().get_state(),
+                llambo_state=dumps_state(self.llambo.get_state()),
+                trial_configs=self._trial_configs.copy(),
+                pending=self._pending.copy(),
+                observed_trials=self._observed_trials.copy(),
+                predictions=self._predictions.copy(),
+            )
+
+    def _restore_from_state(self, state: Dict[str, Any]):
+        with self._cond:
+            super()._restore_from_state(state)
+            self.llambo.set_state(loads_state(state["llambo_state"]))
+            self._trial_configs = state["trial_configs"].copy()
+            self._pending = state["pending"].copy()
+            self._observed_trials = state["observed_trials"].copy()
+            self._predictions = state["predictions"].copy()
+            self._buffer = []
+            self._batch = []
+            if self._canonicalize is not None:
+                self._suggested_keys = {
+                    self._canonical_key(config) for config in self._trial_configs.values()
+                }
+            if self._config_index is not None:
+                self._config_index.reset()
+                if not self._allow_duplicates:
+                    for config in self._trial_configs.values():
+                        self._config_index.mark_used(self._from_llambo(config))
+
+    def __getstate__(self):
+        # the Tuner pickles the scheduler: drop the worker, locks and the LLAMBO instance (LLM clients),
+        # keep a snapshot of the LLAMBO state to be restored with attach_llambo
+        with self._cond:
+            state = self.__dict__.copy()
+            state["_llambo_snapshot"] = dumps_state(self.llambo.get_state())
+        for name in ["_cond", "_worker", "llambo"]:
+            state[name] = None
+        state["_buffer"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cond = threading.Condition(threading.RLock())
+
+    def attach_llambo(self, llambo):
+        """
+        Attach a LLAMBO instance to an unpickled searcher and restore the snapshot taken when pickling.
+
+        :param llambo: LLAMBO instance
+        """
+        with self._cond:
+            self.llambo = llambo
+            snapshot = self.__dict__.pop("_llambo_snapshot", None)
+            if snapshot is not None:
+                llambo.set_state(loads_state(snapshot))
+
+    def clone_from_state(self, state: Dict[str, Any]):
+        new_searcher = LLAMBOSearcher(
+            self.config_space,
+            metric=self._metric,
+            llambo=self.llambo,
+            points_to_evaluate=[],
+            name_mapping=self._name_mapping,
+            pending_strategy=self._pending_strategy,
+            n_proposals=self._n_proposals,
+            prefetch=self._prefetch,
+            buffer_size=self._buffer_size,
+            max_staleness=self._max_staleness,
+            empty_buffer_policy=self._empty_buffer_policy,
+            wait_timeout=self._wait_timeout,
+            bracket_batches=self._bracket_batches,
+            snap_to_configurations=self._snap_to_configurations,
+            canonicalize=self._canonicalize,
+            restrict_configurations=None
+            if self._config_index is None
+            else self._config_index.configurations,
+            mode=self._mode,
+            allow_duplicates=self._allow_duplicates,
+        )
+        new_searcher._resource_attr = self._resource_attr
+        new_searcher._sync_scheduler = self._sync_scheduler
+        new_searcher._restore_from_state(state)
+        return new_searcher
+
+
+def _new_trial_slots(scheduler: SynchronousHyperbandScheduler) -> int:
+    """
+    Number of new trials the scheduler still starts in the lowest rungs of its active brackets, including
+    the one which is being suggested.
+    """
+    bracket_manager = scheduler.bracket_manager
+    n_slots = 1
+    for bracket_id in range(
+        bracket_manager._primary_bracket_id, bracket_manager._next_bracket_id
+    ):
+        bracket = bracket_manager._brackets[bracket_id]
+        if bracket.current_rung == 0:
+            rung, _ = bracket._current_rung_and_level()
+            n_slots += len(rung) - bracket._first_free_pos
+    return n_slots
+
+
+def attach_searcher(scheduler, searcher: LLAMBOSearcher):
+    """
+    Replace the searcher of a scheduler, needed for :class:`SynchronousHyperbandScheduler` which only
+    accepts searcher names.
+    """
+    scheduler._searcher = searcher
+    searcher.configure_scheduler(scheduler)
+    scheduler._searcher_initialized = True
+    return scheduler
+
+
+class LearningCurveStoppingScheduler(FIFOScheduler):
+    """
+    FIFO scheduler which stops trials whose learning curve is unlikely to end up better than the best
+    completed trial, as predicted by a :class:`llambo.learning_curves.LearningCurvePredictor`. Unlike
+    Hyperband, trials can be stopped at any resource level and the rest run to ``max_t``.
+
+    When a trial is stopped, the searcher receives the extrapolated final value as the result of the trial.
+
+    :param config_space: Configuration space
+    :param predictor: Learning curve predictor, e.g. with an LLM. Defaults to a pow3 and similar curves
+        predictor for ``max_t``
+    :param resource_attr: Name of resource attribute in reported results. Defaults to "epoch"
+    :param grace_period: Trials are not stopped before this resource level. Defaults to 3
+    :param stop_probability: Trials are stopped if the probability that their final value improves on
+        the best completed trial is below this value. Defaults to 0.05
+    :param min_completed: Number of completed trials required before any trial is stopped, at least 1.
+        Defaults to 3
+    :param kwargs: Arguments to :class:`FIFOScheduler`
+    """
+
+    def __init__(
+        self,
+        config_space: Dict[str, Any],
+        predictor: Optional[LearningCurvePredictor] = None,
+        resource_attr: str = "epoch",
+        grace_period: int = 3,
+        stop_probability: float = 0.05,
+        min_completed: int = 3,
+        **kwargs,
+    ):
+        super().__init__(config_space, **kwargs)
+        assert isinstance(self.metric, str), "Only a single metric is supported"
+        assert self.max_t is not None, "max_t or max_resource_attr must be given"
+        assert 0 < stop_probability < 1, "stop_probability must be in (0, 1)"
+        assert min_completed >= 1, "min_completed must be at least 1"
+        if predictor is None:
+            predictor = LearningCurvePredictor(self.max_t, resource_name=resource_attr)
+        self.predictor = predictor
+        self._resource_attr = resource_attr
+        self.grace_period = grace_period
+        self.stop_probability = stop_probability
+        self.min_completed = min_completed
+        self.n_stopped = 0
+
+    def on_trial_result(self, trial: Trial, result: Dict[str, Any]) -> str:
+        decision = super().on_trial_result(trial, result)
+        trial_id = str(trial.trial_id)
+        resource = result[self._resource_attr]
+        self.predictor.add(trial_id, resource, result[self.metric])
+        if (
+            decision != SchedulerDecision.CONTINUE
+            or resource < self.grace_period
+            or resource >= self.max_t
+            or len(self.predictor.completed_curves()) < self.min_completed
+        ):
+            return decision
+
+        lower_is_better = self.mode == "min"
+        incumbent = self.predictor.best_final(lower_is_better)
+        prob = self.predictor.prob_improvement(trial_id, incumbent, lower_is_better)
+        if prob >= self.stop_probability:
+            return decision
+        predicted_mean, _ = self.predictor.predict(trial_id)
+        logger.info(
+            f"[LC] Stopping trial {trial_id} at {self._resource_attr} {resource}: "
+            f"P(improvement) = {prob:.3f}, predicted final {self.metric} = {predicted_mean:.4f}"
+        )
+        self.n_stopped += 1
+        config = self._preprocess_config(trial.config)
+        self.searcher.on_trial_result(
+            trial_id,
+            config,
+            result=dict(result, **{self.metric: predicted_mean}),
+            update=True,
+        )
+        return SchedulerDecision.STOP
+
+    def on_trial_complete(self, trial: Trial, result: Dict[str, Any]):
+        if self._resource_attr in result:
+            self.predictor.add(
+                str(trial.trial_id), result[self._resource_attr], result[self.metric]
+            )
+        super().on_trial_complete(trial, result)
+
+
+SCHEDULER_TYPES = ["fifo", "asha", "synchronous_hyperband", "learning_curve"]
+
+
+def make_llambo_scheduler(
+    scheduler_type: str,
+    config_space: Dict[str, Any],
+    metric: str,
+    llambo,
+    searcher_kwargs: Optional[Dict[str, Any]] = None,
+    **scheduler_kwargs,
+):
+    """
+    Create a scheduler of type ``scheduler_type`` (see :const:`SCHEDULER_TYPES`) using a
+    :class:`LLAMBOSearcher`.
+
+    :param scheduler_type: "fifo", "asha", "synchronous_hyperband" or "learning_curve"
+        (:class:`LearningCurveStoppingScheduler`)
+    :param config_space: Configuration space
+    :param metric: Name of metric to optimize
+    :param llambo: LLAMBO instance used by the searcher
+    :param searcher_kwargs: Additional arguments to :class:`LLAMBOSearcher`
+    :param scheduler_kwargs: Additional arguments to the scheduler
+    """
+    assert (
+        scheduler_type in SCHEDULER_TYPES
+    ), f"scheduler_type must be one of {SCHEDULER_TYPES}"
+    searcher_kwargs = dict() if searcher_kwargs is None else searcher_kwargs.copy()
+    searcher = LLAMBOSearcher(
+        config_space,
+        metric=metric,
+        llambo=llambo,
+        points_to_evaluate=scheduler_kwargs.pop("points_to_evaluate", None),
+        mode=scheduler_kwargs.get("mode", "min"),
+        random_seed=scheduler_kwargs.get("random_seed"),
+        **searcher_kwargs,
+    )
+    if scheduler_type == "fifo":
+        return FIFOScheduler(
+            config_space, metric=metric, searcher=searcher, **scheduler_kwargs
+        )
+    if scheduler_type == "asha":
+        return HyperbandScheduler(
+            config_space, metric=metric, searcher=searcher, **scheduler_kwargs
+        )
+    if scheduler_type == "learning_curve":
+        return LearningCurveStoppingScheduler(
+            config_space, metric=metric, searcher=searcher, **scheduler_kwargs
+        )
+    # builds the brackets from grace_period, reduction_factor, ...
+    scheduler = SyncHyperband(config_space, metric=metric, **scheduler_kwargs)
+    return attach_searcher(scheduler, searcher)
@@ -1,33 +1,328 @@
 import json
+import numbers
+import os
 import pickle
+import shutil
 import numpy as np
+import pandas as pd
 import ConfigSpace as CS
 
+OPS = ["none", "skip_connect", "avg_pool_3x3", "nor_conv_1x1", "nor_conv_3x3"]
+# op_i_to_j in the order of the nb201 string representation |0->1|+|0->2|1->2|+|0->3|1->3|2->3|
+EDGES = ["op_0_to_1", "op_0_to_2", "op_1_to_2", "op_0_to_3", "op_1_to_3", "op_2_to_3"]
+NUM_ARCHS = len(OPS) ** len(EDGES)  # 15625
+LATENCY_KEY = '1080ti_32_latency'
+NUM_EPOCHS = 200  # epochs of the runtime derived from LATENCY_KEY, see NB201Benchmark.objective_function
+
+COMPACT_FORMAT_VERSION = 1
+COMPACT_META_FILENAME = 'meta.json'
+
+_OP_CODES = {op: code for code, op in enumerate(OPS)}
+_POWERS = len(OPS) ** np.arange(len(EDGES) - 1, -1, -1)
+_COMPACT_TABLES = {}  # realpath of compact directory -> NB201Tables, shared by all NB201Benchmark objects
+_CANONICAL_IDS = None  # index -> index of its canonical cell, see canonical_ids()
+
+
+def arch_str(config):
+    '''nb201 string representation of a configuration (dict or CS.Configuration), built by hyperparameter name.'''
+    return "|{}~0|+|{}~0|{}~1|+|{}~0|{}~1|{}~2|".format(*(config[edge] for edge in EDGES))
+
+
+def parse_arch_str(arch):
+    '''Configuration (dict) of an nb201 string representation.'''
+    ops = [op.split('~')[0] for node in arch.strip('|').split('|+|') for op in node.split('|')]
+    assert len(ops) == len(EDGES), f'invalid nb201 architecture {arch}'
+    return dict(zip(EDGES, ops))
+
+
+def encode(config):
+    '''Index of a configuration in [0, 5^6): its ops as base-5 digits, most significant first in EDGES order.'''
+    index = 0
+    for edge in EDGES:
+        index = index * len(OPS) + _OP_CODES[config[edge]]
+    return index
+
+
+def encode_batch(configs):
+    '''
+    Indices of many configurations at once: a DataFrame (or list of dicts) with columns EDGES, an integer array of op
+    codes of shape [n, 6] (columns in EDGES order), or an array of indices of shape [n], which is returned as is.
+    '''
+    if isinstance(configs, (pd.DataFrame, list)):
+        configs = pd.DataFrame(configs)
+        codes = np.stack([configs[edge].map(_OP_CODES).to_numpy(dtype=np.float64) for edge in EDGES], axis=1)
+        assert not np.isnan(codes).any(), f'unknown ops, must be one of {OPS}'
+        configs = codes.astype(np.int64)
+    configs = np.asarray(configs, dtype=np.int64)
+    if configs.ndim == 2:
+        configs = configs @ _POWERS
+    assert np.all((configs >= 0) & (configs < NUM_ARCHS)), f'indices must be in [0, {NUM_ARCHS})'
+    return configs
+
+
+def decode(index):
+    '''Configuration (dict) of an index returned by encode().'''
+    assert 0 <= index < NUM_ARCHS, f'index must be in [0, {NUM_ARCHS})'
+    ops = []
+    for _ in EDGES:
+        index, code = divmod(int(index), len(OPS))
+        ops.append(OPS[code])
+    return dict(zip(EDGES, reversed(ops)))
+
+
+def canonicalize(config):
+    '''
+    Canonical cell (dict) of a configuration. Cells with the same canonical cell compute the same function:
+    - an edge which is not on a path from the input (node 0) to the output (node 3), e.g. because a none op
+      disconnects one of its nodes, does not contribute to the output and is set to none
+    - without the edge 1 -> 2, nodes 1 and 2 can be swapped, the path 0 -> 1 -> 3 gets the smaller op codes
+    '''
+    ops = {edge: config[edge] for edge in EDGES}
+    for op in ops.values():
+        assert op in _OP_CODES, f'unknown op {op}, must be one of {OPS}'
+    live = {edge: op != 'none' for edge, op in ops.items()}
+    # nodes reachable from the input, and nodes from which the output is reachable
+    reachable = {0}
+    for j in (1, 2, 3):
+        if any(i in reachable and live[f'op_{i}_to_{j}'] for i in range(j)):
+            reachable.add(j)
+    productive = {3}
+    for i in (2, 1, 0):
+        if any(j in productive and live[f'op_{i}_to_{j}'] for j in range(i + 1, 4)):
+            productive.add(i)
+    for edge in EDGES:
+        i, j = int(edge[3]), int(edge[-1])
+        if i not in reachable or j not in productive:
+            ops[edge] = 'none'
+    if ops['op_1_to_2'] == 'none':
+        path_1 = (_OP_CODES[ops['op_0_to_1']], _OP_CODES[ops['op_1_to_3']])
+        path_2 = (_OP_CODES[ops['op_0_to_2']], _OP_CODES[ops['op_2_to_3']])
+        if path_2 < path_1:
+            ops['op_0_to_1'], ops['op_1_to_3'], ops['op_0_to_2'], ops['op_2_to_3'] = \
+                ops['op_0_to_2'], ops['op_2_to_3'], ops['op_0_to_1'], ops['op_1_to_3']
+    return ops
+
+
+def canonical_ids():
+    '''Index of the canonical cell of every index, int32 [5^6], computed once per process.'''
+    global _CANONICAL_IDS
+    if _CANONICAL_IDS is None:
+        ids = np.array([encode(canonicalize(decode(index))) for index in range(NUM_ARCHS)], dtype=np.int32)
+        ids.setflags(write=False)
+        _CANONICAL_IDS = ids
+    return _CANONICAL_IDS
+
+
+def canonical_id(config):
+    '''
+    Index of the canonical cell of a configuration (dict, CS.Configuration or index), equal for all cells computing
+    the same function. Use it to de-duplicate candidates, e.g. LLAMBO(canonicalize=canonical_id).
+    '''
+    index = config if isinstance(config, numbers.Integral) else encode(config)
+    return int(canonical_ids()[index])
+
+
+def canonical_id_batch(configs):
+    '''canonical_id for many configurations at once, see encode_batch() for configs.'''
+    return canonical_ids()[encode_batch(configs)]
+
+
+def compact_path(path):
+    '''Directory of the compact tables of nb201.pkl at path (nb201.pkl -> nb201_compact).'''
+    root, _ = os.path.splitext(path)
+    return root + '_compact'
+
+
+def export_compact(data, path):
+    '''
+    Writes the nb201 table (dict nb201 string -> {key: value}, as in nb201.pkl) to directory path as typed arrays
+    indexed by encode(), for every numerical key (datasets and latencies):
+    - metrics.npy: float64 [num_keys, 5^6], NaN for architectures missing in the table
+    - order.npy: int32 [num_keys, 5^6], architectures by decreasing value (NaN last)
+    - rank.npy: int32 [num_keys, 5^6], position of each architecture in order.npy
+    Files are written to a temporary directory which is renamed at the end.
+    '''
+    keys = sorted({key for record in data.values() for key, value in record.items()
+                   if isinstance(value, numbers.Number) and not isinstance(value, bool)})
+    metrics = np.full((len(keys), NUM_ARCHS), np.nan, dtype=np.float64)
+    for arch, record in data.items():
+        index = encode(parse_arch_str(arch))
+        for pos, key in enumerate(keys):
+            value = record.get(key)
+            if isinstance(value, numbers.Number):
+                metrics[pos, index] = value
+    # stable sort of the negated values: ties go to the lower index, NaN sorts last
+    order = np.argsort(-metrics, axis=1, kind='stable').astype(np.int32)
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(NUM_ARCHS, dtype=np.int32)[None, :].repeat(len(keys), axis=0), axis=1)
+
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, 'metrics.npy'), metrics)
+    np.save(os.path.join(tmp_path, 'order.npy'), order)
+    np.save(os.path.join(tmp_path, 'rank.npy'), rank)
+    with open(os.path.join(tmp_path, COMPACT_META_FILENAME), 'w') as f:
+        json.dump({'version': COMPACT_FORMAT_VERSION, 'keys': keys, 'num_archs': len(data)}, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # exported by another process in the meantime
+        shutil.rmtree(tmp_path)
+        assert os.path.exists(os.path.join(path, COMPACT_META_FILENAME)), f'could not write {path}'
+    return path
+
+
+class NB201Tables(object):
+    '''
+    Compact nb201 tables written by export_compact(), memory-mapped read-only (all processes on a host share one
+    copy). Use load_tables() to share one object between benchmarks.
+    '''
+    def __init__(self, path):
+        with open(os.path.join(path, COMPACT_META_FILENAME)) as f:
+            meta = json.load(f)
+        assert meta['version'] == COMPACT_FORMAT_VERSION, \
+            f"{path} has format version {meta['version']}, delete it to export it again"
+        self.path = path
+        self.keys = meta['keys']
+        self.key_index = {key: pos for pos, key in enumerate(self.keys)}
+        self.metrics = np.load(os.path.join(path, 'metrics.npy'), mmap_mode='r')
+        self.order = np.load(os.path.join(path, 'order.npy'), mmap_mode='r')
+        self.rank = np.load(os.path.join(path, 'rank.npy'), mmap_mode='r')
+        self._epoch_errors = {}  # dataset -> per-epoch table, loaded on first use
+
+    def column(self, key):
+        assert key in self.key_index, f'{key} not in nb201 table, must be one of {self.keys}'
+        return self.key_index[key]
+
+    def has_epoch_errors(self, dataset):
+        return os.path.exists(epoch_table_path(self.path, dataset))
+
+    def epoch_errors(self, dataset):
+        '''Per-epoch errors of dataset, see export_epoch_table().'''
+        if dataset not in self._epoch_errors:
+            assert self.has_epoch_errors(dataset), \
+                f'no per-epoch table for {dataset} in {self.path}, build it with build_epoch_table()'
+            self._epoch_errors[dataset] = np.load(epoch_table_path(self.path, dataset), mmap_mode='r')
+        return self._epoch_errors[dataset]
+
+
+def load_tables(path):
+    '''
+    Compact tables of path, which is either a directory written by export_compact() or nb201.pkl. For the latter,
+    the tables are exported next to it (see compact_path()) the first time.
+    '''
+    if not os.path.exists(os.path.join(path, COMPACT_META_FILENAME)):
+        pkl_path = path
+        path = compact_path(pkl_path)
+        if not os.path.exists(os.path.join(path, COMPACT_META_FILENAME)):
+            with open(pkl_path, 'rb') as f:
+                data = pickle.load(f)
+            export_compact(data, path)
+    key = os.path.realpath(path)
+    if key not in _COMPACT_TABLES:
+        _COMPACT_TABLES[key] = NB201Tables(path)
+    return _COMPACT_TABLES[key]
+
+
+def epoch_table_path(path, dataset):
+    '''File of the per-epoch table of dataset in the compact directory path.'''
+    return os.path.join(path, f'epochs_{dataset}.npy')
+
+
+def export_epoch_table(blackbox, path, dataset, metric='metric_valid_error'):
+    '''
+    Writes the per-epoch errors (in %, mean over seeds) of dataset to the compact directory path, as float32
+    [5^6, num_epochs] indexed by encode(), NaN for cells missing in blackbox. blackbox is the tabulated Syne Tune
+    nasbench201 blackbox of dataset, whose hp_x0..hp_x5 follow the order of EDGES.
+    '''
+    assert metric in blackbox.objectives_names, f'{metric} must be one of {blackbox.objectives_names}'
+    num_epochs = len(blackbox.fidelity_values)
+    assert np.array_equal(np.asarray(blackbox.fidelity_values), np.arange(1, num_epochs + 1)), \
+        'fidelities must be the epochs 1, 2, ...'
+    hyperparameters = blackbox.hyperparameters
+    indices = encode_batch(pd.DataFrame({edge: hyperparameters[f'hp_x{pos}'].to_numpy()
+                                         for pos, edge in enumerate(EDGES)}))
+    values = np.asarray(blackbox.objectives_evaluations[..., blackbox.objectives_names.index(metric)],
+                        dtype=np.float64)
+    errors = np.full((NUM_ARCHS, num_epochs), np.nan, dtype=np.float32)
+    errors[indices] = 100 * values.mean(axis=1)
+
+    file_name = epoch_table_path(path, dataset)
+    tmp_name = f'{file_name[:-len(".npy")]}.tmp-{os.getpid()}.npy'
+    np.save(tmp_name, errors)
+    os.replace(tmp_name, file_name)
+    return file_name
+
+
+def build_epoch_table(path='nb201.pkl', dataset='cifar10'):
+    '''
+    Builds the per-epoch table of dataset once, next to the compact tables of path (see load_tables()), from the
+    nasbench201 blackbox of the Syne Tune blackbox repository (downloaded and converted on first use).
+    '''
+    from syne_tune.blackbox_repository import load_blackbox
+
+    tables = load_tables(path)
+    if not tables.has_epoch_errors(dataset):
+        export_epoch_table(load_blackbox('nasbench201')[dataset], tables.path, dataset)
+    return tables.epoch_errors(dataset)
+
+
 class NB201Benchmark(object):
-    def __init__(self, path, dataset='cifar10', seed=None):
+    def __init__(self, path='nb201.pkl', dataset='cifar10', seed=None, canonical_lookup=False):
         cs = self.get_configuration_space()
         self.names = [h.name for h in cs.get_hyperparameters()]
-        self.data = self._load_data()
+        # nb201.pkl or its compact directory, tables are loaded on first use
+        self.path = path
+        self._tables = None
         self.dataset = dataset
+        # look up the canonical cell (see canonicalize()), so that isomorphic cells get the same results
+        self.canonical_lookup = canonical_lookup
 
-        self.X = []
-        self.y = []
-        self.c = []
-
-        self.rng = np.random.RandomState(seed)
+        self.reset_tracker(seed)
 
-    def _load_data(self):
-        with open('nb201.pkl', 'rb') as f:
-            data = pickle.load(f)
-        return data
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = load_tables(self.path)
+            self._dataset_column = self._tables.column(self.dataset)
+            self._latency_column = self._tables.column(LATENCY_KEY)
+        return self._tables
 
     def reset_tracker(self, seed):
-        # __init__() sans the data loading for multiple runs
-        self.X = []
-        self.y = []
-        self.c = []
+        # evaluated architectures (indices), errors and runtimes, grown by doubling
+        self._tracked = np.empty(0, dtype=np.int32)
+        self._tracked_y = np.empty(0, dtype=np.float64)
+        self._tracked_c = np.empty(0, dtype=np.float64)
+        self._num_tracked = 0
         self.rng = np.random.RandomState(seed)
 
+    @property
+    def X(self):
+        return [decode(index) for index in self._tracked[:self._num_tracked]]
+
+    @property
+    def y(self):
+        return self._tracked_y[:self._num_tracked]
+
+    @property
+    def c(self):
+        return self._tracked_c[:self._num_tracked]
+
+    def _track(self, indices, errors, runtimes):
+        n, num_new = self._num_tracked, len(indices)
+        if n + num_new > len(self._tracked):
+            capacity = max(2 * len(self._tracked), n + num_new, 64)
+            for name in ('_tracked', '_tracked_y', '_tracked_c'):
+                grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+                grown[:n] = getattr(self, name)[:n]
+                setattr(self, name, grown)
+        self._tracked[n:n + num_new] = indices
+        self._tracked_y[n:n + num_new] = errors
+        self._tracked_c[n:n + num_new] = runtimes
+        self._num_tracked = n + num_new
+
     @staticmethod
     def get_configuration_space():
         cs = CS.ConfigurationSpace()
@@ -48,31 +343,120 @@ class NB201Benchmark(object):
         :return: Returns tuple with the best configuration, its final validation performance and its test performance
         """
 
-        configs, te, ve = [], [], []
-        configs = list(sorted(self.data, key=lambda x: self.data[x][self.dataset]))
-        best_config = configs[-1]
-        best_test_error = 100 - self.data[best_config][self.dataset]
+        best = int(self.tables.order[self._dataset_column, 0])
+        best_test_error = 100 - float(self.tables.metrics[self._dataset_column, best])
 
-        return best_config, best_test_error
+        return arch_str(decode(best)), best_test_error
 
-    def objective_function(self, config, **kwargs):
-        if type(config) == CS.Configuration:
-            k = json.dumps(config.get_dictionary(), sort_keys=True)
-        else:
-            k = json.dumps(config, sort_keys=True)
+    def _lookup_index(self, config):
+        index = config if isinstance(config, numbers.Integral) else encode(config)
+        if self.canonical_lookup:
+            index = int(canonical_ids()[index])
+        return index
 
-        # convert the CS representation to the nb201 string representation
-        nb201_arch = "|{}~0|+|{}~0|{}~1|+|{}~0|{}~1|{}~2|".format(*config.get_dictionary().values())
+    @property
+    def epoch_errors(self):
+        '''Per-epoch errors (%) of the dataset, float32 [5^6, num_epochs], built on first use.'''
+        if not self.tables.has_epoch_errors(self.dataset):
+            build_epoch_table(self.path, self.dataset)
+        return self.tables.epoch_errors(self.dataset)
 
-        error = 100 - self.data[nb201_arch][self.dataset]
+    def test_error(self, config):
+        '''Final test error (%) of a configuration, as objective_function but without tracking it.'''
+        return 100 - float(self.tables.metrics[self._dataset_column, self._lookup_index(config)])
 
+    def epoch_time(self, config):
+        '''Simulated seconds per training epoch of a configuration, from its latency.'''
+        time_per_minibatch = float(self.tables.metrics[self._latency_column, self._lookup_index(config)])
+        return self._total_runtime(time_per_minibatch) / NUM_EPOCHS
+
+    def get_rank(self, config):
+        '''
+        Rank (0 is best) of a configuration (dict, CS.Configuration or index) on the dataset, of its canonical
+        cell with canonical_lookup, as objective_function.
+        '''
+        return int(self.tables.rank[self._dataset_column, self._lookup_index(config)])
+
+    @staticmethod
+    def _total_runtime(time_per_minibatch):
         # latency in ms with a batch size of 32 on a GTX 1080Ti
-        time_per_minibatch = self.data[nb201_arch]['1080ti_32_latency']
         time_per_epoch = time_per_minibatch * 50000/32 # 50000 images in CIFAR10
-        total_runtime = 200 * time_per_epoch / 1000 # in seconds; 200 epochs in total
+        return 200 * time_per_epoch / 1000 # in seconds; 200 epochs in total
+
+    def objective_function(self, config, **kwargs):
+        # configurations are looked up by their index, see encode()
+        index = self._lookup_index(config)
+        tables = self.tables
+
+        accuracy = tables.metrics[self._dataset_column, index]
+        assert not np.isnan(accuracy), f'{arch_str(decode(index))} is not in the nb201 table'
+        error = 100 - float(accuracy)
+        total_runtime = self._total_runtime(float(tables.metrics[self._latency_column, index]))
 
-        self.X.append(config)
-        self.y.append(error)
-        self.c.append(total_runtime)
+        self._track([index], [error], [total_runtime])
 
         return error, total_runtime
+
+    def objective_function_batch(self, configs, track=True):
+        '''
+        objective_function for many configurations in one vectorized lookup, see encode_batch() for configs.
+        Returns arrays of test errors and runtimes. With track=False, X, y and c are not updated (e.g. for regret
+        computations or pre-screening).
+        '''
+        indices = encode_batch(configs)
+        if self.canonical_lookup:
+            indices = canonical_ids()[indices]
+        tables = self.tables
+
+        errors = 100 - tables.metrics[self._dataset_column, indices]
+        assert not np.isnan(errors).any(), 'some configurations are not in the nb201 table'
+        total_runtimes = self._total_runtime(tables.metrics[self._latency_column, indices])
+
+        if track:
+            self._track(indices, errors, total_runtimes)
+
+        return errors, total_runtimes
+
+
+class NB201Simulator(object):
+    '''
+    Offline multi-fidelity simulation of NB201 training, e.g. for LLAMBO.optimize_successive_halving without the
+    Syne Tune tuner loop. The error after each epoch comes from the per-epoch table of the benchmark (see
+    build_epoch_table()), and an epoch takes benchmark.epoch_time() simulated seconds. A cell continues training from
+    the last epoch it was trained to, evaluations run one after the other, and clock is the total simulated time.
+    '''
+    def __init__(self, benchmark):
+        self.benchmark = benchmark
+        self.reset()
+
+    def reset(self):
+        self.clock = 0.0
+        self._trained = {}  # index -> number of epochs trained so far
+        self.trace = []  # (clock, index, epoch, error) per evaluation
+
+    @property
+    def max_epochs(self):
+        return self.benchmark.epoch_errors.shape[1]
+
+    def evaluate(self, config, epoch):
+        '''Error (%) of a configuration after epoch epochs and the simulated seconds spent on it.'''
+        assert 1 <= epoch <= self.max_epochs, f'epoch must be in [1, {self.max_epochs}]'
+        index = config if isinstance(config, numbers.Integral) else encode(config)
+        error = float(self.benchmark.epoch_errors[self.benchmark._lookup_index(index), epoch - 1])
+        assert not np.isnan(error), f'{arch_str(decode(index))} is not in the per-epoch table'
+        trained = self._trained.get(index, 0)
+        cost = max(epoch - trained, 0) * self.benchmark.epoch_time(index)
+        self._trained[index] = max(trained, epoch)
+        self.clock += cost
+        self.trace.append((self.clock, index, epoch, error))
+        return error, cost
+
+    def eval_point(self, config, fidelity):
+        '''fidelity_eval_f of LLAMBO.optimize_successive_halving, fidelity is the number of epochs.'''
+        error, cost = self.evaluate(config, int(fidelity))
+        return config, {
+            'score': error,
+            'generalization_score': self.benchmark.test_error(config),
+            'cost': cost,
+            'elapsed_time': self.clock,
+        }
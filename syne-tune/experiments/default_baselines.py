@@ -153,3 +153,28 @@ def NSGA2(method_arguments: MethodArguments, **kwargs):
 
 def MORandomScalarizationBayesOpt(method_arguments: MethodArguments, **kwargs):
     return _MORandomScalarizationBayesOpt(**_baseline_kwargs(method_arguments, kwargs))
+
+
+def LLAMBO(method_arguments: MethodArguments, **kwargs):
+    """LLAMBO searcher with a FIFO, ASHA or synchronous Hyperband scheduler
+
+    ``kwargs`` must contain ``llambo``, a :class:`llambo.llambo.LLAMBO` instance.
+    The configuration space is passed as is, since LLAMBO prompts with the
+    categorical values.
+
+    :param scheduler_type: "fifo" (default), "asha" or "synchronous_hyperband"
+    :param searcher_kwargs: Additional arguments to
+        :class:`llambo.syne_tune_searcher.LLAMBOSearcher`
+    """
+    from llambo.syne_tune_searcher import make_llambo_scheduler
+
+    scheduler_type = kwargs.pop("scheduler_type", "fifo")
+    da_input = dict(config_space=method_arguments.config_space)
+    if scheduler_type != "fifo":
+        da_input["resource_attr"] = method_arguments.resource_attr
+    scheduler_kwargs = recursive_merge(
+        default_arguments(method_arguments, da_input),
+        kwargs,
+        stop_keys=["config_space", "searcher_kwargs"],
+    )
+    return make_llambo_scheduler(scheduler_type, **scheduler_kwargs)
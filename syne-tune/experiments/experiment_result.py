@@ -29,6 +29,7 @@ from syne_tune.constants import (
     ST_TUNER_CREATION_TIMESTAMP,
     ST_TUNER_TIME,
 )
+from syne_tune.experiments.results_store import load_results_dataframe, FilterType
 from syne_tune.try_import import try_import_aws_message, try_import_visual_message
 from syne_tune.util import experiment_path, s3_experiment_path, metric_name_mode
 
@@ -277,6 +278,8 @@ def load_experiment(
     load_tuner: bool = False,
     local_path: Optional[str] = None,
     experiment_name: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    filters: Optional[FilterType] = None,
 ) -> ExperimentResult:
     """Load results from an experiment
 
@@ -286,6 +289,9 @@ def load_experiment(
     :param local_path: Path containing the experiment to load. If not specified,
         ``~/{SYNE_TUNE_FOLDER}/`` is used.
     :param experiment_name: If given, this is used as first directory.
+    :param columns: Columns of the results to be loaded. Defaults to all
+    :param filters: Only results passing these filters are loaded, see
+        :func:`~syne_tune.experiments.results_store.load_results_dataframe`
     :return: Result object
     """
     path = experiment_path(tuner_name, local_path)
@@ -303,11 +309,7 @@ def load_experiment(
     except FileNotFoundError:
         metadata = None
     try:
-        results_fname = ST_RESULTS_DATAFRAME_FILENAME
-        if (path / results_fname).exists():
-            results = pd.read_csv(path / results_fname)
-        else:
-            results = pd.read_csv(path / results_fname[:-4])
+        results = load_results_dataframe(path, columns=columns, filters=filters)
     except Exception:
         results = None
     if load_tuner:
@@ -385,6 +387,8 @@ def list_experiments(
     experiment_filter: Optional[ExperimentFilter] = None,
     root: Path = experiment_path(),
     load_tuner: bool = False,
+    columns: Optional[List[str]] = None,
+    filters: Optional[FilterType] = None,
 ) -> List[ExperimentResult]:
     """List experiments for which results are found
 
@@ -395,6 +399,8 @@ def list_experiments(
     :param root: Root path for experiment results. Default is result of
         :func:`experiment_path`
     :param load_tuner: Whether to load the tuner in addition to metadata and results
+    :param columns: See :func:`load_experiment`
+    :param filters: See :func:`load_experiment`
     :return: List of result objects
     """
     path_filter = _impute_filter(path_filter)
@@ -405,7 +411,11 @@ def list_experiments(
         tuner_name = path.name
         if path_filter(str(metadata_path)):
             result = load_experiment(
-                tuner_name, load_tuner, local_path=str(path.parent)
+                tuner_name,
+                load_tuner,
+                local_path=str(path.parent),
+                columns=columns,
+                filters=filters,
             )
             if (
                 experiment_filter(result)
@@ -425,6 +435,8 @@ def load_experiments_df(
     experiment_filter: Optional[ExperimentFilter] = None,
     root: Path = experiment_path(),
     load_tuner: bool = False,
+    columns: Optional[List[str]] = None,
+    filters: Optional[FilterType] = None,
 ) -> pd.DataFrame:
     """
     :param path_filter: If passed then only experiments whose path matching
@@ -434,6 +446,11 @@ def load_experiments_df(
     :param root: Root path for experiment results. Default is
         :func:`experiment_path`
     :param load_tuner: Whether to load the tuner in addition to metadata and results
+    :param columns: Columns of the results to be loaded, defaults to all. Only
+        these columns are read from results stored as Parquet
+    :param filters: Only results passing these filters are loaded. They are
+        pushed down to the reader for results stored as Parquet, see
+        :func:`~syne_tune.experiments.results_store.load_results_dataframe`
     :return: Dataframe that contains all evaluations reported by tuners according
         to the filter given. The columns contain trial-id, hyperparameter
         evaluated, metrics reported via :class:`~syne_tune.Reporter`. These metrics
@@ -455,6 +472,8 @@ def load_experiments_df(
         experiment_filter=experiment_filter,
         root=root,
         load_tuner=load_tuner,
+        columns=columns,
+        filters=filters,
     ):
         assert experiment.results is not None
         assert experiment.metadata is not None
@@ -0,0 +1,184 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+from typing import Optional, List, Dict, Any
+
+from syne_tune.backend.simulator_backend.simulator_callback import SimulatorCallback
+from syne_tune.backend.simulator_backend.time_keeper import SimulatedTimeKeeper
+from syne_tune.results_callback import ExtraResultsComposer
+
+DECISION_TIME_MODES = ["measured", "model", "none"]
+
+ST_DECISION_TIME = "st_decision_time"
+
+ST_LLM_REQUESTS = "st_llm_requests"
+
+
+def llm_clients_of_scheduler(scheduler) -> list:
+    """
+    :param scheduler: Scheduler of the tuner
+    :return: LLM clients used by the searcher of ``scheduler`` (via its ``llambo``
+        attribute), ``[]`` if the searcher does not use an LLM
+    """
+    searcher = getattr(scheduler, "searcher", None)
+    llambo = getattr(searcher, "llambo", None)
+    if llambo is None:
+        return []
+    clients = [llambo.llm, llambo.warmstart_llm]
+    if llambo.cascade is not None:
+        clients.extend(tier for tier in llambo.cascade.tiers if tier not in clients)
+    return clients
+
+
+class DecisionTimeKeeper(SimulatedTimeKeeper):
+    """
+    Simulated time keeper which controls how the time spent outside of the
+    simulator backend (tuner loop, scheduler and searcher decisions, including
+    LLM calls) is charged to simulated time. The backend asks for this time
+    before starting a trial and before fetching results.
+
+    * "measured": Real time is charged, as in
+      :class:`~syne_tune.backend.simulator_backend.time_keeper.SimulatedTimeKeeper`
+    * "model": Real time of the LLM requests made in between is replaced by
+      ``llm_request_latency`` seconds per request, the rest is measured. This
+      makes runs reproducible w.r.t. LLM latency (e.g., with cached or batched
+      requests). Do not use it with a searcher prefetching in the background,
+      whose requests are not on the critical path
+    * "none": No time is charged, simulated time only advances by the
+      tabulated training times
+
+    :param decision_time: See above, defaults to "measured"
+    :param llm_request_latency: Seconds charged per LLM request in "model" mode
+    :param llm_clients: LLM clients (:class:`llambo.llm_client.LLMClient`) whose
+        requests are counted
+    """
+
+    def __init__(
+        self,
+        decision_time: str = "measured",
+        llm_request_latency: float = 2.0,
+        llm_clients: Optional[list] = None,
+    ):
+        super().__init__()
+        assert (
+            decision_time in DECISION_TIME_MODES
+        ), f"decision_time must be one of {DECISION_TIME_MODES}"
+        assert llm_request_latency >= 0, "llm_request_latency must be nonnegative"
+        self.decision_time = decision_time
+        self.llm_request_latency = llm_request_latency
+        self.llm_clients = [] if llm_clients is None else llm_clients
+        self.total_decision_time = 0.0
+        self._llm_counts = self._llm_totals()
+
+    def _llm_totals(self) -> (int, float):
+        return (
+            sum(client.n_requests for client in self.llm_clients),
+            sum(client.total_time for client in self.llm_clients),
+        )
+
+    @property
+    def num_llm_requests(self) -> int:
+        return self._llm_totals()[0]
+
+    def __getstate__(self):
+        # LLM clients hold locks and connections, they are not saved with the tuner
+        state = self.__dict__.copy()
+        state["llm_clients"] = []
+        return state
+
+    def start_of_time(self):
+        super().start_of_time()
+        self.total_decision_time = 0.0
+        self._llm_counts = self._llm_totals()
+
+    def real_time_since_last_recent_exit(self) -> float:
+        measured = super().real_time_since_last_recent_exit()
+        n_requests, llm_time = self._llm_totals()
+        new_requests = n_requests - self._llm_counts[0]
+        new_llm_time = llm_time - self._llm_counts[1]
+        self._llm_counts = (n_requests, llm_time)
+        if self.decision_time == "none":
+            charged = 0.0
+        elif self.decision_time == "model":
+            charged = (
+                max(measured - new_llm_time, 0.0)
+                + new_requests * self.llm_request_latency
+            )
+        else:
+            charged = measured
+        self.total_decision_time += charged
+        return charged
+
+
+class DecisionTimeSimulatorCallback(SimulatorCallback):
+    """
+    :class:`~syne_tune.backend.simulator_backend.simulator_callback.SimulatorCallback`
+    which replaces the time keeper of the backend by a :class:`DecisionTimeKeeper`,
+    so that searcher decision time (including LLM latency) is charged to
+    simulated time as configured, and appends the total decision time and
+    number of LLM requests so far to the results dataframe (columns
+    :const:`ST_DECISION_TIME`, :const:`ST_LLM_REQUESTS`).
+
+    :param extra_results_composer: Optional. Extra columns appended to the
+        results dataframe, in addition to the ones above
+    :param decision_time: See :class:`DecisionTimeKeeper`
+    :param llm_request_latency: See :class:`DecisionTimeKeeper`
+    """
+
+    def __init__(
+        self,
+        extra_results_composer: Optional[ExtraResultsComposer] = None,
+        decision_time: str = "measured",
+        llm_request_latency: float = 2.0,
+    ):
+        super().__init__(
+            extra_results_composer=DecisionTimeResultsComposer(extra_results_composer)
+        )
+        self._decision_time = decision_time
+        self._llm_request_latency = llm_request_latency
+
+    def on_tuning_start(self, tuner):
+        # Must happen before the time keeper is handed to the scheduler
+        tuner.trial_backend._time_keeper = DecisionTimeKeeper(
+            decision_time=self._decision_time,
+            llm_request_latency=self._llm_request_latency,
+            llm_clients=llm_clients_of_scheduler(tuner.scheduler),
+        )
+        super().on_tuning_start(tuner)
+
+
+class DecisionTimeResultsComposer(ExtraResultsComposer):
+    """
+    Appends the decision time charged so far and the number of LLM requests
+    to the results, requires a :class:`DecisionTimeKeeper` in the backend.
+
+    :param extra_results_composer: Optional. Further extra results appended
+    """
+
+    def __init__(self, extra_results_composer: Optional[ExtraResultsComposer] = None):
+        self._extra_results_composer = extra_results_composer
+
+    def __call__(self, tuner) -> Optional[Dict[str, Any]]:
+        time_keeper = tuner.trial_backend.time_keeper
+        results = dict()
+        if isinstance(time_keeper, DecisionTimeKeeper):
+            results[ST_DECISION_TIME] = time_keeper.total_decision_time
+            results[ST_LLM_REQUESTS] = time_keeper.num_llm_requests
+        if self._extra_results_composer is not None:
+            results.update(self._extra_results_composer(tuner) or dict())
+        return results
+
+    def keys(self) -> List[str]:
+        keys = [ST_DECISION_TIME, ST_LLM_REQUESTS]
+        if self._extra_results_composer is not None:
+            keys += self._extra_results_composer.keys()
+        return keys
@@ -11,7 +11,13 @@
 # express or implied. See the License for the specific language governing
 # permissions and limitations under the License.
 import itertools
-from typing import Optional, List, Union, Dict, Any
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, List, Union, Dict, Any, Tuple, Set
 
 import numpy as np
 from tqdm import tqdm
@@ -35,8 +41,20 @@ from syne_tune.experiments.launchers.utils import (
     get_master_random_seed,
     effective_random_seed,
 )
-from syne_tune.backend.simulator_backend.simulator_callback import SimulatorCallback
+from syne_tune.experiments.mmap_blackbox import (
+    MmapBlackboxRepositoryBackend,
+    export_repository_blackbox,
+    is_repository_blackbox_exported,
+    load_mmap_blackbox,
+)
+from syne_tune.experiments.launchers.decision_time import (
+    DecisionTimeSimulatorCallback,
+    DECISION_TIME_MODES,
+)
+from syne_tune.experiments.results_store import ParquetResultsMixin
 from syne_tune.blackbox_repository import load_blackbox
+from syne_tune.blackbox_repository.blackbox import Blackbox
+from syne_tune.blackbox_repository.blackbox_tabular import BlackboxTabular
 from syne_tune.blackbox_repository.simulated_tabular_backend import (
     BlackboxRepositoryBackend,
 )
@@ -46,7 +64,7 @@ from syne_tune.optimizer.schedulers.transfer_learning import (
 from syne_tune.results_callback import ExtraResultsComposer
 from syne_tune.stopping_criterion import StoppingCriterion
 from syne_tune.tuner import Tuner
-from syne_tune.util import sanitize_sagemaker_name
+from syne_tune.util import sanitize_sagemaker_name, experiment_path
 
 
 SIMULATED_BACKEND_EXTRA_PARAMETERS = [
@@ -81,6 +99,56 @@ SIMULATED_BACKEND_EXTRA_PARAMETERS = [
         default=False,
         help="If 1, scheduler only suggests configs contained in tabulated benchmark",
     ),
+    dict(
+        name="decision_time",
+        type=str,
+        choices=DECISION_TIME_MODES,
+        default="measured",
+        help="How searcher decision time (including LLM latency) is charged to simulated time: "
+        "measured real time, 'model' (LLM requests charged with llm_request_latency) or none",
+    ),
+    dict(
+        name="llm_request_latency",
+        type=float,
+        default=2.0,
+        help="Seconds charged per LLM request if decision_time is 'model'",
+    ),
+    dict(
+        name="num_parallel_processes",
+        type=int,
+        default=1,
+        help="Number of processes running experiments in parallel. If 0, the "
+        "number of CPUs is used",
+    ),
+    dict(
+        name="resume",
+        type=str2bool,
+        default=False,
+        help="If 1, combinations of method, seed and benchmark recorded as "
+        "finished in the ledger are skipped",
+    ),
+    dict(
+        name="results_format",
+        type=str,
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Store results as CSV file, rewritten every results_update_interval "
+        "seconds, or append them to Parquet files",
+    ),
+    dict(
+        name="mmap_blackboxes",
+        type=str2bool,
+        default=False,
+        help="If 1, tabulated blackboxes are memory-mapped, so that all processes "
+        "on a host share one copy. They are exported on first use",
+    ),
+    dict(
+        name="ledger_path",
+        type=str,
+        default=None,
+        help="Ledger of finished combinations of method, seed and benchmark. "
+        "Defaults to {experiment_path}/{experiment_tag}.ledger.jsonl",
+    ),
 ]
 
 
@@ -93,6 +161,17 @@ BENCHMARK_KEY_EXTRA_PARAMETER = dict(
 )
 
 
+class ParquetDecisionTimeSimulatorCallback(
+    ParquetResultsMixin, DecisionTimeSimulatorCallback
+):
+    """
+    :class:`DecisionTimeSimulatorCallback` appending results to Parquet files,
+    see :class:`~syne_tune.experiments.results_store.ParquetResultsMixin`
+    """
+
+    pass
+
+
 SurrogateBenchmarkDefinitions = Union[
     Dict[str, SurrogateBenchmarkDefinition],
     Dict[str, Dict[str, SurrogateBenchmarkDefinition]],
@@ -105,6 +184,76 @@ def is_dict_of_dict(benchmark_definitions: SurrogateBenchmarkDefinitions) -> boo
     return isinstance(val, dict)
 
 
+# Evaluations of the transfer tasks, keyed by ``(blackbox_name, test_task,
+# datasets)``, see :func:`get_transfer_learning_evaluations`
+_TRANSFER_LEARNING_CACHE: Dict[
+    Tuple[str, str, Optional[Tuple[str, ...]]],
+    Dict[str, TransferLearningTaskEvaluations],
+] = dict()
+
+
+def _export_tabular_blackbox(
+    blackbox_name: str, root: Optional[str] = None
+) -> Optional[Union[Blackbox, Dict[str, Blackbox]]]:
+    """
+    Exports blackbox ``blackbox_name`` to memory-mapped files, unless this has
+    been done already. Blackboxes which are not tabulated (e.g., YAHPO
+    surrogates) cannot be memory-mapped, they are loaded and returned instead.
+
+    :param blackbox_name: Name of blackbox in the blackbox repository
+    :param root: See :func:`~syne_tune.experiments.mmap_blackbox.mmap_blackbox_path`
+    :return: Result of ``load_blackbox(blackbox_name)`` if the blackbox is not
+        tabulated, otherwise ``None``
+    """
+    if is_repository_blackbox_exported(blackbox_name, root=root):
+        return None
+    blackboxes = load_blackbox(blackbox_name)
+    datasets = blackboxes.values() if isinstance(blackboxes, dict) else [blackboxes]
+    if not all(isinstance(bb, BlackboxTabular) for bb in datasets):
+        return blackboxes
+    export_repository_blackbox(blackbox_name, root=root, blackboxes=blackboxes)
+    return None
+
+
+def _load_transfer_blackboxes(blackbox_name: str) -> Dict[str, Blackbox]:
+    blackboxes = _export_tabular_blackbox(blackbox_name)
+    if blackboxes is not None:
+        return blackboxes
+    # Exported to disk once, later calls (also from other processes) map the
+    # files instead of loading and reshaping the blackbox again
+    task_to_path = export_repository_blackbox(blackbox_name)
+    return {task: load_mmap_blackbox(path) for task, path in task_to_path.items()}
+
+
+def _subsample_transfer_learning_evaluations(
+    transfer_learning_evaluations: Dict[str, TransferLearningTaskEvaluations],
+    n: int,
+) -> Dict[str, TransferLearningTaskEvaluations]:
+    sizes = [len(ev.hyperparameters) for ev in transfer_learning_evaluations.values()]
+    if len(set(sizes)) == 1:
+        # Random subsets of all tasks with one draw
+        all_indices = np.argsort(
+            np.random.rand(len(sizes), sizes[0]), axis=1, kind="stable"
+        )[:, :n]
+    else:
+        all_indices = [np.random.permutation(size)[:n] for size in sizes]
+    return {
+        task: TransferLearningTaskEvaluations(
+            configuration_space=evaluations.configuration_space,
+            hyperparameters=evaluations.hyperparameters.iloc[indices].reset_index(
+                drop=True
+            ),
+            objectives_evaluations=np.take(
+                evaluations.objectives_evaluations, indices, axis=0
+            ),
+            objectives_names=evaluations.objectives_names,
+        )
+        for (task, evaluations), indices in zip(
+            transfer_learning_evaluations.items(), all_indices
+        )
+    }
+
+
 def get_transfer_learning_evaluations(
     blackbox_name: str,
     test_task: str,
@@ -112,6 +261,13 @@ def get_transfer_learning_evaluations(
     n_evals: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
+    The evaluations of the transfer tasks are cached in memory, and tabulated
+    blackboxes are exported to disk once (see
+    :func:`~syne_tune.experiments.mmap_blackbox.export_repository_blackbox`),
+    so that repeated calls (e.g., for several methods and seeds) do not load
+    and reshape the blackbox again. Subsampling draws new random subsets in
+    every call.
+
     :param blackbox_name: name of blackbox
     :param test_task: task where the performance would be tested, it is excluded from transfer-learning evaluations
     :param datasets: subset of datasets to consider, only evaluations from those datasets are provided to
@@ -119,51 +275,121 @@ def get_transfer_learning_evaluations(
     :param n_evals: maximum number of evaluations to be returned
     :return:
     """
-    task_to_evaluations = load_blackbox(blackbox_name)
-
-    # todo retrieve right metric
-    metric_index = 0
-    transfer_learning_evaluations = {
-        task: TransferLearningTaskEvaluations(
-            configuration_space=bb.configuration_space,
-            hyperparameters=bb.hyperparameters,
-            objectives_evaluations=bb.objectives_evaluations[
-                ..., metric_index : metric_index + 1
-            ],
-            objectives_names=[bb.objectives_names[metric_index]],
-        )
-        for task, bb in task_to_evaluations.items()
-        if task != test_task and (datasets is None or task in datasets)
-    }
-
-    if n_evals is not None:
-        # subsample n_evals / n_tasks of observations on each tasks
-        def subsample(
-            transfer_evaluations: TransferLearningTaskEvaluations, n: int
-        ) -> TransferLearningTaskEvaluations:
-            random_indices = np.random.permutation(
-                len(transfer_evaluations.hyperparameters)
-            )[:n]
-            return TransferLearningTaskEvaluations(
-                configuration_space=transfer_evaluations.configuration_space,
-                hyperparameters=transfer_evaluations.hyperparameters.loc[
-                    random_indices
-                ].reset_index(drop=True),
-                objectives_evaluations=transfer_evaluations.objectives_evaluations[
-                    random_indices
+    key = (
+        blackbox_name,
+        test_task,
+        None if datasets is None else tuple(datasets),
+    )
+    transfer_learning_evaluations = _TRANSFER_LEARNING_CACHE.get(key)
+    if transfer_learning_evaluations is None:
+        task_to_evaluations = _load_transfer_blackboxes(blackbox_name)
+        # todo retrieve right metric
+        metric_index = 0
+        transfer_learning_evaluations = {
+            task: TransferLearningTaskEvaluations(
+                configuration_space=bb.configuration_space,
+                hyperparameters=bb.hyperparameters,
+                objectives_evaluations=bb.objectives_evaluations[
+                    ..., metric_index : metric_index + 1
                 ],
-                objectives_names=transfer_evaluations.objectives_names,
+                objectives_names=[bb.objectives_names[metric_index]],
             )
+            for task, bb in task_to_evaluations.items()
+            if task != test_task and (datasets is None or task in datasets)
+        }
+        _TRANSFER_LEARNING_CACHE[key] = transfer_learning_evaluations
 
+    if n_evals is not None:
+        # subsample n_evals / n_tasks of observations on each tasks
         n = n_evals // len(transfer_learning_evaluations)
-        transfer_learning_evaluations = {
-            task: subsample(transfer_evaluations, n)
-            for task, transfer_evaluations in transfer_learning_evaluations.items()
-        }
+        transfer_learning_evaluations = _subsample_transfer_learning_evaluations(
+            transfer_learning_evaluations, n
+        )
+    else:
+        transfer_learning_evaluations = dict(transfer_learning_evaluations)
 
     return transfer_learning_evaluations
 
 
+# Blackboxes loaded by this process, see :func:`cached_blackbox`
+_BLACKBOX_CACHE: Dict[Tuple[str, ...], Blackbox] = dict()
+
+
+def cached_blackbox(trial_backend: BlackboxRepositoryBackend) -> Blackbox:
+    """
+    Loading a blackbox (and fitting its surrogate) can take longer than the
+    simulation itself. Blackboxes are cached in the process, and are shared by
+    all backends with the same blackbox, dataset and surrogate.
+
+    :param trial_backend: Backend whose blackbox is set from the cache
+    :return: Blackbox of ``trial_backend``
+    """
+    key = (
+        trial_backend.blackbox_name,
+        str(trial_backend.dataset),
+        str(trial_backend._surrogate),
+        repr(trial_backend._surrogate_kwargs),
+        repr(trial_backend._add_surrogate_kwargs),
+        repr(trial_backend._config_space_surrogate),
+    )
+    blackbox = _BLACKBOX_CACHE.get(key)
+    if blackbox is None:
+        blackbox = trial_backend.blackbox
+        _BLACKBOX_CACHE[key] = blackbox
+    else:
+        trial_backend._blackbox = blackbox
+    return blackbox
+
+
+def combinations_ledger_path(configuration: ConfigDict) -> Path:
+    if configuration.ledger_path is not None:
+        return Path(configuration.ledger_path)
+    return experiment_path() / f"{configuration.experiment_tag}.ledger.jsonl"
+
+
+def load_finished_combinations(ledger_path: Path) -> Set[Tuple[str, int, str]]:
+    """
+    :param ledger_path: Ledger written by :func:`append_finished_combination`
+    :return: Combinations ``(method, seed, benchmark_name)`` recorded as finished
+    """
+    finished = set()
+    if ledger_path.exists():
+        with open(ledger_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written line of an interrupted run
+                    continue
+                finished.add((entry["method"], entry["seed"], entry["benchmark"]))
+    return finished
+
+
+def append_finished_combination(
+    ledger_path: Path, combination: Tuple[str, int, str], tuner_path: str
+):
+    """
+    Appends a finished combination to the ledger, one JSON object per line.
+    Only the main process writes to the ledger.
+    """
+    method, seed, benchmark_name = combination
+    entry = dict(
+        method=method,
+        seed=seed,
+        benchmark=benchmark_name,
+        tuner_path=tuner_path,
+        time=time.time(),
+    )
+    ledger_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(ledger_path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
 def start_experiment_simulated_backend(
     configuration: ConfigDict,
     methods: MethodDefinitions,
@@ -174,9 +400,13 @@ def start_experiment_simulated_backend(
     use_transfer_learning: bool = False,
 ):
     """
-    Runs sequence of experiments with simulator backend sequentially. The loop
-    runs over methods selected from ``methods``, repetitions and benchmarks
-    selected from ``benchmark_definitions``
+    Runs sequence of experiments with simulator backend. The loop runs over
+    methods selected from ``methods``, repetitions and benchmarks selected from
+    ``benchmark_definitions``. Experiments are run sequentially, or on a pool of
+    ``configuration.num_parallel_processes`` processes, in which case each
+    process reuses the blackboxes it loaded. Finished combinations are appended
+    to a ledger (``configuration.ledger_path``), and if ``configuration.resume``
+    is set, combinations found there are skipped.
 
     ``map_method_args`` can be used to modify ``method_kwargs`` for constructing
     :class:`~syne_tune.experiments.baselines.MethodArguments`, depending on
@@ -222,7 +452,6 @@ def start_experiment_simulated_backend(
         benchmark_names = list(bm_dict.keys())
 
     method_names = list(methods.keys())
-    experiment_tag = configuration.experiment_tag
     master_random_seed = get_master_random_seed(configuration.random_seed)
     if is_dict_of_dict(benchmark_definitions):
         assert (
@@ -235,129 +464,280 @@ def start_experiment_simulated_backend(
         itertools.product(method_names, configuration.seeds, benchmark_names)
     )
     print(combinations)
+    ledger_path = combinations_ledger_path(configuration)
+    if configuration.resume:
+        finished = load_finished_combinations(ledger_path)
+        combinations = [c for c in combinations if c not in finished]
+        print(
+            f"Resuming from {ledger_path}: {len(finished)} combinations finished, "
+            f"{len(combinations)} remaining"
+        )
+    if configuration.mmap_blackboxes:
+        # Export once here, instead of in every worker
+        blackbox_names = {
+            benchmark_definitions[name].blackbox_name
+            for name in benchmark_names
+            if configuration.restrict_configurations
+            or benchmark_definitions[name].surrogate is None
+        }
+        for blackbox_name in sorted(blackbox_names):
+            # Blackboxes which are not tabulated are loaded by every worker,
+            # see :class:`MmapBlackboxRepositoryBackend`
+            _export_tabular_blackbox(blackbox_name)
+    run_kwargs = dict(
+        configuration=configuration,
+        methods=methods,
+        benchmark_definitions=benchmark_definitions,
+        master_random_seed=master_random_seed,
+        extra_results=extra_results,
+        map_method_args=map_method_args,
+        extra_tuning_job_metadata=extra_tuning_job_metadata,
+        use_transfer_learning=use_transfer_learning,
+    )
+    num_processes = configuration.num_parallel_processes
+    if num_processes <= 0:
+        num_processes = os.cpu_count()
+    num_processes = min(num_processes, len(combinations))
+    if num_processes <= 1:
+        for combination in tqdm(combinations):
+            tuner_path = run_simulated_experiment(combination, **run_kwargs)
+            append_finished_combination(ledger_path, combination, tuner_path)
+    else:
+        _run_combinations_in_parallel(
+            combinations, num_processes, ledger_path, run_kwargs
+        )
+
+
+def _run_combinations_in_parallel(
+    combinations: List[Tuple[str, int, str]],
+    num_processes: int,
+    ledger_path: Path,
+    run_kwargs: Dict[str, Any],
+):
+    """
+    Runs experiments for ``combinations`` on a pool of ``num_processes``
+    processes. Each process keeps the blackboxes it loaded, so they are reused
+    by later combinations run on the same process. Combinations get distinct
+    tuner names, and are appended to the ledger once finished. If some of them
+    fail, the others are still run, and an exception is raised at the end.
+    """
+    # With "fork", ``run_kwargs`` (which may contain lambdas) is inherited by
+    # the workers instead of being pickled
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+    print(f"Running {len(combinations)} combinations on {num_processes} processes")
+    failed = []
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(run_kwargs,),
+    ) as executor:
+        futures = {
+            executor.submit(_run_in_worker, combination, str(index)): combination
+            for index, combination in enumerate(combinations)
+        }
+        with tqdm(total=len(futures)) as progress:
+            for future in as_completed(futures):
+                combination = futures[future]
+                try:
+                    tuner_path = future.result()
+                    append_finished_combination(ledger_path, combination, tuner_path)
+                except Exception as ex:
+                    print(f"Experiment {combination} failed: {ex}")
+                    failed.append(combination)
+                progress.update(1)
+                progress.set_postfix(failed=len(failed))
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(combinations)} experiments failed: {failed}"
+        )
+
+
+_WORKER_RUN_KWARGS: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(run_kwargs: Dict[str, Any]):
+    global _WORKER_RUN_KWARGS
+    _WORKER_RUN_KWARGS = run_kwargs
+
+
+def _run_in_worker(combination: Tuple[str, int, str], tuner_name_suffix: str) -> str:
+    return run_simulated_experiment(
+        combination, tuner_name_suffix=tuner_name_suffix, **_WORKER_RUN_KWARGS
+    )
+
+
+def run_simulated_experiment(
+    combination: Tuple[str, int, str],
+    configuration: ConfigDict,
+    methods: MethodDefinitions,
+    benchmark_definitions: Dict[str, SurrogateBenchmarkDefinition],
+    master_random_seed: int,
+    extra_results: Optional[ExtraResultsComposer] = None,
+    map_method_args: Optional[MapMethodArgsType] = None,
+    extra_tuning_job_metadata: Optional[DictStrKey] = None,
+    use_transfer_learning: bool = False,
+    tuner_name_suffix: Optional[str] = None,
+) -> str:
+    """
+    Runs the experiment for one combination of method, seed and benchmark with
+    the simulator backend. Arguments are as in
+    :func:`start_experiment_simulated_backend`, except that
+    ``benchmark_definitions`` must not be nested.
+
+    :param combination: ``(method, seed, benchmark_name)``
+    :param master_random_seed: Master random seed of the experiment
+    :param tuner_name_suffix: If given, this is appended to the tuner name, so
+        that experiments started at the same time by different processes are
+        written to different directories
+    :return: Path of the results of the tuner
+    """
+    method, seed, benchmark_name = combination
+    experiment_tag = configuration.experiment_tag
     do_scale = (
         configuration.scale_max_wallclock_time
         and configuration.n_workers is not None
         and configuration.max_wallclock_time is None
     )
-    for method, seed, benchmark_name in tqdm(combinations):
-        random_seed = effective_random_seed(master_random_seed, seed)
-        np.random.seed(random_seed)
-        benchmark = benchmark_definitions[benchmark_name]
-        default_n_workers = benchmark.n_workers
-        if configuration.n_workers is not None:
-            benchmark.n_workers = configuration.n_workers
-        if configuration.max_wallclock_time is not None:
-            benchmark.max_wallclock_time = configuration.max_wallclock_time
-        elif do_scale and configuration.n_workers < default_n_workers:
-            # Scale ``max_wallclock_time``
-            factor = default_n_workers / configuration.n_workers
-            bm_mwt = benchmark.max_wallclock_time
-            benchmark.max_wallclock_time = int(bm_mwt * factor)
-            print(
-                f"Scaling max_wallclock_time: {benchmark.max_wallclock_time} (from {bm_mwt})"
-            )
+    random_seed = effective_random_seed(master_random_seed, seed)
+    np.random.seed(random_seed)
+    benchmark = benchmark_definitions[benchmark_name]
+    default_n_workers = benchmark.n_workers
+    if configuration.n_workers is not None:
+        benchmark.n_workers = configuration.n_workers
+    if configuration.max_wallclock_time is not None:
+        benchmark.max_wallclock_time = configuration.max_wallclock_time
+    elif do_scale and configuration.n_workers < default_n_workers:
+        # Scale ``max_wallclock_time``
+        factor = default_n_workers / configuration.n_workers
+        bm_mwt = benchmark.max_wallclock_time
+        benchmark.max_wallclock_time = int(bm_mwt * factor)
         print(
-            f"Starting experiment ({method}/{benchmark_name}/{seed}) of {experiment_tag}"
-            f"  max_wallclock_time = {benchmark.max_wallclock_time}, "
-            f"  n_workers = {benchmark.n_workers}"
+            f"Scaling max_wallclock_time: {benchmark.max_wallclock_time} (from {bm_mwt})"
         )
+    print(
+        f"Starting experiment ({method}/{benchmark_name}/{seed}) of {experiment_tag}"
+        f"  max_wallclock_time = {benchmark.max_wallclock_time}, "
+        f"  n_workers = {benchmark.n_workers}"
+    )
 
-        max_resource_attr = benchmark.max_resource_attr
-        if max_resource_attr is None:
-            max_resource_attr = "my_max_resource_attr"
-        if configuration.restrict_configurations:
-            # Don't need surrogate in this case
-            kwargs = dict()
-        else:
-            kwargs = dict(
-                surrogate=benchmark.surrogate,
-                surrogate_kwargs=benchmark.surrogate_kwargs,
-                add_surrogate_kwargs=benchmark.add_surrogate_kwargs,
-            )
-        trial_backend = BlackboxRepositoryBackend(
-            blackbox_name=benchmark.blackbox_name,
-            elapsed_time_attr=benchmark.elapsed_time_attr,
-            max_resource_attr=max_resource_attr,
-            support_checkpointing=configuration.support_checkpointing,
-            dataset=benchmark.dataset_name,
-            **kwargs,
+    max_resource_attr = benchmark.max_resource_attr
+    if max_resource_attr is None:
+        max_resource_attr = "my_max_resource_attr"
+    if configuration.restrict_configurations:
+        # Don't need surrogate in this case
+        kwargs = dict()
+    else:
+        kwargs = dict(
+            surrogate=benchmark.surrogate,
+            surrogate_kwargs=benchmark.surrogate_kwargs,
+            add_surrogate_kwargs=benchmark.add_surrogate_kwargs,
         )
+    if configuration.mmap_blackboxes:
+        backend_class = MmapBlackboxRepositoryBackend
+    else:
+        backend_class = BlackboxRepositoryBackend
+    trial_backend = backend_class(
+        blackbox_name=benchmark.blackbox_name,
+        elapsed_time_attr=benchmark.elapsed_time_attr,
+        max_resource_attr=max_resource_attr,
+        support_checkpointing=configuration.support_checkpointing,
+        dataset=benchmark.dataset_name,
+        **kwargs,
+    )
 
-        blackbox = trial_backend.blackbox
-        resource_attr = blackbox.fidelity_name()
-        config_space = blackbox.configuration_space_with_max_resource_attr(
-            max_resource_attr
-        )
-        method_kwargs = dict(
-            config_space=config_space,
-            metric=benchmark.metric,
-            mode=benchmark.mode,
-            random_seed=random_seed,
-            resource_attr=resource_attr,
-            max_resource_attr=max_resource_attr,
-            use_surrogates="lcbench" in benchmark_name,
-            fcnet_ordinal=configuration.fcnet_ordinal,
-            scheduler_kwargs=dict(
-                points_to_evaluate=benchmark.points_to_evaluate,
-            ),
-        )
-        if use_transfer_learning:
-            method_kwargs["transfer_learning_evaluations"] = (
-                get_transfer_learning_evaluations(
-                    blackbox_name=benchmark.blackbox_name,
-                    test_task=benchmark.dataset_name,
-                    datasets=benchmark.datasets,
-                ),
-            )
-        search_options = dict(debug_log=configuration.verbose)
-        if configuration.restrict_configurations:
-            search_options["restrict_configurations"] = blackbox.all_configurations()
-        if configuration.max_size_data_for_model is not None:
-            search_options[
-                "max_size_data_for_model"
-            ] = configuration.max_size_data_for_model
-        method_kwargs["scheduler_kwargs"]["search_options"] = search_options
-        if map_method_args is not None:
-            method_kwargs = map_method_args(configuration, method, method_kwargs)
-        scheduler = methods[method](MethodArguments(**method_kwargs))
-
-        stop_criterion = StoppingCriterion(
-            max_wallclock_time=benchmark.max_wallclock_time,
-            max_num_evaluations=benchmark.max_num_evaluations,
+    blackbox = cached_blackbox(trial_backend)
+    resource_attr = blackbox.fidelity_name()
+    config_space = blackbox.configuration_space_with_max_resource_attr(
+        max_resource_attr
+    )
+    method_kwargs = dict(
+        config_space=config_space,
+        metric=benchmark.metric,
+        mode=benchmark.mode,
+        random_seed=random_seed,
+        resource_attr=resource_attr,
+        max_resource_attr=max_resource_attr,
+        use_surrogates="lcbench" in benchmark_name,
+        fcnet_ordinal=configuration.fcnet_ordinal,
+        scheduler_kwargs=dict(
+            points_to_evaluate=benchmark.points_to_evaluate,
+        ),
+    )
+    if use_transfer_learning:
+        method_kwargs[
+            "transfer_learning_evaluations"
+        ] = get_transfer_learning_evaluations(
+            blackbox_name=benchmark.blackbox_name,
+            test_task=benchmark.dataset_name,
+            datasets=benchmark.datasets,
         )
-        metadata = get_metadata(
-            seed=seed,
-            method=method,
-            experiment_tag=experiment_tag,
-            benchmark_name=benchmark_name,
-            random_seed=master_random_seed,
-            max_size_data_for_model=configuration.max_size_data_for_model,
-            extra_metadata=extra_tuning_job_metadata,
+    search_options = dict(debug_log=configuration.verbose)
+    if configuration.restrict_configurations:
+        search_options["restrict_configurations"] = blackbox.all_configurations()
+    if configuration.max_size_data_for_model is not None:
+        search_options[
+            "max_size_data_for_model"
+        ] = configuration.max_size_data_for_model
+    method_kwargs["scheduler_kwargs"]["search_options"] = search_options
+    if map_method_args is not None:
+        method_kwargs = map_method_args(configuration, method, method_kwargs)
+    scheduler = methods[method](MethodArguments(**method_kwargs))
+
+    stop_criterion = StoppingCriterion(
+        max_wallclock_time=benchmark.max_wallclock_time,
+        max_num_evaluations=benchmark.max_num_evaluations,
+    )
+    metadata = get_metadata(
+        seed=seed,
+        method=method,
+        experiment_tag=experiment_tag,
+        benchmark_name=benchmark_name,
+        random_seed=master_random_seed,
+        max_size_data_for_model=configuration.max_size_data_for_model,
+        extra_metadata=extra_tuning_job_metadata,
+    )
+    metadata["fcnet_ordinal"] = configuration.fcnet_ordinal
+    if benchmark.add_surrogate_kwargs is not None:
+        metadata["predict_curves"] = int(
+            benchmark.add_surrogate_kwargs["predict_curves"]
         )
-        metadata["fcnet_ordinal"] = configuration.fcnet_ordinal
-        if benchmark.add_surrogate_kwargs is not None:
-            metadata["predict_curves"] = int(
-                benchmark.add_surrogate_kwargs["predict_curves"]
-            )
-        tuner_name = experiment_tag
-        if configuration.use_long_tuner_name_prefix:
-            tuner_name += f"-{sanitize_sagemaker_name(benchmark_name)}-{seed}"
-        callbacks = [SimulatorCallback(extra_results_composer=extra_results)]
-        tuner = Tuner(
-            trial_backend=trial_backend,
-            scheduler=scheduler,
-            stop_criterion=stop_criterion,
-            n_workers=benchmark.n_workers,
-            sleep_time=0,
-            callbacks=callbacks,
-            results_update_interval=600,
-            print_update_interval=600,
-            tuner_name=tuner_name,
-            metadata=metadata,
-            save_tuner=configuration.save_tuner,
+    tuner_name = experiment_tag
+    if configuration.use_long_tuner_name_prefix:
+        tuner_name += f"-{sanitize_sagemaker_name(benchmark_name)}-{seed}"
+    if tuner_name_suffix is not None:
+        # The timestamp appended by the tuner leaves 39 characters, the suffix
+        # must not be trimmed away
+        tuner_name = f"{tuner_name[:38 - len(tuner_name_suffix)]}-{tuner_name_suffix}"
+    if configuration.results_format == "parquet":
+        callback_class = ParquetDecisionTimeSimulatorCallback
+    else:
+        callback_class = DecisionTimeSimulatorCallback
+    callbacks = [
+        callback_class(
+            extra_results_composer=extra_results,
+            decision_time=configuration.decision_time,
+            llm_request_latency=configuration.llm_request_latency,
         )
-        tuner.run()
+    ]
+    tuner = Tuner(
+        trial_backend=trial_backend,
+        scheduler=scheduler,
+        stop_criterion=stop_criterion,
+        n_workers=benchmark.n_workers,
+        sleep_time=0,
+        callbacks=callbacks,
+        results_update_interval=600,
+        print_update_interval=600,
+        tuner_name=tuner_name,
+        metadata=metadata,
+        save_tuner=configuration.save_tuner,
+    )
+    tuner.run()
+    return str(tuner.tuner_path)
 
 
 def main(
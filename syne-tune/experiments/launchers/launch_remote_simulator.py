@@ -239,6 +239,11 @@ def launch_remote_experiments_simulator(
         hyperparameters["restrict_configurations"] = int(
             configuration.restrict_configurations
         )
+        hyperparameters["decision_time"] = configuration.decision_time
+        hyperparameters["llm_request_latency"] = configuration.llm_request_latency
+        hyperparameters["num_parallel_processes"] = configuration.num_parallel_processes
+        hyperparameters["mmap_blackboxes"] = int(configuration.mmap_blackboxes)
+        hyperparameters["results_format"] = configuration.results_format
         if benchmark_key is not None:
             hyperparameters["benchmark_key"] = benchmark_key
         sm_args["hyperparameters"] = hyperparameters
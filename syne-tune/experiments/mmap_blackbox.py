@@ -0,0 +1,346 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+"""
+Memory-mapped tabulated blackboxes.
+
+A :class:`~syne_tune.blackbox_repository.blackbox_tabular.BlackboxTabular` is
+exported once to a directory of ``.npy`` files (objectives, fidelity values,
+and hyperparameters encoded as integer codes per column). Loading maps these
+files read-only, so that loading takes milliseconds, and all processes on a
+host share one physical copy of the tables (the page cache) instead of holding
+one copy each.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, Union, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from syne_tune.blackbox_repository import load_blackbox
+from syne_tune.blackbox_repository.blackbox import Blackbox, ObjectiveFunctionResult
+from syne_tune.blackbox_repository.blackbox_tabular import BlackboxTabular
+from syne_tune.blackbox_repository.conversion_scripts.utils import repository_path
+from syne_tune.blackbox_repository.serialize import (
+    serialize_configspace,
+    deserialize_configspace,
+)
+from syne_tune.blackbox_repository.simulated_tabular_backend import (
+    BlackboxRepositoryBackend,
+)
+
+MMAP_FORMAT_VERSION = 1
+
+MMAP_METADATA_FILENAME = "mmap_metadata.json"
+
+
+def mmap_blackbox_path(
+    blackbox_name: str, dataset: Optional[str] = None, root: Optional[str] = None
+) -> Path:
+    """
+    :param blackbox_name: Name of blackbox in the blackbox repository
+    :param dataset: Dataset of the blackbox, if it has several
+    :param root: Root directory of memory-mapped blackboxes, defaults to
+        ``mmap`` in the local blackbox repository
+    :return: Directory of the memory-mapped blackbox
+    """
+    path = Path(root) if root is not None else repository_path / "mmap"
+    path = path / blackbox_name
+    if dataset is not None:
+        path = path / dataset
+    return path
+
+
+def export_mmap_blackbox(blackbox: BlackboxTabular, path: Union[str, Path]) -> Path:
+    """
+    Writes ``blackbox`` in the format read by :func:`load_mmap_blackbox`. Files
+    are written to a temporary directory which is renamed at the end, so that
+    processes exporting the same blackbox concurrently do not see partial
+    files.
+
+    :param blackbox: Tabulated blackbox
+    :param path: Directory to write to, must not exist
+    :return: ``path``
+    """
+    if not isinstance(blackbox, BlackboxTabular):
+        raise TypeError(
+            f"Only tabulated blackboxes can be memory-mapped, got {type(blackbox)}"
+        )
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir()
+
+    hyperparameters = blackbox.hyperparameters.reset_index(drop=True)
+    columns = list(hyperparameters.columns)
+    codes = np.empty((len(hyperparameters), len(columns)), dtype=np.int32)
+    categories = dict()
+    for pos, name in enumerate(columns):
+        column_codes, uniques = pd.factorize(hyperparameters[name], sort=True)
+        codes[:, pos] = column_codes
+        categories[name] = np.asarray(uniques).tolist()
+    np.save(tmp_path / "hyperparameter_codes.npy", codes, allow_pickle=False)
+    np.save(
+        tmp_path / "objectives_evaluations.npy",
+        np.ascontiguousarray(blackbox.objectives_evaluations),
+        allow_pickle=False,
+    )
+    np.save(
+        tmp_path / "fidelity_values.npy",
+        np.asarray(blackbox.fidelity_values),
+        allow_pickle=False,
+    )
+    serialize_configspace(
+        path=tmp_path,
+        configuration_space=blackbox.configuration_space,
+        fidelity_space=blackbox.fidelity_space,
+    )
+    metadata = {
+        "version": MMAP_FORMAT_VERSION,
+        "objectives_names": list(blackbox.objectives_names),
+        "columns": columns,
+        "dtypes": [str(hyperparameters[name].dtype) for name in columns],
+        "categories": categories,
+    }
+    with open(tmp_path / MMAP_METADATA_FILENAME, "w") as f:
+        json.dump(metadata, f)
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Exported by another process in the meantime
+        shutil.rmtree(tmp_path)
+        assert (path / MMAP_METADATA_FILENAME).exists(), f"Could not write {path}"
+    return path
+
+
+def is_repository_blackbox_exported(
+    blackbox_name: str, root: Optional[str] = None
+) -> bool:
+    """
+    :param blackbox_name: Name of blackbox in the blackbox repository
+    :param root: See :func:`mmap_blackbox_path`
+    :return: Have all datasets of the blackbox been exported by
+        :func:`export_repository_blackbox`?
+    """
+    return (mmap_blackbox_path(blackbox_name, root=root) / ".complete").exists()
+
+
+def export_repository_blackbox(
+    blackbox_name: str,
+    root: Optional[str] = None,
+    blackboxes: Optional[Union[Blackbox, Dict[str, Blackbox]]] = None,
+) -> Dict[Optional[str], Path]:
+    """
+    Exports all datasets of blackbox ``blackbox_name`` from the blackbox
+    repository which have not been exported yet. This loads the blackbox once,
+    it is cheaper than exporting datasets one by one. Do this in the main
+    process before starting workers.
+
+    :param blackbox_name: Name of blackbox in the blackbox repository
+    :param root: See :func:`mmap_blackbox_path`
+    :param blackboxes: Result of ``load_blackbox(blackbox_name)`` if it has been
+        loaded already, so that it is not loaded again
+    :return: Directory for each dataset (key ``None`` if the blackbox does not
+        have datasets)
+    """
+    path = mmap_blackbox_path(blackbox_name, root=root)
+    if not is_repository_blackbox_exported(blackbox_name, root=root):
+        if blackboxes is None:
+            blackboxes = load_blackbox(blackbox_name)
+        if not isinstance(blackboxes, dict):
+            blackboxes = {None: blackboxes}
+        for dataset, blackbox in blackboxes.items():
+            bb_path = mmap_blackbox_path(blackbox_name, dataset=dataset, root=root)
+            if not (bb_path / MMAP_METADATA_FILENAME).exists():
+                export_mmap_blackbox(blackbox, bb_path)
+        (path / ".complete").touch()
+    if (path / MMAP_METADATA_FILENAME).exists():
+        return {None: path}
+    return {
+        bb_path.name: bb_path
+        for bb_path in sorted(path.iterdir())
+        if (bb_path / MMAP_METADATA_FILENAME).exists()
+    }
+
+
+def load_mmap_blackbox(path: Union[str, Path]) -> "MmapBlackboxTabular":
+    """
+    :param path: Directory written by :func:`export_mmap_blackbox`
+    :return: Memory-mapped blackbox
+    """
+    return MmapBlackboxTabular(path)
+
+
+class MmapBlackboxTabular(BlackboxTabular):
+    """
+    Tabulated blackbox whose tables are memory-mapped read-only from files
+    written by :func:`export_mmap_blackbox`. It supports the same lookups as
+    :class:`~syne_tune.blackbox_repository.blackbox_tabular.BlackboxTabular`.
+    Configurations are found by their hyperparameter codes, the dataframe
+    :attr:`hyperparameters` is only decoded when accessed.
+
+    :param path: Directory of the exported blackbox
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path)
+        with open(path / MMAP_METADATA_FILENAME, "r") as f:
+            metadata = json.load(f)
+        assert (
+            metadata["version"] == MMAP_FORMAT_VERSION
+        ), f"{path} has format version {metadata['version']}, export it again"
+        configuration_space, fidelity_space = deserialize_configspace(path)
+        Blackbox.__init__(
+            self,
+            configuration_space=configuration_space,
+            fidelity_space=fidelity_space,
+            objectives_names=metadata["objectives_names"],
+        )
+        self.path = path
+        self.objectives_evaluations = np.load(
+            path / "objectives_evaluations.npy", mmap_mode="r"
+        )
+        self._hyperparameter_codes = np.load(
+            path / "hyperparameter_codes.npy", mmap_mode="r"
+        )
+        self._fidelity_values = np.load(path / "fidelity_values.npy")
+        (
+            _,
+            self.num_seeds,
+            self.num_fidelities,
+            _,
+        ) = self.objectives_evaluations.shape
+        self.fidelity_map = {
+            value: index for index, value in enumerate(self._fidelity_values)
+        }
+        self._hp_cols = metadata["columns"]
+        self._hp_dtypes = metadata["dtypes"]
+        self._categories = [metadata["categories"][name] for name in self._hp_cols]
+        self._code_of_value = [
+            {value: code for code, value in enumerate(values)}
+            for values in self._categories
+        ]
+        self._index_of_codes = None
+        self._hyperparameters = None
+
+    def __reduce__(self):
+        # Pickling maps the files again, instead of copying the tables
+        return load_mmap_blackbox, (str(self.path),)
+
+    @property
+    def hyperparameters(self) -> pd.DataFrame:
+        if self._hyperparameters is None:
+            self._hyperparameters = pd.DataFrame(
+                {
+                    name: pd.Series(
+                        np.asarray(values, dtype=object)[
+                            self._hyperparameter_codes[:, pos]
+                        ]
+                    ).astype(dtype)
+                    for pos, (name, values, dtype) in enumerate(
+                        zip(self._hp_cols, self._categories, self._hp_dtypes)
+                    )
+                }
+            )
+        return self._hyperparameters
+
+    def _row_index(self, configuration: Dict[str, Any]) -> int:
+        if self._index_of_codes is None:
+            self._index_of_codes = {
+                tuple(codes): index
+                for index, codes in enumerate(self._hyperparameter_codes.tolist())
+            }
+        try:
+            codes = tuple(
+                code_of_value[configuration[name]]
+                for name, code_of_value in zip(self._hp_cols, self._code_of_value)
+            )
+            return self._index_of_codes[codes]
+        except KeyError:
+            raise ValueError(
+                f"the hyperparameter {configuration} is not present in available evaluations. Use ``add_surrogate(blackbox)`` if"
+                f" you want to add interpolation or a surrogate model that support querying any configuration."
+            )
+
+    def _objective_function(
+        self,
+        configuration: Union[dict, int],
+        fidelity: Optional[dict] = None,
+        seed: Optional[int] = None,
+    ) -> ObjectiveFunctionResult:
+        if seed is not None:
+            assert 0 <= seed < self.num_seeds
+        else:
+            seed = np.random.randint(0, self.num_seeds)
+        if not isinstance(configuration, dict):
+            return np.array(self.objectives_evaluations[configuration, seed, :, :])
+        index = self._row_index(configuration)
+        if fidelity is None:
+            # returns all fidelities
+            return np.array(self.objectives_evaluations[index, seed, :, :])
+        fidelity_index = self.fidelity_map[list(fidelity.values())[0]]
+        objectives_values = self.objectives_evaluations[index, seed, fidelity_index, :]
+        return dict(zip(self.objectives_names, objectives_values.tolist()))
+
+    def all_configurations(self) -> List[Dict[str, Any]]:
+        return self.hyperparameters.to_dict("records")
+
+
+class MmapBlackboxRepositoryBackend(BlackboxRepositoryBackend):
+    """
+    :class:`~syne_tune.blackbox_repository.BlackboxRepositoryBackend` whose
+    tabulated blackbox is memory-mapped, see :class:`MmapBlackboxTabular`. The
+    blackbox is exported on first use. If a surrogate is used, or the blackbox
+    is not tabulated, it is loaded as by the parent class.
+
+    Additional arguments on top of parent class
+    :class:`~syne_tune.blackbox_repository.BlackboxRepositoryBackend`:
+
+    :param mmap_root: See ``root`` of :func:`mmap_blackbox_path`
+    """
+
+    def __init__(self, *args, mmap_root: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._mmap_root = mmap_root
+
+    @property
+    def blackbox(self) -> Blackbox:
+        if self._blackbox is None and self._surrogate is None:
+            path = mmap_blackbox_path(
+                self.blackbox_name, dataset=self.dataset, root=self._mmap_root
+            )
+            if not (path / MMAP_METADATA_FILENAME).exists():
+                blackbox = load_blackbox(self.blackbox_name)
+                if self.dataset is not None:
+                    blackbox = blackbox[self.dataset]
+                if not isinstance(blackbox, BlackboxTabular):
+                    self._blackbox = blackbox
+                    return blackbox
+                export_mmap_blackbox(blackbox, path)
+            self._blackbox = load_mmap_blackbox(path)
+        return super().blackbox
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state["mmap_root"] = self._mmap_root
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        mmap_root = state.pop("mmap_root", None)
+        super().__setstate__(state)
+        self._mmap_root = mmap_root
@@ -0,0 +1,267 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+"""
+Append-only columnar store for tuner results.
+
+:class:`~syne_tune.results_callback.StoreResultsCallback` rewrites the full
+results CSV every ``results_update_interval`` seconds, which gets slow for long
+runs. With :class:`ParquetResultsMixin`, only the rows reported since the last
+write are appended, as a new Parquet file in the directory
+``{tuner_path}/{ST_RESULTS_PARQUET_DIRNAME}``. Columns are typed, and string
+columns (configuration values, decision, status) are dictionary encoded.
+
+:func:`load_results_dataframe` reads these results (or the CSV file of runs
+without them), only reading the columns asked for and skipping rows which do
+not pass ``filters``.
+"""
+import logging
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from syne_tune.constants import ST_RESULTS_DATAFRAME_FILENAME
+
+logger = logging.getLogger(__name__)
+
+ST_RESULTS_PARQUET_DIRNAME = "results.parquet"
+
+# Filters in disjunctive normal form as used by ``pyarrow.parquet``: a list of
+# ``(column, op, value)`` tuples which must all hold, or a list of such lists,
+# one of which must hold. ``op`` is one of "==", "=", "!=", "<", "<=", ">",
+# ">=", "in", "not in"
+FilterType = Union[List[Tuple[str, str, Any]], List[List[Tuple[str, str, Any]]]]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "Parquet results require pyarrow, install it with: pip install pyarrow"
+        )
+    return pyarrow
+
+
+def _to_table(df: pd.DataFrame):
+    pa = _import_pyarrow()
+    df = df.copy()
+    for name in df.columns:
+        column = df[name]
+        if column.dtype == object:
+            values = column.dropna()
+            if not all(isinstance(value, str) for value in values):
+                # Mixed types (e.g., numbers and strings in a config column)
+                # are stored as strings
+                column = column.map(lambda x: x if pd.isna(x) else str(x))
+            df[name] = column.astype("category")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Fixed index type, so that files written at different times have the same
+    # schema
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+class ParquetResultsWriter:
+    """
+    Appends rows to a directory of Parquet files, one file per call of
+    :meth:`append`. Files are written under a temporary name and renamed, so
+    that readers never see partial files.
+
+    :param path: Directory of the Parquet files
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._num_files = None
+
+    def _next_file_number(self) -> int:
+        if self._num_files is None:
+            # Continue after existing files, e.g. when a tuner is resumed
+            self._num_files = len(list(self.path.glob("part-*.parquet")))
+        return self._num_files
+
+    def append(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        pq = _import_pyarrow().parquet
+        self.path.mkdir(parents=True, exist_ok=True)
+        number = self._next_file_number()
+        file_name = self.path / f"part-{number:06d}.parquet"
+        tmp_name = self.path / f".part-{number:06d}.parquet.tmp"
+        pq.write_table(_to_table(pd.DataFrame(rows)), tmp_name)
+        tmp_name.rename(file_name)
+        self._num_files = number + 1
+
+
+class ParquetResultsMixin:
+    """
+    Mixin for :class:`~syne_tune.results_callback.StoreResultsCallback` (or
+    subclasses), must come first in the list of base classes. Instead of
+    rewriting the results CSV file, results reported since the last call of
+    :meth:`store_results` are appended as a new Parquet file to
+    ``{tuner_path}/{ST_RESULTS_PARQUET_DIRNAME}``.
+    """
+
+    def on_tuning_start(self, tuner):
+        super().on_tuning_start(tuner)
+        self._parquet_writer = ParquetResultsWriter(
+            tuner.tuner_path / ST_RESULTS_PARQUET_DIRNAME
+        )
+        # Results of a resumed tuner have been written already
+        self._num_results_stored = len(self.results)
+
+    def store_results(self):
+        if self.csv_file is not None:
+            new_results = self.results[self._num_results_stored :]
+            self._parquet_writer.append(new_results)
+            self._num_results_stored += len(new_results)
+
+
+def _apply_filters(df: pd.DataFrame, filters: Optional[FilterType]) -> pd.DataFrame:
+    if not filters:
+        return df
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    operators = {
+        "==": lambda x, v: x == v,
+        "=": lambda x, v: x == v,
+        "!=": lambda x, v: x != v,
+        "<": lambda x, v: x < v,
+        "<=": lambda x, v: x <= v,
+        ">": lambda x, v: x > v,
+        ">=": lambda x, v: x >= v,
+        "in": lambda x, v: x.isin(v),
+        "not in": lambda x, v: ~x.isin(v),
+    }
+    mask = np.zeros(len(df), dtype=bool)
+    for conjunction in filters:
+        conj_mask = np.ones(len(df), dtype=bool)
+        for name, op, value in conjunction:
+            if name not in df.columns:
+                conj_mask[:] = False
+                break
+            conj_mask &= operators[op](df[name], value).to_numpy(dtype=bool)
+        mask |= conj_mask
+    return df[mask].reset_index(drop=True)
+
+
+def _filter_columns(filters: Optional[FilterType]) -> List[str]:
+    if not filters:
+        return []
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    return [name for conjunction in filters for name, _, _ in conjunction]
+
+
+def _read_parquet_part(
+    file_name: Path,
+    columns: Optional[List[str]],
+    filters: Optional[FilterType],
+    pushdown: bool,
+) -> pd.DataFrame:
+    pq = _import_pyarrow().parquet
+    schema_names = pq.read_schema(file_name).names
+    if filters and not set(_filter_columns(filters)).issubset(schema_names):
+        # Columns missing in this file are null, conditions on them do not
+        # hold. Apply these filters after reading instead
+        pushdown = False
+    apply_after = bool(filters) and not pushdown
+    read_columns = None
+    if columns is not None:
+        read_columns = [name for name in columns if name in schema_names]
+        if apply_after:
+            read_columns += [
+                name
+                for name in _filter_columns(filters)
+                if name in schema_names and name not in read_columns
+            ]
+    table = pq.read_table(
+        file_name, columns=read_columns, filters=filters if pushdown else None
+    )
+    df = table.to_pandas()
+    if apply_after:
+        df = _apply_filters(df, filters)
+        if columns is not None:
+            df = df[[name for name in columns if name in df.columns]]
+    return df
+
+
+def _read_parquet_results(
+    path: Path, columns: Optional[List[str]], filters: Optional[FilterType]
+) -> Optional[pd.DataFrame]:
+    pa = _import_pyarrow()
+    dfs = []
+    for file_name in sorted(path.glob("part-*.parquet")):
+        try:
+            df = _read_parquet_part(file_name, columns, filters, pushdown=True)
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid, pa.ArrowTypeError):
+            # The type of a column in this file does not match a filter value,
+            # e.g. a configuration column which holds ints here and strings in
+            # other files. Apply the filters after reading instead
+            df = _read_parquet_part(file_name, columns, filters, pushdown=False)
+        dfs.append(df)
+    if not dfs:
+        return None
+    df = pd.concat(dfs, ignore_index=True)
+    # Categories differ between files, so that concatenated columns are object
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(object)
+    return df
+
+
+def load_results_dataframe(
+    tuner_path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    filters: Optional[FilterType] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Loads the results of a tuner. If they have been stored as Parquet (see
+    :class:`ParquetResultsMixin`), only ``columns`` are read, and ``filters``
+    are pushed down to the Parquet reader, which skips row groups that cannot
+    match. Otherwise, the results CSV file is read, with the same projection
+    and filters applied.
+
+    :param tuner_path: Path of the tuner results
+    :param columns: Columns to be loaded. Defaults to all columns
+    :param filters: Only rows passing these filters are loaded, see
+        :const:`FilterType`
+    :return: Results dataframe, or ``None`` if no results are found
+    """
+    tuner_path = Path(tuner_path)
+    parquet_path = tuner_path / ST_RESULTS_PARQUET_DIRNAME
+    if parquet_path.is_dir():
+        df = _read_parquet_results(parquet_path, columns, filters)
+        if df is not None:
+            return df
+    csv_path = tuner_path / ST_RESULTS_DATAFRAME_FILENAME
+    if not csv_path.exists():
+        # Uncompressed file
+        csv_path = tuner_path / ST_RESULTS_DATAFRAME_FILENAME[:-4]
+        if not csv_path.exists():
+            return None
+    usecols = None
+    if columns is not None:
+        wanted = set(columns) | set(_filter_columns(filters))
+        usecols = lambda name: name in wanted
+    df = _apply_filters(pd.read_csv(csv_path, usecols=usecols), filters)
+    if columns is not None:
+        df = df[[name for name in columns if name in df.columns]]
+    return df
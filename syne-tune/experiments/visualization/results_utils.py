@@ -28,6 +28,7 @@ from syne_tune.constants import (
     ST_RESULTS_DATAFRAME_FILENAME,
 )
 from syne_tune.experiments.launchers.utils import sync_from_s3_command
+from syne_tune.experiments.results_store import load_results_dataframe, FilterType
 from syne_tune.util import experiment_path, s3_experiment_path
 
 logger = logging.getLogger(__name__)
@@ -325,7 +326,9 @@ def create_index_for_result_files(
 
 
 def load_results_dataframe_per_benchmark(
-    experiment_list: List[Tuple[str, str, int]]
+    experiment_list: List[Tuple[str, str, int]],
+    columns: Optional[List[str]] = None,
+    filters: Optional[FilterType] = None,
 ) -> Optional[pd.DataFrame]:
     """
     Helper function for :class:`ComparativeResults`.
@@ -337,19 +340,19 @@ def load_results_dataframe_per_benchmark(
 
     :param experiment_list: Information about experiments, see
         :func:`create_index_for_result_files`
+    :param columns: Columns of the results to be loaded, defaults to all
+    :param filters: Only results passing these filters are loaded, see
+        :func:`~syne_tune.experiments.results_store.load_results_dataframe`
     :return: Dataframe with all results combined
     """
     dfs = []
     for tuner_path, setup_name, subplot_no in experiment_list:
         # Add common prefix that was stripped off
         tuner_path = experiment_path() / tuner_path
-        df_filename = str(tuner_path / ST_RESULTS_DATAFRAME_FILENAME)
         try:
-            df = pd.read_csv(df_filename)
-        except FileNotFoundError:
-            df = None
+            df = load_results_dataframe(tuner_path, columns=columns, filters=filters)
         except Exception as ex:
-            logger.error(f"{df_filename}: Error in pd.read_csv\n{ex}")
+            logger.error(f"{tuner_path}: Error when loading results\n{ex}")
             df = None
         if df is None:
             logger.warning(
@@ -378,8 +381,8 @@ def download_result_files_from_s3(
     Downloads result files from S3. This works only if the result objects on S3
     have prefixes ``f"{s3_experiment_path(s3_bucket)}{ename}/"``, where ``ename``
     is in ``experiment_names``. Only files with names
-    :const:`ST_METADATA_FILENAME` and :const:`ST_RESULTS_DATAFRAME_FILENAME`
-    are downloaded.
+    :const:`ST_METADATA_FILENAME` and :const:`ST_RESULTS_DATAFRAME_FILENAME`,
+    and Parquet results files are downloaded.
 
     :param experiment_names: Tuple of experiment names (prefixes, without the
         timestamps)
@@ -411,7 +414,11 @@ def download_result_files_from_s3(
             logger.warning(err_msg)
         # Recursive download with boto3. This is quite slow!
         target_path = str(experiment_path() / experiment_name)
-        valid_postfixes = [ST_METADATA_FILENAME, ST_RESULTS_DATAFRAME_FILENAME]
+        valid_postfixes = [
+            ST_METADATA_FILENAME,
+            ST_RESULTS_DATAFRAME_FILENAME,
+            ".parquet",
+        ]
         result = s3_download_files_recursively(
             s3_source_path=s3_source_path,
             target_path=target_path,
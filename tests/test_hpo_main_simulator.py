@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from syne_tune.blackbox_repository.blackbox import Blackbox
+from syne_tune.blackbox_repository.blackbox_tabular import BlackboxTabular
+from syne_tune.config_space import choice, randint
+from syne_tune.experiments import mmap_blackbox
+from syne_tune.experiments.launchers import hpo_main_simulator
+
+
+class SurrogateLikeBlackbox(Blackbox):
+    def __init__(self):
+        super().__init__(
+            configuration_space={'x': choice([0, 1])},
+            fidelity_space={'epoch': randint(1, 1)},
+            objectives_names=['error'],
+        )
+
+    def _objective_function(self, configuration, fidelity=None, seed=None):
+        return {'error': float(configuration['x'])}
+
+
+def _tabular_blackbox():
+    return BlackboxTabular(
+        hyperparameters=pd.DataFrame({'x': [0, 1]}),
+        configuration_space={'x': choice([0, 1])},
+        fidelity_space={'epoch': randint(1, 1)},
+        objectives_evaluations=np.arange(2.0).reshape(2, 1, 1, 1),
+        fidelity_values=np.array([1]),
+        objectives_names=['error'],
+    )
+
+
+def test_export_skips_non_tabular_blackbox(tmp_path, monkeypatch):
+    blackboxes = {'task_a': SurrogateLikeBlackbox(), 'task_b': SurrogateLikeBlackbox()}
+    loads = []
+
+    def load_blackbox(name):
+        loads.append(name)
+        return blackboxes
+
+    monkeypatch.setattr(hpo_main_simulator, 'load_blackbox', load_blackbox)
+    monkeypatch.setattr(mmap_blackbox, 'load_blackbox', load_blackbox)
+
+    result = hpo_main_simulator._export_tabular_blackbox('yahpo-like', root=str(tmp_path))
+    assert result is blackboxes
+    assert loads == ['yahpo-like']
+    assert not mmap_blackbox.is_repository_blackbox_exported('yahpo-like', root=str(tmp_path))
+    assert not any(tmp_path.iterdir())
+
+
+def test_export_tabular_blackbox_once(tmp_path, monkeypatch):
+    loads = []
+
+    def load_blackbox(name):
+        loads.append(name)
+        return {'task_a': _tabular_blackbox()}
+
+    monkeypatch.setattr(hpo_main_simulator, 'load_blackbox', load_blackbox)
+    monkeypatch.setattr(mmap_blackbox, 'load_blackbox', load_blackbox)
+
+    for _ in range(2):
+        assert hpo_main_simulator._export_tabular_blackbox('tabular', root=str(tmp_path)) is None
+    assert loads == ['tabular']
+    assert mmap_blackbox.is_repository_blackbox_exported('tabular', root=str(tmp_path))
+    path = mmap_blackbox.mmap_blackbox_path('tabular', dataset='task_a', root=str(tmp_path))
+    bb = mmap_blackbox.load_mmap_blackbox(path)
+    np.testing.assert_array_equal(bb.objectives_evaluations, np.arange(2.0).reshape(2, 1, 1, 1))
@@ -0,0 +1,30 @@
+import time
+
+import pytest
+
+from llambo.llm_scheduler import LLMRequestScheduler, CRITICAL, SPECULATIVE, DeadlineExceeded
+from llambo.rate_limiter import RateLimiter
+
+
+def test_throttled_limiter_does_not_block_other_limiters():
+    exhausted = RateLimiter(max_tokens=1000, time_frame=60, max_requests=1)
+    assert exhausted.try_acquire(request_token_count=1) == 0
+    available = RateLimiter(max_tokens=1000, time_frame=60, max_requests=10)
+
+    scheduler = LLMRequestScheduler(n_workers=1)
+    try:
+        # the throttled request is at the head of the most urgent class
+        blocked = scheduler.submit(lambda: 'blocked', priority=CRITICAL, deadline=1.0,
+                                   rate_limiter=exhausted, token_count=1)
+        dispatched = [scheduler.submit(lambda i=i: i, priority=priority, rate_limiter=available, token_count=1)
+                      for i, priority in enumerate([CRITICAL, SPECULATIVE])]
+
+        start = time.time()
+        assert [future.result(timeout=0.5) for future in dispatched] == [0, 1]
+        assert time.time() - start < 0.5
+        assert not blocked.done()
+        with pytest.raises(DeadlineExceeded):
+            blocked.result(timeout=2.0)
+        assert available.request_count == 2 and exhausted.request_count == 1
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,51 @@
+import numpy as np
+
+from llambo.observation_store import ObservationStore
+
+
+HYPERPARAMETER_CONSTRAINTS = {
+    'x': ['float', 'linear', [0.0, 1.0]],
+    'n': ['int', 'linear', [1, 10]],
+    'op': ['categorical', None, ['a', 'b']],
+}
+
+
+def _restored(store):
+    restored = ObservationStore(HYPERPARAMETER_CONSTRAINTS)
+    restored.set_state(store.get_state())
+    return restored
+
+
+def test_set_state_empty_then_add():
+    restored = _restored(ObservationStore(HYPERPARAMETER_CONSTRAINTS))
+    assert len(restored) == 0
+
+    restored.add({'x': 0.5, 'n': 3, 'op': 'b'}, {'score': 0.1}, fidelity=1)
+    restored.add({'x': 0.25, 'n': 4, 'op': 'c'}, {'score': 0.2})
+
+    assert len(restored) == 2
+    assert restored.configs().to_dict('records') == [{'x': 0.5, 'n': 3, 'op': 'b'}, {'x': 0.25, 'n': 4, 'op': 'c'}]
+    np.testing.assert_array_equal(restored.column('score'), [0.1, 0.2])
+    np.testing.assert_array_equal(restored.fidelities(), [1.0, np.nan])
+
+
+def test_set_state_round_trip_then_add():
+    store = ObservationStore(HYPERPARAMETER_CONSTRAINTS, initial_capacity=2)
+    for i in range(5):
+        store.add({'x': i / 10, 'n': i + 1, 'op': 'ab'[i % 2]}, {'score': float(i)}, fidelity=i)
+    pending_id = store.add_pending({'x': 0.9, 'n': 9, 'op': 'a'})
+
+    restored = _restored(store)
+    assert len(restored) == 5
+    assert restored.configs().equals(store.configs())
+    assert restored.fvals().equals(store.fvals())
+    np.testing.assert_array_equal(restored.fidelities(), store.fidelities())
+    assert list(restored.pending) == [pending_id]
+
+    restored.add({'x': 0.9, 'n': 9, 'op': 'a'}, {'score': 5.0, 'cost': 1.0}, pending_id=pending_id, fidelity=5)
+    assert len(restored) == 6
+    assert not restored.pending
+    assert restored.configs().iloc[-1].to_dict() == {'x': 0.9, 'n': 9, 'op': 'a'}
+    np.testing.assert_array_equal(restored.column('score'), np.arange(6.0))
+    assert np.isnan(restored.column('cost')[:5]).all() and restored.column('cost')[5] == 1.0
+    assert restored.add_pending({'x': 0.1, 'n': 1, 'op': 'a'}) > pending_id
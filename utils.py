@@ -1,5 +1,16 @@
 import pandas as pd
 
+# Syne Tune NAS-201 hyperparameter names -> LLAMBO task context names. hp_x0..hp_x5 follow the order of the
+# nb201 string representation |0->1|+|0->2|1->2|+|0->3|1->3|2->3|
+SYNETUNE_TO_LLAMBO_NAMES = {
+    'hp_x0': 'op_0_to_1',
+    'hp_x1': 'op_0_to_2',
+    'hp_x2': 'op_1_to_2',
+    'hp_x3': 'op_0_to_3',
+    'hp_x4': 'op_1_to_3',
+    'hp_x5': 'op_2_to_3'
+}
+
 
 def convert_LLAMBO_df_to_synetune_dict(config):
     config = config.to_dict()
@@ -10,8 +21,8 @@ def convert_LLAMBO_df_to_synetune_dict(config):
         original_dict = {
             'hp_x0': config['op_0_to_1'][key],
             'hp_x1': config['op_0_to_2'][key],
-            'hp_x2': config['op_0_to_3'][key],
-            'hp_x3': config['op_1_to_2'][key],
+            'hp_x2': config['op_1_to_2'][key],
+            'hp_x3': config['op_0_to_3'][key],
             'hp_x4': config['op_1_to_3'][key],
             'hp_x5': config['op_2_to_3'][key]
         }
@@ -21,8 +32,8 @@ def convert_LLAMBO_df_to_synetune_dict(config):
             original_dict = {
                 'hp_x0': config['op_0_to_1'][i],
                 'hp_x1': config['op_0_to_2'][i],
-                'hp_x2': config['op_0_to_3'][i],
-                'hp_x3': config['op_1_to_2'][i],
+                'hp_x2': config['op_1_to_2'][i],
+                'hp_x3': config['op_0_to_3'][i],
                 'hp_x4': config['op_1_to_3'][i],
                 'hp_x5': config['op_2_to_3'][i]
             }
@@ -45,8 +56,8 @@ def convert_synetune_dict_to_LLAMBO_df(synetune_dict):
     for item in synetune_dict:
         op_0_to_1.append(item['hp_x0'])
         op_0_to_2.append(item['hp_x1'])
-        op_0_to_3.append(item['hp_x2'])
-        op_1_to_2.append(item['hp_x3'])
+        op_0_to_3.append(item['hp_x3'])
+        op_1_to_2.append(item['hp_x2'])
         op_1_to_3.append(item['hp_x4'])
         op_2_to_3.append(item['hp_x5'])
 